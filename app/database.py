@@ -1,12 +1,58 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./pig_management.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+from app.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_BUSY_TIMEOUT
 )
+
+# SQLite连接参数
+CACHE_SIZE_KB = 64 * 1024  # 每个连接的页缓存大小
+MMAP_SIZE = 256 * 1024 * 1024  # 内存映射读取的字节数
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """每个新连接启用WAL（读写互不阻塞）并调整同步、缓存和锁等待设置"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def create_db_engine(url=DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                     pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE):
+    """创建数据库引擎；SQLite连接会设置WAL等参数并允许跨线程复用，其他数据库使用带健康检查的连接池"""
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=True
+        )
+
+    connect_args = {"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT / 1000}
+    if url.database in (None, "", ":memory:"):
+        # 内存数据库只能共用同一个连接
+        engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+    else:
+        engine = create_engine(
+            url,
+            connect_args=connect_args,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout
+        )
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,157 @@
+import argparse
+import datetime
+import re
+import sys
+
+from sqlalchemy import event
+from fastapi.routing import APIRoute
+
+from app.models.database import engine, SessionLocal, Pig, User
+
+# 除默认参数外，额外审计的带筛选条件的页面
+EXTRA_URLS = [
+    "/pig/management?keyword=ET100&status=妊娠&health_status=健康&pen_id=1",
+    "/pig/feeding?start_date=2024-01-01&end_date=2024-01-31",
+    "/pig/daily-summary?date=2024-01-15",
+    "/pig/alerts?status=未处理&level=紧急&type=温度异常",
+]
+
+# 不审计的路由：实时推送为不会结束的事件流
+SKIPPED_PATHS = {"/pig/api/live/events"}
+
+# 审计执行计划的语句类型：查询，以及带 WHERE 条件的更新和删除
+AUDITED_STATEMENTS = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+def capture_queries():
+    """监听引擎执行的SQL，返回按执行顺序记录的 [(语句, 参数)]"""
+    captured = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        text = statement.lstrip().upper()
+        if text.startswith(AUDITED_STATEMENTS) or (text.startswith("INSERT") and " SELECT " in text):
+            # 批量执行时用第一组参数生成查询计划
+            captured.append((statement, parameters[0] if executemany and parameters else parameters))
+    
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return captured, lambda: event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def route_urls(app, sample_ids):
+    """枚举所有GET路由，用示例ID填充路径参数"""
+    urls = []
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods or route.path in SKIPPED_PATHS:
+            continue
+        names = re.findall(r"{(\w+)}", route.path)
+        if any(name not in sample_ids for name in names):
+            print(f"跳过 {route.path}：缺少路径参数示例")
+            continue
+        urls.append(route.path.format(**{name: sample_ids[name] for name in names}))
+    return urls + EXTRA_URLS
+
+def write_requests(pig):
+    """审计的写入路径：传感器上报一条读数、导入一条历史喂食记录，返回 [(说明, 请求参数)]"""
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    csv = f"ear_tag,feed_time,feed_amount,feed_status\n{pig.ear_tag},{yesterday} 00:00:00,1.0,正常\n"
+    return [
+        ("POST /pig/api/environment/readings", {
+            "method": "POST", "url": "/pig/api/environment/readings",
+            "json": [{"pig_house_id": pig.pen.pig_house_id if pig.pen else 1, "temperature": 20.0, "humidity": 60.0,
+                      "notes": "db_audit"}],
+        }),
+        ("POST /pig/import/feeding", {
+            "method": "POST", "url": "/pig/import/feeding",
+            "files": {"file": ("db_audit.csv", csv.encode("utf-8"), "text/csv")},
+        }),
+    ]
+
+def explain(statement, parameters):
+    """执行 EXPLAIN QUERY PLAN，返回查询计划明细列表"""
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def is_full_scan(detail):
+    """判断查询计划中的一步是否为全表扫描（SCAN且未使用索引）；FTS5等虚拟表按自己的索引检索，不算全表扫描"""
+    return (
+        re.match(r"SCAN (?!CONSTANT ROW|\()", detail) is not None
+        and "USING" not in detail
+        and "VIRTUAL TABLE" not in detail
+    )
+
+def audit(strict=False, writes=True):
+    """访问各路由页面（以及写入路径），对其执行的每条查询做 EXPLAIN QUERY PLAN 并报告全表扫描"""
+    if engine.dialect.name != "sqlite":
+        raise SystemExit("查询计划审计仅支持SQLite数据库")
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.routes.auth import get_current_user
+    from app.services.ingestion import environment_ingestor
+    
+    findings = {}
+    
+    def record(label, send):
+        captured, stop = capture_queries()
+        try:
+            send()
+        finally:
+            stop()
+        for statement, parameters in captured:
+            key = " ".join(statement.split())
+            if key in findings:
+                findings[key]["urls"].add(label)
+                continue
+            findings[key] = {"urls": {label}, "plan": explain(statement, parameters)}
+    
+    # 启动应用（建表并写入示例数据）之后再读取示例用户和猪只
+    with TestClient(app) as client:
+        db = SessionLocal()
+        try:
+            user = db.query(User).first()
+            pig = db.query(Pig).first()
+            requests = write_requests(pig) if writes and pig else []
+        finally:
+            db.close()
+        
+        sample_ids = {"pig_id": pig.id if pig else 1}
+        app.dependency_overrides[get_current_user] = lambda: user
+        try:
+            for url in route_urls(app, sample_ids):
+                record(url, lambda: client.get(url))
+            
+            # 停止后台写入线程，上报的读数在请求内同步写入，写入语句才会计入该路径
+            environment_ingestor.stop()
+            for label, request in requests:
+                record(label, lambda: client.request(**request))
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+    
+    full_scans = 0
+    for statement, info in findings.items():
+        scans = [detail for detail in info["plan"] if is_full_scan(detail)]
+        if not scans:
+            continue
+        full_scans += 1
+        print("-" * 80)
+        print(f"全表扫描: {', '.join(scans)}")
+        print(f"页面: {', '.join(sorted(info['urls']))}")
+        print(f"SQL: {statement}")
+        for detail in info["plan"]:
+            print(f"    {detail}")
+    
+    print("-" * 80)
+    print(f"共审计 {len(findings)} 条查询，其中 {full_scans} 条存在全表扫描")
+    return 1 if strict and full_scans else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="审计各路由查询的执行计划，找出全表扫描")
+    parser.add_argument("--strict", action="store_true", help="存在全表扫描时以非零状态退出")
+    parser.add_argument("--read-only", action="store_true", help="不审计写入路径（会写入一条环境读数和一条喂食记录）")
+    args = parser.parse_args()
+    sys.exit(audit(strict=args.strict, writes=not args.read_only))
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,137 @@
-from app.models.database import init_db, seed_data, get_db
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, exists, inspect, select, update
 import random
-from app.models.database import Pig
+import time
+
+from app.config import STARTUP_BUDGET_MS
+from app.models.database import (
+    Base, engine, init_db, seed_data, get_db,
+    Pig, PigHouse, FeedingRecord, EnvironmentRecord, FeedingDailyRollup, EnvironmentDailyRollup
+)
+from app.services.rollup import rebuild_rollups
+from app.db_migrate import migrate_database
+from app.services.pig_search import SEARCH_TABLE, SEARCH_TRIGGERS, fts_supported
+
+# 迁移时为已有表补加的列：表名 -> 列名
+MIGRATED_COLUMNS = {"pigs": ["backfat_thickness"]}
+
+def missing_schema():
+    """返回数据库中缺失的表、索引和迁移列的名称列表，为空表示无需建表或迁移
+
+    SQLite上只查询一次 sqlite_master（其中包含建表语句，可据此判断列是否存在，以及全文索引的触发器）；
+    其他数据库只检查表，索引随 init_db 建表时创建。
+    """
+    expected_tables = {table.name for table in Base.metadata.sorted_tables}
+    if engine.dialect.name != "sqlite":
+        return sorted(expected_tables - set(inspect(engine).get_table_names()))
+
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT type, name, sql FROM sqlite_master WHERE type IN ('table', 'index', 'trigger')"
+        ).all()
+    tables = {name: sql or "" for kind, name, sql in rows if kind == "table"}
+    indexes = {name for kind, name, _ in rows if kind == "index"}
+    triggers = {name for kind, name, _ in rows if kind == "trigger"}
+
+    missing = sorted(expected_tables - set(tables))
+    for table in Base.metadata.sorted_tables:
+        if table.name in tables:
+            missing += [index.name for index in table.indexes if index.name not in indexes]
+    for table_name, columns in MIGRATED_COLUMNS.items():
+        if table_name in tables:
+            missing += [f"{table_name}.{column}" for column in columns if column not in tables[table_name]]
+    if fts_supported():
+        missing += [name for name in [SEARCH_TABLE] if name not in tables]
+        missing += [name for name in SEARCH_TRIGGERS if name not in triggers]
+    return missing
+
+def data_state():
+    """用一条查询返回需要处理的数据状态
+
+    返回 {"seeded": 是否已有示例数据, "backfat_missing": 是否有猪只缺少背膘厚度,
+    "rollups_missing": 是否已有原始记录但每日汇总表为空}
+    """
+    with engine.connect() as conn:
+        seeded, backfat_missing, has_records, has_rollups = conn.execute(select(
+            exists().where(PigHouse.id.isnot(None)),
+            exists().where(Pig.backfat_thickness.is_(None)),
+            exists().where(FeedingRecord.id.isnot(None)) | exists().where(EnvironmentRecord.id.isnot(None)),
+            exists().where(FeedingDailyRollup.id.isnot(None)) | exists().where(EnvironmentDailyRollup.id.isnot(None)),
+        )).one()
+    return {
+        "seeded": bool(seeded),
+        "backfat_missing": bool(backfat_missing),
+        "rollups_missing": bool(has_records and not has_rollups),
+    }
+
+def prepare_database(seed=True):
+    """应用启动时检查数据库状态，只执行需要的步骤，返回执行过的步骤列表
+
+    数据库已是最新状态时只执行两次查询（结构检查和数据状态检查），不做任何修改。
+    耗时超过 STARTUP_BUDGET_MS 时打印警告。
+    """
+    started = time.perf_counter()
+    steps = []
+
+    missing = missing_schema()
+    if missing:
+        print(f"数据库缺少 {len(missing)} 个表/索引/列，正在创建: {', '.join(missing[:10])}")
+        init_db()
+        migrate_database()
+        steps.append("schema")
+
+    state = data_state()
+    if seed and not state["seeded"]:
+        seed_data()
+        steps.append("seed")
+        state = data_state()
+    if state["backfat_missing"]:
+        update_pig_backfat()
+        steps.append("backfat")
+    if state["rollups_missing"]:
+        print("正在重建每日汇总表...")
+        db = next(get_db())
+        try:
+            rebuild_rollups(db)
+        finally:
+            db.close()
+        steps.append("rollups")
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"数据库检查完成，用时 {elapsed_ms:.0f}ms，执行步骤: {', '.join(steps) or '无'}")
+    if STARTUP_BUDGET_MS and elapsed_ms > STARTUP_BUDGET_MS:
+        print(f"警告: 数据库启动检查用时 {elapsed_ms:.0f}ms，超过预算 {STARTUP_BUDGET_MS}ms")
+    return steps
 
 def initialize_database():
-    """初始化数据库并填充示例数据"""
-    # 创建数据库表
-    init_db()
-    
-    # 添加示例数据
-    seed_data()
-    
-    # 更新现有猪只的背膘厚度
-    update_pig_backfat()
+    """初始化数据库并填充示例数据（已初始化的数据库只做状态检查）"""
+    return prepare_database(seed=True)
+
+def upgrade_database():
+    """为已有数据库创建新增的表和索引，并补齐背膘厚度和每日汇总数据"""
+    return prepare_database(seed=False)
 
 def update_pig_backfat():
-    """为现有猪只添加随机背膘厚度数据"""
+    """为缺少背膘厚度的猪只添加随机背膘厚度数据（一次批量更新）"""
     db = next(get_db())
     try:
-        # 获取所有背膘厚度为空的猪只
-        pigs = db.query(Pig).filter(Pig.backfat_thickness == None).all()
-        
-        if not pigs:
+        pig_ids = db.execute(select(Pig.id).where(Pig.backfat_thickness.is_(None))).scalars().all()
+
+        if not pig_ids:
             print("所有猪只已有背膘厚度数据")
             return
-        
-        print(f"正在为 {len(pigs)} 头猪只添加背膘厚度数据...")
-        
-        # 为每头猪添加随机背膘厚度
-        for pig in pigs:
-            pig.backfat_thickness = random.uniform(10.0, 25.0)  # 随机背膘厚度(mm)
-        
+
+        print(f"正在为 {len(pig_ids)} 头猪只添加背膘厚度数据...")
+
+        # 随机背膘厚度(mm)，用 executemany 一次提交
+        db.connection().execute(
+            update(Pig.__table__).where(Pig.__table__.c.id == bindparam("pig_id")).values(
+                backfat_thickness=bindparam("value")
+            ),
+            [{"pig_id": pig_id, "value": random.uniform(10.0, 25.0)} for pig_id in pig_ids]
+        )
         db.commit()
         print("背膘厚度数据更新完成！")
-        
+
     except Exception as e:
         print(f"更新背膘厚度数据时出错: {e}")
         db.rollback()
@@ -41,4 +139,4 @@ def update_pig_backfat():
         db.close()
 
 if __name__ == "__main__":
-    initialize_database() 
\ No newline at end of file
+    initialize_database()
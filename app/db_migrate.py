@@ -2,13 +2,63 @@ import sqlite3
 import os
 import random
 
-# 获取数据库文件路径
+from app.models.database import Base, engine
+from app.services.pig_search import SEARCH_TABLE, SEARCH_DDL, SEARCH_TRIGGERS, fts_supported
+
+# 获取数据库文件路径（DATABASE_URL 指向的SQLite文件）
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-db_path = os.path.join(BASE_DIR, 'pig_management.db')
+db_path = engine.url.database or os.path.join(BASE_DIR, 'pig_management.db')
 parent_db_path = os.path.join(os.path.dirname(BASE_DIR), 'pig_management.db')
 
+def add_missing_indexes(cursor):
+    """为已有数据库补建模型中声明的索引"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    tables = set(row[0] for row in cursor.fetchall())
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    existing = set(row[0] for row in cursor.fetchall())
+    
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            columns = ", ".join(column.name for column in index.columns)
+            unique = "UNIQUE " if index.unique else ""
+            cursor.execute(f"CREATE {unique}INDEX IF NOT EXISTS {index.name} ON {table.name} ({columns})")
+            created.append(index.name)
+    
+    if created:
+        # 更新查询规划器的统计信息
+        cursor.execute("ANALYZE")
+        print(f"已添加 {len(created)} 个索引: {', '.join(created)}")
+    else:
+        print("所有索引已存在，无需添加")
+    return created
+
+def add_search_index(cursor):
+    """创建猪只全文索引表和同步触发器，并从 pigs 表重建索引内容"""
+    if not fts_supported():
+        print("当前SQLite不支持FTS5 trigram分词，猪只搜索使用LIKE查询")
+        return False
+    cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+    existing = set(row[0] for row in cursor.fetchall())
+    if SEARCH_TABLE in existing and all(name in existing for name in SEARCH_TRIGGERS):
+        print("猪只全文索引已存在，无需创建")
+        return False
+    for statement in SEARCH_DDL:
+        cursor.execute(statement)
+    print("已创建猪只全文索引")
+    return True
+
 def migrate_database():
-    """手动迁移数据库，添加背膘厚度列"""
+    """手动迁移数据库，添加背膘厚度列和缺失的索引"""
+    if engine.dialect.name != "sqlite":
+        # 其他数据库上的表和索引由 init_db 按模型创建
+        print(f"当前数据库为 {engine.dialect.name}，无需执行SQLite迁移")
+        return
+    
     # 检查两个可能的数据库位置
     real_db_path = db_path if os.path.exists(db_path) else parent_db_path
     
@@ -40,18 +90,22 @@ def migrate_database():
             cursor.execute("SELECT id FROM pigs")
             pig_ids = [row[0] for row in cursor.fetchall()]
             
-            for pig_id in pig_ids:
-                backfat_thickness = random.uniform(10.0, 25.0)
-                cursor.execute(
-                    "UPDATE pigs SET backfat_thickness = ? WHERE id = ?", 
-                    (backfat_thickness, pig_id)
-                )
+            cursor.executemany(
+                "UPDATE pigs SET backfat_thickness = ? WHERE id = ?",
+                [(random.uniform(10.0, 25.0), pig_id) for pig_id in pig_ids]
+            )
             
             print(f"成功为 {len(pig_ids)} 头猪更新了背膘厚度数据")
-            
-            # 提交更改
-            conn.commit()
-            print("数据库迁移完成")
+        
+        # 添加缺失的索引
+        add_missing_indexes(cursor)
+        
+        # 耳标号、品种和备注的全文索引
+        add_search_index(cursor)
+        
+        # 提交更改
+        conn.commit()
+        print("数据库迁移完成")
     except sqlite3.Error as e:
         print(f"数据库操作错误: {e}")
         if conn:
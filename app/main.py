@@ -1,9 +1,20 @@
+import datetime
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-import os
 
-from app.routes import home, auth, pig
-from app.db_init import initialize_database, update_pig_backfat
+from app.routes import home, auth, pig, environment, metrics, devices, live, search
+from app.db_init import prepare_database
+from app.services.ingestion import environment_ingestor
+from app.services.alert_rules import alert_engine
+from app.services.retention import retention_scheduler
+from app.services.feed_scheduler import feed_scheduler
+from app.services.feed_anomaly import feed_anomaly_detector
+from app.config import FEED_SCHEDULER
+from app.services.device_gateway import device_gateway, create_transport
+from app.services.push_hub import push_hub
+from app.services.page_cache import page_cache, day_tags, days_of, ENVIRONMENT_INVALIDATE_INTERVAL
+from app.services.profiling import ProfilingMiddleware, request_metrics
 
 app = FastAPI(
     title="母猪管理系统",
@@ -18,19 +29,84 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 app.include_router(auth.router)
 app.include_router(home.router)
 app.include_router(pig.router)
+app.include_router(environment.router)
+app.include_router(metrics.router)
+app.include_router(devices.router)
+app.include_router(live.router)
+app.include_router(search.router)
+
+# 按路由统计请求耗时、SQL语句数和数据库耗时，由 /metrics 输出
+app.add_middleware(ProfilingMiddleware, metrics=request_metrics)
+
+# 环境读数写入后交给报警规则引擎评估
+environment_ingestor.add_listener(alert_engine.process_environment)
+
+def invalidate_environment(rows):
+    """环境读数写入频繁，当天的缓存限制失效频率；补报的历史读数只使对应日期的每日汇总失效"""
+    page_cache.invalidate_throttled("environment", ENVIRONMENT_INVALIDATE_INTERVAL)
+    today = datetime.date.today()
+    days = days_of(rows, "record_time")
+    if today in days:
+        page_cache.invalidate_throttled(("environment", today), ENVIRONMENT_INVALIDATE_INTERVAL)
+    page_cache.invalidate(*day_tags("environment", days - {today}))
+
+# 新数据写入后使页面缓存失效，按日期缓存的页面只失效写入涉及的日期
+environment_ingestor.add_listener(invalidate_environment)
+alert_engine.add_listener(
+    lambda alerts: alerts and page_cache.invalidate("alerts", *day_tags("alerts", days_of(alerts, "alert_time")))
+)
+
+# 按下料设置自动写入的喂食记录同样交给报警规则引擎评估，并使采食相关页面缓存失效
+feed_scheduler.add_listener(alert_engine.process_feeding)
+feed_scheduler.add_listener(
+    lambda rows: page_cache.invalidate("feeding", *day_tags("feeding", days_of(rows, "feed_time")))
+)
+# 采食异常分析重新标注采食状态后使采食相关页面缓存失效（报警经规则引擎的回调处理）
+feed_anomaly_detector.add_listener(
+    lambda summary: page_cache.invalidate("feeding", *day_tags("feeding", summary["days"]))
+)
+# 到期的下料指令通过设备网关发送给对应猪圈的下料器，设备确认后调度器才写入喂食记录
+feed_scheduler.add_command_listener(device_gateway.submit_feed_commands)
+
+# 新报警、环境读数和自动下料记录实时推送给首页和报警页面
+alert_engine.add_listener(push_hub.publish_alerts)
+environment_ingestor.add_listener(push_hub.publish_environment)
+feed_scheduler.add_listener(push_hub.publish_feeding)
 
 # 初始化数据库
 @app.on_event("startup")
 async def startup_event():
-    # 检查数据库文件是否存在
-    db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "pig_management.db")
-    if not os.path.exists(db_path):
-        # 初始化数据库并填充示例数据
-        initialize_database()
-    else:
-        print("数据库已有数据，跳过初始化")
-        # 确保所有猪只都有背膘厚度数据
-        update_pig_backfat()
+    # 检查数据库结构和数据状态，只执行需要的建表、示例数据和数据修复步骤
+    prepare_database()
+    
+    # 启动环境读数的后台写入线程
+    environment_ingestor.start()
+    # 配置了 RETENTION_DAYS 时定期归档旧的喂食和环境记录
+    retention_scheduler.start()
+    # 启动实时推送中心
+    push_hub.start()
+    # 配置了 DEVICE_TRANSPORT 时启动设备命令网关
+    transport = create_transport()
+    if transport is not None:
+        await device_gateway.start(transport)
+    # 按下料设置的时间段自动下料；没有设备网关时没有设备确认下料，不启动调度器
+    if device_gateway.running:
+        feed_scheduler.start()
+    elif FEED_SCHEDULER:
+        print("未配置 DEVICE_TRANSPORT，设备命令网关未启动，不执行自动下料")
+    # 定期分析有新喂食记录的猪只，标注采食状态并生成采食异常报警
+    feed_anomaly_detector.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # 写入缓冲队列中剩余的环境读数
+    environment_ingestor.stop()
+    retention_scheduler.stop()
+    # 先停止网关，未完成的下料指令报告为失败，再由调度器写入已确认的喂食记录
+    await device_gateway.stop()
+    feed_scheduler.stop()
+    feed_anomaly_detector.stop()
+    push_hub.stop()
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,19 +1,13 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Enum, Text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, Enum, Text, UniqueConstraint, Index
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime, timedelta
-import os
 import random
 import json
 
-# 创建数据库连接
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'pig_management.db')}"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base = declarative_base()
+# 数据库连接由 app.database 统一创建，这里重新导出供各模块使用
+from app.database import DATABASE_URL, engine, SessionLocal, Base, get_db
 
 # 枚举类型定义
 class PigStatus(enum.Enum):
@@ -66,7 +60,7 @@ class PigPen(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     pen_number = Column(String(20), unique=True, index=True)
-    pig_house_id = Column(Integer, ForeignKey("pig_houses.id"))
+    pig_house_id = Column(Integer, ForeignKey("pig_houses.id"), index=True)
     capacity = Column(Integer)  # 最大容量
     current_count = Column(Integer, default=0)
     type = Column(String(20))  # 圈舍类型：妊娠舍、分娩舍、保育舍等
@@ -89,9 +83,9 @@ class Pig(Base):
     weight = Column(Float)
     backfat_thickness = Column(Float, nullable=True)  # 背膘厚度(mm)
     status = Column(String(20))
-    pen_id = Column(Integer, ForeignKey("pig_pens.id"))
+    pen_id = Column(Integer, ForeignKey("pig_pens.id"), index=True)
     health_status = Column(String(20), default="健康")
-    entry_date = Column(DateTime, default=datetime.now)
+    entry_date = Column(DateTime, default=datetime.now, index=True)
     last_update = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     notes = Column(Text, nullable=True)
     
@@ -104,10 +98,13 @@ class Pig(Base):
 class FeedingRecord(Base):
     """喂食记录表"""
     __tablename__ = "feeding_records"
+    __table_args__ = (
+        Index("ix_feeding_records_pig_id_feed_time", "pig_id", "feed_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     pig_id = Column(Integer, ForeignKey("pigs.id"))
-    feed_time = Column(DateTime, default=datetime.now)
+    feed_time = Column(DateTime, default=datetime.now, index=True)
     feed_amount = Column(Float)  # 单位：kg
     duration = Column(Integer)   # 单位：分钟
     feed_type = Column(String(50))
@@ -122,7 +119,7 @@ class FeedSetting(Base):
     __tablename__ = "feed_settings"
     
     id = Column(Integer, primary_key=True, index=True)
-    pen_id = Column(Integer, ForeignKey("pig_pens.id"))
+    pen_id = Column(Integer, ForeignKey("pig_pens.id"), index=True)
     feed_type = Column(String(50))
     daily_amount = Column(Float)  # 单位：kg/天
     feeding_times = Column(Integer)  # 每天喂食次数
@@ -131,14 +128,20 @@ class FeedSetting(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     special_instructions = Column(Text, nullable=True)
+    
+    # 关系
+    pen = relationship("PigPen")
 
 class HealthRecord(Base):
     """健康记录表"""
     __tablename__ = "health_records"
+    __table_args__ = (
+        Index("ix_health_records_pig_id_record_date", "pig_id", "record_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     pig_id = Column(Integer, ForeignKey("pigs.id"))
-    record_date = Column(DateTime, default=datetime.now)
+    record_date = Column(DateTime, default=datetime.now, index=True)
     temperature = Column(Float, nullable=True)  # 单位：摄氏度
     symptoms = Column(Text, nullable=True)
     diagnosis = Column(String(100), nullable=True)
@@ -152,12 +155,15 @@ class HealthRecord(Base):
 class BreedingRecord(Base):
     """繁育记录表"""
     __tablename__ = "breeding_records"
+    __table_args__ = (
+        Index("ix_breeding_records_pig_id_breeding_date", "pig_id", "breeding_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     pig_id = Column(Integer, ForeignKey("pigs.id"))
     breeding_date = Column(DateTime)
     expected_farrowing_date = Column(DateTime, nullable=True)
-    actual_farrowing_date = Column(DateTime, nullable=True)
+    actual_farrowing_date = Column(DateTime, nullable=True, index=True)
     total_born = Column(Integer, nullable=True)
     born_alive = Column(Integer, nullable=True)
     stillborn = Column(Integer, nullable=True)
@@ -171,10 +177,13 @@ class BreedingRecord(Base):
 class EnvironmentRecord(Base):
     """猪舍环境记录表"""
     __tablename__ = "environment_records"
+    __table_args__ = (
+        Index("ix_environment_records_pig_house_id_record_time", "pig_house_id", "record_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     pig_house_id = Column(Integer, ForeignKey("pig_houses.id"))
-    record_time = Column(DateTime, default=datetime.now)
+    record_time = Column(DateTime, default=datetime.now, index=True)
     temperature = Column(Float)  # 温度
     humidity = Column(Float)  # 湿度
     co2_level = Column(Float, nullable=True)  # 二氧化碳浓度
@@ -185,9 +194,12 @@ class EnvironmentRecord(Base):
 class Alert(Base):
     """报警记录表"""
     __tablename__ = "alerts"
+    __table_args__ = (
+        Index("ix_alerts_status_alert_time", "status", "alert_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    alert_time = Column(DateTime, default=datetime.now)
+    alert_time = Column(DateTime, default=datetime.now, index=True)
     alert_type = Column(String(50))
     alert_level = Column(String(20))
     location = Column(String(50))
@@ -211,125 +223,160 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.now)
     last_login = Column(DateTime, nullable=True)
 
+class UserSession(Base):
+    """登录会话表（供多个进程共享的会话存储使用）"""
+    __tablename__ = "user_sessions"
+
+    session_id = Column(String(64), primary_key=True)
+    user_id = Column(Integer, index=True)
+    expires_at = Column(DateTime, index=True)
+
+class FeedingDailyRollup(Base):
+    """每日采食汇总表（按猪圈和采食状态）"""
+    __tablename__ = "feeding_daily_rollups"
+    __table_args__ = (UniqueConstraint("day", "pen_id", "feed_status"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, index=True)
+    pen_id = Column(Integer, default=0)  # 0表示未分配猪圈
+    feed_status = Column(String(20), default="")
+    record_count = Column(Integer, default=0)
+    feed_amount = Column(Float, default=0)  # 单位：kg
+
+class EnvironmentDailyRollup(Base):
+    """每日环境汇总表（按猪舍）"""
+    __tablename__ = "environment_daily_rollups"
+    __table_args__ = (UniqueConstraint("day", "pig_house_id"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, index=True)
+    pig_house_id = Column(Integer, default=0)
+    record_count = Column(Integer, default=0)
+    temperature_sum = Column(Float, default=0)
+    humidity_sum = Column(Float, default=0)
+
+class AlertDailyRollup(Base):
+    """每日报警汇总表（按报警类型和级别）"""
+    __tablename__ = "alert_daily_rollups"
+    __table_args__ = (UniqueConstraint("day", "alert_type", "alert_level"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, index=True)
+    alert_type = Column(String(50), default="")
+    alert_level = Column(String(20), default="")
+    alert_count = Column(Integer, default=0)
+
 # 初始化数据库
 def init_db():
     Base.metadata.create_all(bind=engine)
 
-# 获取数据库会话
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # 生成示例数据
 def seed_data():
+    """填充示例数据：每类记录先在内存中生成，再用一条批量INSERT写入"""
     # 初始化数据库
     init_db()
     
     # 创建会话
     db = SessionLocal()
     
+    def insert_rows(model, rows):
+        if rows:
+            db.execute(model.__table__.insert(), rows)
+    
     try:
         # 检查是否已有数据
-        if db.query(PigHouse).count() > 0:
+        if db.query(PigHouse.id).first() is not None:
             print("数据库已有数据，跳过初始化")
             return
         
-        # 添加猪舍
-        pig_houses = []
-        for i in range(1, 4):
-            house = PigHouse(
-                name=f"第{i}号猪舍",
-                location=f"A区{i}号位置",
-                capacity=i * 50,
-                current_count=0,
-                manager=random.choice(["张三", "李四", "王五", "赵六"]),
-                temperature=random.uniform(20.0, 26.0),
-                humidity=random.uniform(50.0, 70.0)
-            )
-            db.add(house)
-            pig_houses.append(house)
+        now = datetime.now()
         
-        db.commit()
+        # 添加猪舍
+        insert_rows(PigHouse, [
+            {
+                "name": f"第{i}号猪舍",
+                "location": f"A区{i}号位置",
+                "capacity": i * 50,
+                "current_count": 0,
+                "manager": random.choice(["张三", "李四", "王五", "赵六"]),
+                "temperature": random.uniform(20.0, 26.0),
+                "humidity": random.uniform(50.0, 70.0)
+            } for i in range(1, 4)
+        ])
+        house_ids = db.execute(select(PigHouse.id).order_by(PigHouse.id)).scalars().all()
         
-        # 添加猪圈
-        pig_pens = []
+        # 添加猪圈，每个猪舍5个猪圈
         pen_types = ["妊娠舍", "分娩舍", "保育舍", "育成舍"]
-        for house in pig_houses:
-            for i in range(1, 6):  # 每个猪舍5个猪圈
-                pen = PigPen(
-                    pen_number=f"P{house.id}-{i}",
-                    pig_house_id=house.id,
-                    capacity=10,
-                    current_count=0,
-                    type=random.choice(pen_types),
-                    area=random.uniform(20.0, 30.0)
-                )
-                db.add(pen)
-                pig_pens.append(pen)
-        
-        db.commit()
+        insert_rows(PigPen, [
+            {
+                "pen_number": f"P{house_id}-{i}",
+                "pig_house_id": house_id,
+                "capacity": 10,
+                "current_count": 0,
+                "type": random.choice(pen_types),
+                "area": random.uniform(20.0, 30.0)
+            } for house_id in house_ids for i in range(1, 6)
+        ])
+        pig_pens = db.execute(select(PigPen.id, PigPen.pen_number, PigPen.pig_house_id).order_by(PigPen.id)).all()
         
         # 添加猪只
-        pigs = []
         breeds = ["大白", "长白", "杜洛克", "皮特兰", "巴克夏"]
         statuses = ["正常", "妊娠", "哺乳", "分娩", "休息", "治疗"]
         health_statuses = ["健康", "待观察", "治疗中"]
         
+        pig_rows = []
+        pen_counts = {}
         for i in range(1, 51):  # 创建50头猪
-            birth_date = datetime.now() - timedelta(days=random.randint(365, 1095))  # 1-3岁
             pen = random.choice(pig_pens)
-            pig = Pig(
-                ear_tag=f"ET{10000+i}",
-                birth_date=birth_date,
-                breed=random.choice(breeds),
-                gender="母",  # 母猪
-                weight=random.uniform(150.0, 250.0),
-                backfat_thickness=random.uniform(10.0, 25.0),  # 随机背膘厚度(mm)
-                status=random.choice(statuses),
-                pen_id=pen.id,
-                health_status=random.choice(health_statuses),
-                entry_date=datetime.now() - timedelta(days=random.randint(30, 300)),
-                notes=f"测试母猪数据 #{i}"
-            )
-            db.add(pig)
-            pigs.append(pig)
-            
-            # 更新猪圈当前数量
-            pen.current_count += 1
-            
-            # 更新猪舍当前数量
-            house = db.query(PigHouse).filter(PigHouse.id == pen.pig_house_id).first()
-            house.current_count += 1
+            pen_counts[pen] = pen_counts.get(pen, 0) + 1
+            pig_rows.append({
+                "ear_tag": f"ET{10000+i}",
+                "birth_date": now - timedelta(days=random.randint(365, 1095)),  # 1-3岁
+                "breed": random.choice(breeds),
+                "gender": "母",  # 母猪
+                "weight": random.uniform(150.0, 250.0),
+                "backfat_thickness": random.uniform(10.0, 25.0),  # 随机背膘厚度(mm)
+                "status": random.choice(statuses),
+                "pen_id": pen.id,
+                "health_status": random.choice(health_statuses),
+                "entry_date": now - timedelta(days=random.randint(30, 300)),
+                "notes": f"测试母猪数据 #{i}"
+            })
+        insert_rows(Pig, pig_rows)
+        pigs = db.execute(select(Pig.id, Pig.status).order_by(Pig.id)).all()
         
-        db.commit()
+        # 更新猪圈和猪舍的当前数量
+        house_counts = {}
+        for pen, count in pen_counts.items():
+            house_counts[pen.pig_house_id] = house_counts.get(pen.pig_house_id, 0) + count
+        db.execute(
+            update(PigPen.__table__).where(PigPen.__table__.c.id == bindparam("pen_id")).values(current_count=bindparam("count")),
+            [{"pen_id": pen.id, "count": count} for pen, count in pen_counts.items()]
+        )
+        db.execute(
+            update(PigHouse.__table__).where(PigHouse.__table__.c.id == bindparam("house_id")).values(current_count=bindparam("count")),
+            [{"house_id": house_id, "count": count} for house_id, count in house_counts.items()]
+        )
         
-        # 添加喂食记录
+        # 添加喂食记录，每头猪5-15条
         feed_types = ["标准饲料", "妊娠饲料", "哺乳饲料", "恢复饲料"]
         feed_statuses = ["正常", "少食", "拒食", "过量"]
-        
-        for pig in pigs:
-            # 为每头猪添加5-15条喂食记录
-            for _ in range(random.randint(5, 15)):
-                feed_time = datetime.now() - timedelta(days=random.randint(0, 30), 
-                                                      hours=random.randint(0, 23),
-                                                      minutes=random.randint(0, 59))
-                record = FeedingRecord(
-                    pig_id=pig.id,
-                    feed_time=feed_time,
-                    feed_amount=random.uniform(1.5, 4.0),
-                    duration=random.randint(10, 45),
-                    feed_type=random.choice(feed_types),
-                    feed_status=random.choice(feed_statuses),
-                    automatic=random.choice([True, True, True, False])  # 75%的几率是自动喂食
-                )
-                db.add(record)
-        
-        db.commit()
+        insert_rows(FeedingRecord, [
+            {
+                "pig_id": pig.id,
+                "feed_time": now - timedelta(days=random.randint(0, 30),
+                                             hours=random.randint(0, 23),
+                                             minutes=random.randint(0, 59)),
+                "feed_amount": random.uniform(1.5, 4.0),
+                "duration": random.randint(10, 45),
+                "feed_type": random.choice(feed_types),
+                "feed_status": random.choice(feed_statuses),
+                "automatic": random.choice([True, True, True, False])  # 75%的几率是自动喂食
+            } for pig in pigs for _ in range(random.randint(5, 15))
+        ])
         
         # 添加下料设置
+        setting_rows = []
         for pen in pig_pens:
             # 创建喂食时间段，通常为每天3-4次
             feeding_times = random.randint(3, 4)
@@ -341,18 +388,16 @@ def seed_data():
                     "amount": round(random.uniform(1.0, 2.0), 1)
                 })
             
-            setting = FeedSetting(
-                pen_id=pen.id,
-                feed_type=random.choice(feed_types),
-                daily_amount=sum(slot["amount"] for slot in time_slots),
-                feeding_times=feeding_times,
-                time_slots=json.dumps(time_slots),
-                enabled=True,
-                special_instructions=f"圈舍{pen.pen_number}的特殊饲养说明" if random.random() < 0.3 else None
-            )
-            db.add(setting)
-        
-        db.commit()
+            setting_rows.append({
+                "pen_id": pen.id,
+                "feed_type": random.choice(feed_types),
+                "daily_amount": sum(slot["amount"] for slot in time_slots),
+                "feeding_times": feeding_times,
+                "time_slots": json.dumps(time_slots),
+                "enabled": True,
+                "special_instructions": f"圈舍{pen.pen_number}的特殊饲养说明" if random.random() < 0.3 else None
+            })
+        insert_rows(FeedSetting, setting_rows)
         
         # 添加健康记录
         symptoms_list = ["食欲不振", "发热", "咳嗽", "皮肤异常", "呼吸急促", "无症状"]
@@ -360,75 +405,67 @@ def seed_data():
         treatments = ["观察", "抗生素治疗", "补充营养", "隔离治疗", "无需治疗"]
         vets = ["张医生", "李医生", "王医生", "赵医生"]
         
+        health_rows = []
         for pig in pigs:
             # 30%的猪有健康记录
             if random.random() < 0.3:
                 for _ in range(random.randint(1, 3)):
-                    record_date = datetime.now() - timedelta(days=random.randint(1, 90))
+                    record_date = now - timedelta(days=random.randint(1, 90))
                     symptom = random.choice(symptoms_list)
                     diagnosis = random.choice(diagnoses)
                     treatment = random.choice(treatments)
                     
-                    record = HealthRecord(
-                        pig_id=pig.id,
-                        record_date=record_date,
-                        temperature=random.uniform(37.5, 40.0) if symptom != "无症状" else random.uniform(38.0, 39.0),
-                        symptoms=symptom if symptom != "无症状" else None,
-                        diagnosis=diagnosis if diagnosis != "正常" else None,
-                        treatment=treatment if treatment != "无需治疗" else None,
-                        vet_name=random.choice(vets),
-                        follow_up_date=record_date + timedelta(days=random.randint(3, 14)) if treatment != "无需治疗" else None
-                    )
-                    db.add(record)
-        
-        db.commit()
+                    health_rows.append({
+                        "pig_id": pig.id,
+                        "record_date": record_date,
+                        "temperature": random.uniform(37.5, 40.0) if symptom != "无症状" else random.uniform(38.0, 39.0),
+                        "symptoms": symptom if symptom != "无症状" else None,
+                        "diagnosis": diagnosis if diagnosis != "正常" else None,
+                        "treatment": treatment if treatment != "无需治疗" else None,
+                        "vet_name": random.choice(vets),
+                        "follow_up_date": record_date + timedelta(days=random.randint(3, 14)) if treatment != "无需治疗" else None
+                    })
+        insert_rows(HealthRecord, health_rows)
         
         # 添加繁育记录
+        breeding_rows = []
         for pig in pigs:
             # 只有状态为妊娠、哺乳或分娩的猪有繁育记录
             if pig.status in ["妊娠", "哺乳", "分娩"]:
-                breeding_date = datetime.now() - timedelta(days=random.randint(90, 150))
+                breeding_date = now - timedelta(days=random.randint(90, 150))
                 expected_farrowing_date = breeding_date + timedelta(days=114)  # 猪的妊娠期约为114天
                 
                 # 如果预产期已过，则有实际分娩日期和仔猪数据
-                has_farrowed = expected_farrowing_date < datetime.now()
+                has_farrowed = expected_farrowing_date < now
+                weaned = pig.status == "哺乳" and has_farrowed
                 
-                record = BreedingRecord(
-                    pig_id=pig.id,
-                    breeding_date=breeding_date,
-                    expected_farrowing_date=expected_farrowing_date,
-                    actual_farrowing_date=expected_farrowing_date + timedelta(days=random.randint(-2, 2)) if has_farrowed else None,
-                    total_born=random.randint(8, 15) if has_farrowed else None,
-                    born_alive=random.randint(7, 14) if has_farrowed else None,
-                    stillborn=random.randint(0, 2) if has_farrowed else None,
-                    weaned=random.randint(6, 12) if pig.status == "哺乳" and has_farrowed else None,
-                    weaning_date=expected_farrowing_date + timedelta(days=21) if pig.status == "哺乳" and has_farrowed else None,
-                    notes=f"正常繁育记录 #{pig.id}"
-                )
-                db.add(record)
-        
-        db.commit()
-        
-        # 添加环境记录
-        for house in pig_houses:
-            # 添加过去14天的环境记录，每天4条
-            for day in range(14):
-                for hour in [6, 12, 18, 0]:  # 每天6点、12点、18点、0点记录
-                    record_time = datetime.now().replace(hour=hour, minute=0, second=0, microsecond=0) - timedelta(days=day)
-                    
-                    record = EnvironmentRecord(
-                        pig_house_id=house.id,
-                        record_time=record_time,
-                        temperature=random.uniform(18.0, 28.0),
-                        humidity=random.uniform(45.0, 75.0),
-                        co2_level=random.uniform(400.0, 1200.0),
-                        ammonia_level=random.uniform(5.0, 25.0),
-                        air_quality_index=random.uniform(50.0, 150.0),
-                        notes=None
-                    )
-                    db.add(record)
+                breeding_rows.append({
+                    "pig_id": pig.id,
+                    "breeding_date": breeding_date,
+                    "expected_farrowing_date": expected_farrowing_date,
+                    "actual_farrowing_date": expected_farrowing_date + timedelta(days=random.randint(-2, 2)) if has_farrowed else None,
+                    "total_born": random.randint(8, 15) if has_farrowed else None,
+                    "born_alive": random.randint(7, 14) if has_farrowed else None,
+                    "stillborn": random.randint(0, 2) if has_farrowed else None,
+                    "weaned": random.randint(6, 12) if weaned else None,
+                    "weaning_date": expected_farrowing_date + timedelta(days=21) if weaned else None,
+                    "notes": f"正常繁育记录 #{pig.id}"
+                })
+        insert_rows(BreedingRecord, breeding_rows)
         
-        db.commit()
+        # 添加环境记录：过去14天，每天6点、12点、18点、0点各一条
+        insert_rows(EnvironmentRecord, [
+            {
+                "pig_house_id": house_id,
+                "record_time": now.replace(hour=hour, minute=0, second=0, microsecond=0) - timedelta(days=day),
+                "temperature": random.uniform(18.0, 28.0),
+                "humidity": random.uniform(45.0, 75.0),
+                "co2_level": random.uniform(400.0, 1200.0),
+                "ammonia_level": random.uniform(5.0, 25.0),
+                "air_quality_index": random.uniform(50.0, 150.0),
+                "notes": None
+            } for house_id in house_ids for day in range(14) for hour in [6, 12, 18, 0]
+        ])
         
         # 添加报警记录
         alert_types = ["温度异常", "采食异常", "健康异常", "设备故障", "环境异常"]
@@ -436,10 +473,11 @@ def seed_data():
         locations = [f"猪舍{i}" for i in range(1, 4)] + [f"圈舍{pen.pen_number}" for pen in pig_pens]
         statuses = ["未处理", "处理中", "已解决", "已忽略"]
         
+        alert_rows = []
         for _ in range(30):  # 创建30条警报
-            alert_time = datetime.now() - timedelta(days=random.randint(0, 10), 
-                                                  hours=random.randint(0, 23),
-                                                  minutes=random.randint(0, 59))
+            alert_time = now - timedelta(days=random.randint(0, 10),
+                                         hours=random.randint(0, 23),
+                                         minutes=random.randint(0, 59))
             alert_type = random.choice(alert_types)
             alert_level = random.choice(alert_levels)
             location = random.choice(locations)
@@ -459,37 +497,35 @@ def seed_data():
             
             processed = status in ["已解决", "已忽略"]
             
-            alert = Alert(
-                alert_time=alert_time,
-                alert_type=alert_type,
-                alert_level=alert_level,
-                location=location,
-                details=details,
-                duration=random.randint(10, 120),
-                status=status,
-                processed_by="管理员" if processed else None,
-                processed_time=alert_time + timedelta(hours=random.randint(1, 8)) if processed else None,
-                resolution_notes=f"已处理{alert_type}问题" if processed else None
-            )
-            db.add(alert)
-        
-        db.commit()
+            alert_rows.append({
+                "alert_time": alert_time,
+                "alert_type": alert_type,
+                "alert_level": alert_level,
+                "location": location,
+                "details": details,
+                "duration": random.randint(10, 120),
+                "status": status,
+                "processed_by": "管理员" if processed else None,
+                "processed_time": alert_time + timedelta(hours=random.randint(1, 8)) if processed else None,
+                "resolution_notes": f"已处理{alert_type}问题" if processed else None
+            })
+        insert_rows(Alert, alert_rows)
         
         # 创建一个测试用户
         from app.utils.password import get_password_hash
-        test_user = User(
-            username="admin",
-            email="admin@example.com",
-            hashed_password=get_password_hash("password"),
-            is_admin=True
-        )
-        db.add(test_user)
-        db.commit()
+        insert_rows(User, [{
+            "username": "admin",
+            "email": "admin@example.com",
+            "hashed_password": get_password_hash("password"),
+            "is_admin": True
+        }])
         
+        # 所有示例数据在一个事务中提交；每日汇总表由启动检查统一重建
+        db.commit()
         print("数据库初始化完成！")
         
     except Exception as e:
         print(f"初始化数据库时出错: {e}")
         db.rollback()
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
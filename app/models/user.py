@@ -1,15 +1,2 @@
-from sqlalchemy import Boolean, Column, Integer, String
-from sqlalchemy.sql.sqltypes import DateTime
-import datetime
-
-from app.database import Base
-
-class User(Base):
-    __tablename__ = "users"
-
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True)
-    email = Column(String, unique=True, index=True)
-    hashed_password = Column(String)
-    is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+# 用户表定义在 app.models.database 中，与其他数据表共用同一个Base和引擎
+from app.models.database import User
@@ -3,29 +3,40 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
 from starlette import status
-import secrets
 from datetime import datetime, timedelta
 
 from app.models.database import get_db, User
 from app.utils.password import verify_password
+from app.services.sessions import session_store, user_cache, SESSION_TTL
 
 router = APIRouter(tags=["auth"])
 templates = Jinja2Templates(directory="app/templates")
 
-# 会话存储
-sessions = {}
-
 def get_current_user(request: Request, db: Session = Depends(get_db)):
     """获取当前登录用户"""
-    session_id = request.cookies.get("session_id")
-    if not session_id or session_id not in sessions:
+    return session_user(request.cookies.get("session_id"), db)
+
+def session_user(session_id, db: Session):
+    """按会话ID获取用户，会话无效时返回 None（WebSocket 连接也用它校验登录）"""
+    if not session_id:
+        return None
+    
+    # 每次都向会话存储确认会话有效，退出登录或过期后立即失效
+    user_id = session_store.get(session_id)
+    if user_id is None:
         return None
     
-    # 获取会话中存储的用户ID
-    user_id = sessions[session_id]
+    # 短时间内重复访问直接使用缓存的用户信息
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
     
     # 查询用户信息
     user = db.query(User).filter(User.id == user_id).first()
+    if user is not None:
+        # 从会话中分离，避免请求内的提交使缓存对象的属性过期
+        db.expunge(user)
+        user_cache.set(user_id, user)
     return user
 
 @router.get("/login", response_class=HTMLResponse)
@@ -34,7 +45,7 @@ async def login_page(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
 @router.post("/login")
-async def login(
+def login(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
@@ -52,8 +63,7 @@ async def login(
         )
     
     # 创建会话
-    session_id = secrets.token_hex(16)
-    sessions[session_id] = user.id
+    session_id = session_store.create(user.id)
     
     # 更新最后登录时间
     user.last_login = datetime.now()
@@ -65,17 +75,17 @@ async def login(
         key="session_id", 
         value=session_id,
         httponly=True,
-        max_age=3600  # 1小时过期
+        max_age=SESSION_TTL  # 与服务端会话同时过期
     )
     
     return response
 
 @router.get("/logout")
-async def logout(request: Request):
+def logout(request: Request):
     """用户退出登录"""
     session_id = request.cookies.get("session_id")
-    if session_id and session_id in sessions:
-        del sessions[session_id]
+    if session_id:
+        session_store.delete(session_id)
     
     response = RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
     response.delete_cookie(key="session_id")
@@ -88,7 +98,7 @@ async def register_page(request: Request):
     return templates.TemplateResponse("register.html", {"request": request})
 
 @router.post("/register")
-async def register(
+def register(
     request: Request,
     username: str = Form(...),
     email: str = Form(...),
@@ -131,15 +141,14 @@ async def register(
     db.commit()
     
     # 注册成功后自动登录
-    session_id = secrets.token_hex(16)
-    sessions[session_id] = new_user.id
+    session_id = session_store.create(new_user.id)
     
     response = RedirectResponse(url="/home", status_code=status.HTTP_303_SEE_OTHER)
     response.set_cookie(
         key="session_id", 
         value=session_id,
         httponly=True,
-        max_age=3600  # 1小时过期
+        max_age=SESSION_TTL  # 与服务端会话同时过期
     )
     
     return response
@@ -0,0 +1,114 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse
+
+from app.config import DEVICE_COMMAND_TIMEOUT_MS, DEVICE_COMMAND_RETRIES
+from app.routes.auth import get_current_user
+from app.services.device_gateway import device_gateway, DEVICE_ACTIONS, RETRY_BACKOFF
+
+router = APIRouter(
+    prefix="/pig/api/devices",
+    tags=["devices"],
+)
+
+# 单次请求最多提交的命令数
+MAX_COMMANDS = 1000
+
+# 路由只在内存中操作网关，与网关在同一个事件循环中执行，因此声明为 async def
+
+def unauthorized():
+    return JSONResponse(
+        status_code=401,
+        content={"success": False, "message": "请先登录"}
+    )
+
+def max_wait_seconds():
+    """一条命令从发送到最后一次重试结束的最长时间"""
+    timeout = DEVICE_COMMAND_TIMEOUT_MS / 1000
+    return timeout * (DEVICE_COMMAND_RETRIES + 1) + RETRY_BACKOFF * (2 ** DEVICE_COMMAND_RETRIES - 1)
+
+@router.get("")
+async def list_devices(user = Depends(get_current_user)):
+    """设备列表：在线状态、排队命令数和当前状态"""
+    if not user:
+        return unauthorized()
+    return {"success": True, "summary": device_gateway.summary(), "devices": device_gateway.device_list()}
+
+@router.post("/commands")
+async def send_commands(request: Request, user = Depends(get_current_user)):
+    """下发设备命令
+
+    请求体为 {"commands": [{"device_id": "fan-1", "action": "set_speed", "params": {"speed": 60}}]}，
+    或按设备类型广播 {"kind": "fan", "action": "off"}。"wait": true 时等待设备确认后返回。
+    """
+    if not user:
+        return unauthorized()
+    if not device_gateway.running:
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "message": "设备网关未启动"}
+        )
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": "请求体应为JSON对象"}
+        )
+
+    items = payload.get("commands")
+    if payload.get("kind"):
+        if payload["kind"] not in DEVICE_ACTIONS:
+            return JSONResponse(
+                status_code=400,
+                content={"success": False, "message": f"未知的设备类型: {payload['kind']}"}
+            )
+        items = [
+            {"device_id": device.id, "action": payload.get("action"), "params": payload.get("params")}
+            for device in device_gateway.devices.values() if device.kind == payload["kind"]
+        ]
+    if not isinstance(items, list) or not items:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": "缺少 commands 或 kind"}
+        )
+    if len(items) > MAX_COMMANDS:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": f"单次最多提交 {MAX_COMMANDS} 条命令"}
+        )
+
+    commands = []
+    rejected = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("命令必须是JSON对象")
+            commands.append(device_gateway.submit(item.get("device_id"), item.get("action"), item.get("params")))
+        except ValueError as e:
+            rejected.append({"index": index, "message": str(e)})
+
+    if payload.get("wait") and commands:
+        await device_gateway.wait(commands, timeout=max_wait_seconds())
+
+    return {
+        "success": bool(commands),
+        "accepted": len(commands),
+        "rejected": rejected,
+        "commands": [command.to_dict() for command in commands],
+    }
+
+@router.get("/commands/{command_id}")
+async def command_status(command_id: int, user = Depends(get_current_user)):
+    """查询命令的确认状态"""
+    if not user:
+        return unauthorized()
+    command = device_gateway.commands.get(command_id)
+    if command is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "命令不存在或已过期"}
+        )
+    return {"success": True, "command": command.to_dict()}
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import JSONResponse
+from typing import Optional
+import json
+
+from app.config import SENSOR_API_TOKEN
+from app.services.ingestion import environment_ingestor, IngestionBusy
+
+router = APIRouter(
+    prefix="/pig/api/environment",
+    tags=["environment"],
+)
+
+# 每累计多少行NDJSON读数提交一次
+STREAM_SUBMIT_SIZE = 1000
+
+def check_sensor_token(x_sensor_token: Optional[str] = Header(None)):
+    """配置了 SENSOR_API_TOKEN 时，要求请求头 X-Sensor-Token 与之一致"""
+    return not SENSOR_API_TOKEN or x_sensor_token == SENSOR_API_TOKEN
+
+def unauthorized():
+    return JSONResponse(
+        status_code=401,
+        content={"success": False, "message": "传感器令牌无效"}
+    )
+
+def busy(message, accepted, retry_index):
+    """写入队列已满：accepted 条读数已接收，传感器应从下标（流式上报时为行号）retry_index 开始重发"""
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "1"},
+        content={"success": False, "message": message, "accepted": accepted, "retry_index": retry_index}
+    )
+
+@router.post("/readings")
+async def ingest_readings(request: Request, authorized: bool = Depends(check_sensor_token)):
+    """批量上报环境读数：请求体为JSON数组，或 {"readings": [...]}"""
+    if not authorized:
+        return unauthorized()
+    
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": "请求体不是有效的JSON"}
+        )
+    
+    readings = payload.get("readings") if isinstance(payload, dict) else payload
+    if not isinstance(readings, list):
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": "读数应为JSON数组"}
+        )
+    
+    try:
+        accepted, rejected = environment_ingestor.submit(readings)
+    except IngestionBusy as e:
+        return busy(str(e), e.accepted, e.retry_index)
+    
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "accepted": accepted, "rejected": rejected}
+    )
+
+@router.post("/readings/stream")
+async def ingest_reading_stream(request: Request, authorized: bool = Depends(check_sensor_token)):
+    """以换行分隔的JSON（NDJSON）流式上报环境读数，边接收边提交"""
+    if not authorized:
+        return unauthorized()
+    
+    accepted = 0
+    rejected = []
+    pending = []
+    buffer = b""
+    line_number = 0
+    
+    def submit(lines):
+        nonlocal accepted
+        readings = []
+        indexes = []
+        for number, line in lines:
+            try:
+                readings.append(json.loads(line))
+                indexes.append(number)
+            except ValueError:
+                rejected.append({"index": number, "message": "不是有效的JSON"})
+        try:
+            count, errors = environment_ingestor.submit(readings)
+        except IngestionBusy as e:
+            # 本批已排队的读数计入接收数量，从第一条未排队读数所在的行重发
+            accepted += e.accepted
+            raise IngestionBusy(f"写入队列已满，已接收 {accepted} 条", accepted, indexes[e.retry_index])
+        accepted += count
+        for error in errors:
+            rejected.append({"index": indexes[error["index"]], "message": error["message"]})
+    
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                line_number += 1
+                if line.strip():
+                    pending.append((line_number, line))
+            if len(pending) >= STREAM_SUBMIT_SIZE:
+                submit(pending)
+                pending = []
+        
+        if buffer.strip():
+            line_number += 1
+            pending.append((line_number, buffer))
+        if pending:
+            submit(pending)
+    except IngestionBusy as e:
+        return busy(str(e), e.accepted, e.retry_index)
+    
+    return JSONResponse(
+        status_code=202,
+        content={"success": True, "accepted": accepted, "rejected": rejected[:100]}
+    )
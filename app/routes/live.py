@@ -0,0 +1,140 @@
+from fastapi import APIRouter, Depends, Header, WebSocket
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import asyncio
+
+from app.models.database import SessionLocal
+from app.routes.auth import get_current_user, session_user
+from app.services.push_hub import push_hub, TOPICS, TooManyClients, to_json
+
+router = APIRouter(
+    prefix="/pig/api/live",
+    tags=["live"],
+)
+
+# 没有消息时发送心跳的间隔（秒），防止代理断开空闲连接，也用于发现已断开的客户端
+HEARTBEAT_INTERVAL = 15
+
+# SSE 客户端断线后浏览器重连的等待毫秒数
+SSE_RETRY_MS = 3000
+
+def parse_topics(topics):
+    """解析逗号分隔的主题，未指定时订阅全部主题；包含未知主题时返回 None"""
+    if not topics:
+        return TOPICS
+    names = [name.strip() for name in topics.split(",") if name.strip()]
+    if any(name not in TOPICS for name in names):
+        return None
+    return names
+
+def dropped_message(count):
+    """缓冲区溢出通知：客户端应重新加载页面数据"""
+    return to_json({"topic": "dropped", "data": {"count": count}})
+
+@router.get("/events")
+async def live_events(
+    topics: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    user = Depends(get_current_user)
+):
+    """Server-Sent Events 推送：topics 为逗号分隔的 alerts、environment、feeding，默认全部"""
+    if not user:
+        return JSONResponse(
+            status_code=401,
+            content={"success": False, "message": "请先登录"}
+        )
+    names = parse_topics(topics)
+    if names is None:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": f"未知的主题，可选: {', '.join(TOPICS)}"}
+        )
+    try:
+        subscriber = push_hub.subscribe(names, int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+    except TooManyClients as e:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": "10"},
+            content={"success": False, "message": str(e)}
+        )
+
+    async def stream():
+        # 客户端断开时 Starlette 取消该生成器，finally 中注销订阅
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while True:
+                item = await subscriber.next(HEARTBEAT_INTERVAL)
+                if item is False:
+                    break
+                dropped = subscriber.take_dropped()
+                if dropped:
+                    yield f"event: dropped\ndata: {dropped_message(dropped)}\n\n"
+                if item is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                event_id, topic, message = item
+                yield f"id: {event_id}\nevent: {topic}\ndata: {message}\n\n"
+        finally:
+            push_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+def websocket_user(session_id):
+    db = SessionLocal()
+    try:
+        return session_user(session_id, db)
+    finally:
+        db.close()
+
+@router.websocket("/ws")
+async def live_socket(websocket: WebSocket, topics: Optional[str] = None):
+    """WebSocket 推送：每条消息为 {"topic": ..., "data": ...} 的JSON文本"""
+    # 连接期间不占用数据库会话，只在握手时校验登录
+    user = await run_in_threadpool(websocket_user, websocket.cookies.get("session_id"))
+    names = parse_topics(topics)
+    if not user or names is None:
+        await websocket.close(code=1008)
+        return
+    try:
+        subscriber = push_hub.subscribe(names)
+    except TooManyClients:
+        await websocket.close(code=1013)
+        return
+
+    await websocket.accept()
+
+    async def receive():
+        # 客户端发送的消息忽略，只用于发现断开
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    async def send():
+        while True:
+            item = await subscriber.next(HEARTBEAT_INTERVAL)
+            if item is False:
+                await websocket.close()
+                return
+            dropped = subscriber.take_dropped()
+            if dropped:
+                await websocket.send_text(dropped_message(dropped))
+            if item is None:
+                await websocket.send_text(to_json({"topic": "ping"}))
+                continue
+            await websocket.send_text(item[2])
+
+    tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(send())]
+    try:
+        # 任一方结束（客户端断开、发送失败或推送中心关闭）即关闭连接
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # 先注销订阅：连接被取消时后面的 await 不会执行完
+        push_hub.unsubscribe(subscriber)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
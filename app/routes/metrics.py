@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Header
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+
+from app.config import METRICS_TOKEN
+from app.services.page_cache import page_cache
+from app.services.device_gateway import device_gateway
+from app.services.ingestion import environment_ingestor
+from app.services.push_hub import push_hub
+from app.services.profiling import request_metrics
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus文本格式的请求、SQL、页面缓存、传感器写入、设备命令和实时推送指标"""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        return PlainTextResponse("未授权\n", status_code=401)
+    
+    body = request_metrics.render([
+        ("pig_page_cache_hits_total", "counter", "页面缓存命中次数", page_cache.hits),
+        ("pig_page_cache_misses_total", "counter", "页面缓存未命中次数", page_cache.misses),
+        ("pig_page_cache_entries", "gauge", "页面缓存条目数", len(page_cache.entries)),
+        ("pig_ingestion_written_total", "counter", "写入数据库的环境读数数", environment_ingestor.stats["written"]),
+        ("pig_ingestion_pending", "gauge", "等待写入（排队或等待重试）的环境读数数",
+         environment_ingestor.queue.qsize() + len(environment_ingestor.retry_batch)),
+        ("pig_ingestion_flush_errors_total", "counter", "环境读数批次写入失败的次数", environment_ingestor.stats["flush_errors"]),
+        ("pig_ingestion_spilled_total", "counter", "停止时无法写入、保存到文件的环境读数数", environment_ingestor.stats["spilled"]),
+        ("pig_ingestion_lost_total", "counter", "无法写入也无法保存而丢失的环境读数数", environment_ingestor.stats["lost"]),
+        ("pig_device_commands_total", "counter", "提交给设备网关的命令数", device_gateway.stats["submitted"]),
+        ("pig_device_commands_acked_total", "counter", "设备确认的命令数", device_gateway.stats["acked"]),
+        ("pig_device_commands_rejected_total", "counter", "设备拒绝的命令数", device_gateway.stats["rejected"]),
+        ("pig_device_commands_failed_total", "counter", "超时或重试后仍失败的命令数", device_gateway.stats["failed"]),
+        ("pig_device_command_retries_total", "counter", "设备命令的重发次数", device_gateway.stats["retries"]),
+        ("pig_push_clients", "gauge", "已连接的实时推送客户端数", len(push_hub.subscribers)),
+        ("pig_push_messages_total", "counter", "发布的实时推送消息数", push_hub.stats["published"]),
+        ("pig_push_dropped_total", "counter", "因客户端缓冲区已满丢弃的推送消息数", push_hub.stats["dropped"]),
+    ])
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,14 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Form, Query, File, UploadFile
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, or_, and_
 from typing import Optional, List
 import datetime
 import json
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 
-from app.models.database import get_db, PigHouse, PigPen, Pig, FeedingRecord, FeedSetting, HealthRecord, BreedingRecord, EnvironmentRecord, Alert
+from app.models.database import get_db, SessionLocal, PigHouse, PigPen, Pig, FeedingRecord, FeedSetting, HealthRecord, BreedingRecord, EnvironmentRecord, Alert
 from app.routes.auth import get_current_user
+from app.services.bulk_import import IMPORT_COLUMNS, ImportFileError, import_file_in_session
+from app.services.export import EXPORT_SOURCES, EXPORT_FORMATS, check_format, iter_export, export_filename
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.services.retention import record_source, archive_sources
+from app.services.page_cache import page_cache, day_tags, plain_rows
+from app.services.feed_scheduler import feed_scheduler, parse_time_slots
+from app.services.device_gateway import device_gateway
+from app.services.pig_search import keyword_filter, ear_tag_index
+from app.services.rollup import (
+    FEED_STATUSES, feeding_daily_stats, environment_daily_stats, alert_daily_counts, retract_pig_feeding
+)
 
 router = APIRouter(
     prefix="/pig",
@@ -18,6 +31,9 @@ router = APIRouter(
 
 templates = Jinja2Templates(directory="app/templates")
 
+# 访问数据库的路由声明为普通函数，由FastAPI放到线程池执行，避免同步查询阻塞事件循环；
+# 只在内存中处理或返回流式响应的路由保留为 async def
+
 # 自定义过滤器：根据状态返回对应的Bootstrap样式类
 def status_class(status):
     """根据母猪状态返回对应的Bootstrap样式类"""
@@ -47,8 +63,20 @@ def health_status_class(health_status):
 templates.env.filters["status_class"] = status_class
 templates.env.filters["health_status_class"] = health_status_class
 
+# 每日汇总页面依赖的数据类型：按 (类型, 日期) 打标签，只有写入涉及该日期时失效；
+# 删除猪只等无法确定日期的修改使用 "daily_summary" 标签使全部日期失效
+DAILY_SUMMARY_KINDS = ("feeding", "health", "breeding", "environment", "alerts")
+
+# 导入各类数据后需要失效的页面缓存标签
+IMPORT_CACHE_TAGS = {
+    "pigs": ("pigs",),
+    "feeding": ("feeding",),
+    "health": ("health",),
+    "breeding": ("breeding",),
+}
+
 @router.get("/management", response_class=HTMLResponse)
-async def pig_management(
+def pig_management(
     request: Request, 
     keyword: Optional[str] = None,
     status: Optional[str] = None,
@@ -56,6 +84,7 @@ async def pig_management(
     pen_id: Optional[int] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db), 
     user = Depends(get_current_user)
 ):
@@ -69,8 +98,9 @@ async def pig_management(
     # 构建查询条件
     query = db.query(Pig)
     
-    if keyword:
-        query = query.filter(Pig.ear_tag.like(f'%{keyword}%'))
+    if keyword and keyword.strip():
+        # 耳标号、品种、备注的全文索引，不再对 ear_tag 做前后通配的全表扫描
+        query = query.filter(keyword_filter(keyword))
     
     if status:
         query = query.filter(Pig.status == status)
@@ -81,8 +111,19 @@ async def pig_management(
     if pen_id:
         query = query.filter(Pig.pen_id == pen_id)
     
-    # 计算总记录数
-    total_count = query.count()
+    # 一次GROUP BY统计总数、各状态和各健康状态的猪只数量
+    status_counts = {name: 0 for name in ["正常", "妊娠", "哺乳", "分娩", "休息", "治疗", "淘汰"]}
+    health_counts = {name: 0 for name in ["健康", "待观察", "治疗中", "隔离中"]}
+    total_count = 0
+    grouped = query.with_entities(
+        Pig.status, Pig.health_status, func.count(Pig.id)
+    ).group_by(Pig.status, Pig.health_status).all()
+    for pig_status, pig_health_status, count in grouped:
+        total_count += count
+        if pig_status in status_counts:
+            status_counts[pig_status] += count
+        if pig_health_status in health_counts:
+            health_counts[pig_health_status] += count
     
     # 计算总页数
     total_pages = (total_count + page_size - 1) // page_size
@@ -90,22 +131,31 @@ async def pig_management(
     # 限制页码范围
     page = min(max(1, page), max(1, total_pages))
     
-    # 获取分页数据
-    pigs = query.order_by(Pig.entry_date.desc()).offset((page - 1) * page_size).limit(page_size).all()
-    
-    # 统计各种状态的猪只数量
-    all_pigs = query.all()
-    status_counts = {}
-    for status in ["正常", "妊娠", "哺乳", "分娩", "休息", "治疗", "淘汰"]:
-        status_counts[status] = len([p for p in all_pigs if p.status == status])
+    # 获取分页数据：带游标时按 (entry_date, id) 键集分页，否则按页码偏移。
+    # 没有入场日期的猪只排在最后（各数据库一致），游标位于这部分时只按ID继续
+    ordered = query.order_by(Pig.entry_date.desc().nulls_last(), Pig.id.desc())
+    cursor_key = decode_cursor(cursor) if cursor else None
+    if cursor_key:
+        cursor_date, cursor_id = cursor_key
+        if cursor_date is None:
+            after_cursor = and_(Pig.entry_date.is_(None), Pig.id < cursor_id)
+        else:
+            after_cursor = or_(
+                Pig.entry_date < cursor_date,
+                and_(Pig.entry_date == cursor_date, Pig.id < cursor_id),
+                Pig.entry_date.is_(None)
+            )
+        pigs = ordered.filter(after_cursor).limit(page_size).all()
+    else:
+        pigs = ordered.offset((page - 1) * page_size).limit(page_size).all()
     
-    # 统计健康状态
-    health_counts = {}
-    for status in ["健康", "待观察", "治疗中", "隔离中"]:
-        health_counts[status] = len([p for p in all_pigs if p.health_status == status])
+    # 下一页游标
+    next_cursor = None
+    if len(pigs) == page_size:
+        next_cursor = encode_cursor(pigs[-1].entry_date, pigs[-1].id)
     
     # 获取最近添加的猪只
-    recent_pigs = sorted(all_pigs, key=lambda x: x.entry_date, reverse=True)[:5]
+    recent_pigs = ordered.limit(5).all()
     
     return templates.TemplateResponse("pig/management.html", {
         "request": request,
@@ -124,14 +174,16 @@ async def pig_management(
         "filter_pen_id": pen_id,
         "current_page": page,
         "total_pages": total_pages,
-        "page_size": page_size
+        "page_size": page_size,
+        "cursor": cursor if cursor_key else None,
+        "next_cursor": next_cursor
     })
 
 # 新增API：获取单个母猪详情
 @router.get("/detail/{pig_id}", response_class=JSONResponse)
-async def get_pig_detail(pig_id: int, db: Session = Depends(get_db), user = Depends(get_current_user)):
+def get_pig_detail(pig_id: int, db: Session = Depends(get_db), user = Depends(get_current_user)):
     """获取单个母猪的详细信息"""
-    pig = db.query(Pig).filter(Pig.id == pig_id).first()
+    pig = db.query(Pig).options(joinedload(Pig.pen)).filter(Pig.id == pig_id).first()
     
     if not pig:
         raise HTTPException(status_code=404, detail="猪只不存在")
@@ -198,7 +250,7 @@ async def get_pig_detail(pig_id: int, db: Session = Depends(get_db), user = Depe
 
 # 新增API：添加母猪
 @router.post("/add", response_class=JSONResponse)
-async def add_pig(
+def add_pig(
     ear_tag: str = Form(...),
     birth_date: str = Form(...),
     breed: str = Form(...),
@@ -267,12 +319,15 @@ async def add_pig(
         pig_house.current_count += 1
     
     db.commit()
+    # 新增猪只后首页统计缓存失效
+    page_cache.invalidate("pigs")
+    ear_tag_index.add(new_pig.id, new_pig.ear_tag)
     
     return {"success": True, "message": "添加成功", "pig_id": new_pig.id}
 
 # 新增API：更新母猪
 @router.put("/update/{pig_id}", response_class=JSONResponse)
-async def update_pig(
+def update_pig(
     pig_id: int,
     ear_tag: str = Form(...),
     birth_date: str = Form(...),
@@ -358,12 +413,15 @@ async def update_pig(
     pig.last_update = datetime.datetime.now()
     
     db.commit()
+    # 猪只状态变化后首页统计缓存失效
+    page_cache.invalidate("pigs")
+    ear_tag_index.add(pig_id, ear_tag)
     
     return {"success": True, "message": "更新成功"}
 
 # 新增API：删除母猪
 @router.delete("/delete/{pig_id}", response_class=JSONResponse)
-async def delete_pig(
+def delete_pig(
     pig_id: int,
     db: Session = Depends(get_db),
     user = Depends(get_current_user)
@@ -381,8 +439,11 @@ async def delete_pig(
     pen_id = pig.pen_id
     pen = db.query(PigPen).filter(PigPen.id == pen_id).first()
     
-    # 删除相关记录
+    # 删除相关记录（批量删除不触发ORM事件，先从采食汇总表中扣减）
+    retract_pig_feeding(db.connection(), pig_id)
     db.query(FeedingRecord).filter(FeedingRecord.pig_id == pig_id).delete()
+    for table in archive_sources("feeding"):
+        db.execute(table.delete().where(table.c.pig_id == pig_id))
     db.query(HealthRecord).filter(HealthRecord.pig_id == pig_id).delete()
     db.query(BreedingRecord).filter(BreedingRecord.pig_id == pig_id).delete()
     
@@ -399,19 +460,14 @@ async def delete_pig(
             house.current_count = max(0, house.current_count - 1)
     
     db.commit()
+    # 猪只及其记录已删除，相关页面缓存失效
+    page_cache.invalidate("pigs", "feeding", "health", "breeding", "daily_summary")
+    ear_tag_index.remove(pig_id)
     
     return {"success": True, "message": "删除成功"}
 
-@router.get("/feeding", response_class=HTMLResponse)
-async def feeding_info(
-    request: Request, 
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    db: Session = Depends(get_db), 
-    user = Depends(get_current_user)
-):
-    """采食信息页面"""
-    # 设置默认日期范围为过去7天
+def feeding_date_range(start_date, end_date):
+    """解析采食查询的日期范围，默认为过去7天，返回 (起始日期, 结束日期, 起始时间, 结束时间)"""
     if not start_date:
         start_date = (datetime.datetime.now() - datetime.timedelta(days=7)).strftime("%Y-%m-%d")
     if not end_date:
@@ -419,68 +475,245 @@ async def feeding_info(
     
     start_datetime = datetime.datetime.strptime(start_date, "%Y-%m-%d")
     end_datetime = datetime.datetime.strptime(end_date, "%Y-%m-%d") + datetime.timedelta(days=1)
+    return start_date, end_date, start_datetime, end_datetime
+
+# 新增API：批量导入
+@router.post("/import/{kind}", response_class=JSONResponse)
+async def import_data(
+    kind: str,
+    file: UploadFile = File(...),
+    user = Depends(get_current_user)
+):
+    """从CSV/Excel文件批量导入猪只(pigs)、喂食(feeding)、健康(health)或繁育(breeding)记录"""
+    if not user:
+        return JSONResponse(
+            status_code=401,
+            content={"success": False, "message": "请先登录"}
+        )
     
-    # 获取指定日期范围内的喂食记录
-    feeding_records = db.query(FeedingRecord).filter(
-        FeedingRecord.feed_time >= start_datetime,
-        FeedingRecord.feed_time < end_datetime
-    ).order_by(FeedingRecord.feed_time.desc()).all()
-    
-    # 按日期统计每日喂食量
-    daily_feed_amount = {}
-    for record in feeding_records:
-        date_key = record.feed_time.strftime("%Y-%m-%d")
-        if date_key not in daily_feed_amount:
-            daily_feed_amount[date_key] = 0
-        daily_feed_amount[date_key] += record.feed_amount
+    if kind not in IMPORT_COLUMNS:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": f"不支持的导入类型: {kind}"}
+        )
     
-    # 统计各喂食状态的比例
-    status_counts = {}
-    for status in ["正常", "少食", "拒食", "过量"]:
-        status_counts[status] = len([r for r in feeding_records if r.feed_status == status])
+    # 导入耗时较长，放到线程池执行，避免阻塞事件循环；工作线程使用独立的数据库会话
+    try:
+        result = await run_in_threadpool(import_file_in_session, kind, file.file, file.filename)
+    except ImportError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": str(e)}
+        )
+    except ImportFileError as e:
+        # 出错前的批次已经提交，返回已导入的行数
+        invalidate_import_caches(kind, e.result)
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": str(e), **e.result.to_dict()}
+        )
     
-    total_records = len(feeding_records)
-    status_percents = {status: count / total_records * 100 if total_records > 0 else 0 
-                      for status, count in status_counts.items()}
+    invalidate_import_caches(kind, result)
+    return {"success": True, "message": "导入完成", **result.to_dict()}
+
+def invalidate_import_caches(kind, result):
+    if result.inserted:
+        # 导入可能补录历史日期，同时使这些日期的每日汇总失效
+        page_cache.invalidate(*IMPORT_CACHE_TAGS[kind], *day_tags(kind, result.days))
+        if kind == "pigs":
+            ear_tag_index.invalidate()
+
+# 新增API：流式导出
+@router.get("/export/{kind}")
+async def export_data(
+    kind: str,
+    format: str = "csv",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    pen_id: Optional[int] = None,
+    house_id: Optional[int] = None,
+    user = Depends(get_current_user)
+):
+    """流式导出猪只、喂食、健康、繁育、环境或报警数据（csv、csv.gz、parquet）"""
+    if not user:
+        return JSONResponse(
+            status_code=401,
+            content={"success": False, "message": "请先登录"}
+        )
     
-    # 获取有喂食记录的猪的信息
-    pig_ids = set(record.pig_id for record in feeding_records)
-    pigs_with_records = db.query(Pig).filter(Pig.id.in_(pig_ids)).all()
-    pig_map = {pig.id: pig for pig in pigs_with_records}
+    if kind not in EXPORT_SOURCES:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": f"不支持的导出类型: {kind}"}
+        )
     
-    # 为每条记录添加猪的信息
-    for record in feeding_records:
-        record.pig_info = pig_map.get(record.pig_id)
+    try:
+        check_format(format)
+        start = datetime.datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+        end = datetime.datetime.strptime(end_date, "%Y-%m-%d") + datetime.timedelta(days=1) if end_date else None
+    except (ValueError, ImportError) as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": str(e)}
+        )
+    
+    return StreamingResponse(
+        iter_export(kind, format, start, end, pen_id, house_id),
+        media_type=EXPORT_FORMATS[format][1],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(kind, format)}"'}
+    )
+
+@router.get("/feeding", response_class=HTMLResponse)
+def feeding_info(
+    request: Request, 
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: Session = Depends(get_db), 
+    user = Depends(get_current_user)
+):
+    """采食信息页面（喂食明细由页面通过 /pig/api/feeding 分批加载）"""
+    start_date, end_date, start_datetime, end_datetime = feeding_date_range(start_date, end_date)
+    
+    # 按日期统计每日喂食量和各喂食状态次数（历史日期读每日汇总表）
+    daily_stats = feeding_daily_stats(db, start_datetime.date(), end_datetime.date())
+    daily_feed_amount = {
+        day.strftime("%Y-%m-%d"): entry["amount"] for day, entry in sorted(daily_stats.items())
+    }
+    
+    # 统计各喂食状态的比例
+    status_counts = {status: 0 for status in FEED_STATUSES}
+    for entry in daily_stats.values():
+        for status, count in entry["status_counts"].items():
+            if status in status_counts:
+                status_counts[status] += count
+    
+    total_records = sum(entry["count"] for entry in daily_stats.values())
+    total_amount = sum(entry["amount"] for entry in daily_stats.values())
+    status_percents = {status: count / total_records * 100 if total_records > 0 else 0 
+                      for status, count in status_counts.items()}
     
     return templates.TemplateResponse("pig/feeding.html", {
         "request": request,
         "user": user,
         "page_title": "采食信息",
-        "feeding_records": feeding_records,
         "daily_feed_amount": daily_feed_amount,
         "status_counts": status_counts,
         "status_percents": status_percents,
         "start_date": start_date,
         "end_date": end_date,
-        "total_amount": sum(record.feed_amount for record in feeding_records),
+        "total_amount": total_amount,
         "total_records": total_records
     })
 
+@router.get("/api/feeding")
+async def feeding_records_api(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=5000),
+    user = Depends(get_current_user)
+):
+    """按 (feed_time, id) 游标分页，流式返回喂食记录"""
+    if not user:
+        return JSONResponse(
+            status_code=401,
+            content={"success": False, "message": "请先登录"}
+        )
+    
+    try:
+        start_date, end_date, start_datetime, end_datetime = feeding_date_range(start_date, end_date)
+    except ValueError:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": "日期格式应为YYYY-MM-DD"}
+        )
+    
+    cursor_key = decode_cursor(cursor) if cursor else None
+    if cursor and (not cursor_key or cursor_key[0] is None):
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": "无效的分页游标"}
+        )
+    
+    def generate():
+        # 响应流式输出期间使用独立会话，请求依赖中的会话此时可能已关闭
+        db = SessionLocal()
+        try:
+            # 日期范围涉及已归档的月份时，同时查询热表和归档表
+            feeding = record_source("feeding", start_datetime, end_datetime)
+            query = db.query(
+                feeding.c.id,
+                feeding.c.pig_id,
+                feeding.c.feed_time,
+                feeding.c.feed_amount,
+                feeding.c.duration,
+                feeding.c.feed_type,
+                feeding.c.feed_status,
+                feeding.c.automatic,
+                Pig.ear_tag,
+                PigPen.pen_number
+            ).select_from(feeding).outerjoin(
+                Pig, Pig.id == feeding.c.pig_id
+            ).outerjoin(
+                PigPen, PigPen.id == Pig.pen_id
+            ).filter(
+                feeding.c.feed_time >= start_datetime,
+                feeding.c.feed_time < end_datetime
+            )
+            
+            if cursor_key:
+                cursor_time, cursor_id = cursor_key
+                query = query.filter(or_(
+                    feeding.c.feed_time < cursor_time,
+                    and_(feeding.c.feed_time == cursor_time, feeding.c.id < cursor_id)
+                ))
+            
+            rows = query.order_by(
+                feeding.c.feed_time.desc(), feeding.c.id.desc()
+            ).limit(limit).yield_per(500)
+            
+            yield '{"success": true, "records": ['
+            count = 0
+            last = None
+            for row in rows:
+                record = {
+                    "id": row.id,
+                    "pig_id": row.pig_id,
+                    "ear_tag": row.ear_tag,
+                    "pen_number": row.pen_number,
+                    "feed_time": row.feed_time.strftime("%Y-%m-%d %H:%M"),
+                    "feed_amount": row.feed_amount,
+                    "duration": row.duration,
+                    "feed_type": row.feed_type,
+                    "feed_status": row.feed_status,
+                    "automatic": row.automatic
+                }
+                yield ("," if count else "") + json.dumps(record, ensure_ascii=False)
+                count += 1
+                last = row
+            
+            next_cursor = encode_cursor(last.feed_time, last.id) if count == limit else None
+            yield "], " + json.dumps({"count": count, "next_cursor": next_cursor}, ensure_ascii=False)[1:]
+        finally:
+            db.close()
+    
+    return StreamingResponse(generate(), media_type="application/json")
+
 @router.get("/feeding-settings", response_class=HTMLResponse)
-async def feeding_settings(request: Request, db: Session = Depends(get_db), user = Depends(get_current_user)):
+def feeding_settings(request: Request, db: Session = Depends(get_db), user = Depends(get_current_user)):
     """下料设置页面"""
     # 获取所有猪圈
     pig_pens = db.query(PigPen).all()
     
-    # 获取所有下料设置
-    feed_settings = db.query(FeedSetting).all()
+    # 获取所有下料设置，对应的猪圈在同一条查询中加载
+    feed_settings = db.query(FeedSetting).options(joinedload(FeedSetting.pen)).all()
     
-    # 将JSON时间段转换为Python列表
+    # 将JSON时间段转换为列表（解析结果按原始字符串缓存）
     for setting in feed_settings:
-        setting.time_slots_list = json.loads(setting.time_slots)
-        
-        # 查找对应的猪圈
-        setting.pen = db.query(PigPen).filter(PigPen.id == setting.pen_id).first()
+        try:
+            setting.time_slots_list = parse_time_slots(setting.time_slots)
+        except ValueError:
+            setting.time_slots_list = ()
     
     return templates.TemplateResponse("pig/feeding_settings.html", {
         "request": request,
@@ -490,29 +723,62 @@ async def feeding_settings(request: Request, db: Session = Depends(get_db), user
         "feed_settings": feed_settings
     })
 
-@router.get("/daily-summary", response_class=HTMLResponse)
-async def daily_summary(
-    request: Request, 
-    date: Optional[str] = None,
-    db: Session = Depends(get_db), 
+# 新增API：更新下料设置
+@router.put("/feeding-settings/{setting_id}", response_class=JSONResponse)
+def update_feed_setting(
+    setting_id: int,
+    time_slots: str = Form(...),
+    feed_type: Optional[str] = Form(None),
+    enabled: Optional[bool] = Form(None),
+    special_instructions: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
     user = Depends(get_current_user)
 ):
-    """每日汇总页面"""
-    # 设置默认日期为今天
-    if not date:
-        date = datetime.datetime.now().strftime("%Y-%m-%d")
+    """更新下料设置的喂食时间段，time_slots 为JSON，如 [{"time": "06:00", "amount": 1.5}]"""
+    setting = db.query(FeedSetting).filter(FeedSetting.id == setting_id).first()
+    if not setting:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "下料设置不存在"}
+        )
     
-    target_date = datetime.datetime.strptime(date, "%Y-%m-%d")
-    next_date = target_date + datetime.timedelta(days=1)
+    try:
+        slots = parse_time_slots(time_slots)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": str(e)}
+        )
     
-    # 获取当天的喂食记录
-    feeding_records = db.query(FeedingRecord).filter(
-        FeedingRecord.feed_time >= target_date,
-        FeedingRecord.feed_time < next_date
-    ).all()
+    setting.time_slots = json.dumps([{"time": slot.time, "amount": slot.amount} for slot in slots])
+    setting.feeding_times = len(slots)
+    setting.daily_amount = round(sum(slot.amount for slot in slots), 2)
+    if feed_type:
+        setting.feed_type = feed_type
+    if enabled is not None:
+        setting.enabled = enabled
+    if special_instructions is not None:
+        setting.special_instructions = special_instructions
     
-    # 计算总喂食量
-    total_feed_amount = sum(record.feed_amount for record in feeding_records)
+    db.commit()
+    # 只重新编译该猪圈的下料计划
+    feed_scheduler.reload_pen(setting.pen_id)
+    
+    next_due = feed_scheduler.pen_next_due(setting.pen_id)
+    return {
+        "success": True,
+        "message": "更新成功",
+        "next_feed_time": next_due.strftime("%Y-%m-%d %H:%M") if next_due else None
+    }
+
+def build_daily_summary_context(db: Session, target_date):
+    """计算某天的喂食、健康、分娩、环境和报警汇总"""
+    next_date = target_date + datetime.timedelta(days=1)
+    
+    # 当天的喂食统计（历史日期读每日汇总表）
+    feed_stats = feeding_daily_stats(db, target_date.date(), next_date.date()).get(
+        target_date.date(), {"amount": 0, "count": 0}
+    )
     
     # 获取当天的健康记录
     health_records = db.query(HealthRecord).filter(
@@ -530,18 +796,19 @@ async def daily_summary(
     total_born = sum(record.total_born or 0 for record in farrowing_records)
     born_alive = sum(record.born_alive or 0 for record in farrowing_records)
     
-    # 获取当天的环境记录
-    environment_records = db.query(EnvironmentRecord).filter(
-        EnvironmentRecord.record_time >= target_date,
-        EnvironmentRecord.record_time < next_date
-    ).order_by(EnvironmentRecord.record_time).all()
-    
     # 计算平均温湿度
-    avg_temp = sum(record.temperature for record in environment_records) / len(environment_records) if environment_records else 0
-    avg_humidity = sum(record.humidity for record in environment_records) / len(environment_records) if environment_records else 0
+    env_stats = environment_daily_stats(db, target_date.date())
     
     # 获取当天的异常记录
-    abnormal_feeding = [r for r in feeding_records if r.feed_status != "正常"]
+    feeding = record_source("feeding", target_date, next_date)
+    abnormal_feeding = db.execute(
+        feeding.select().where(
+            feeding.c.feed_time >= target_date,
+            feeding.c.feed_time < next_date,
+            # 没有采食状态的记录同样视为异常列出
+            or_(feeding.c.feed_status != "正常", feeding.c.feed_status.is_(None))
+        ).order_by(feeding.c.feed_time)
+    ).all()
     abnormal_health = [r for r in health_records if r.diagnosis != "正常" and r.diagnosis is not None]
     
     # 获取当天的报警
@@ -550,37 +817,56 @@ async def daily_summary(
         Alert.alert_time < next_date
     ).order_by(Alert.alert_time.desc()).all()
     
+    return {
+        "health_records": plain_rows(health_records),
+        "farrowing_records": plain_rows(farrowing_records),
+        "alerts": plain_rows(alerts),
+        "alert_level_counts": alert_daily_counts(db, target_date.date()),
+        "total_feed_amount": feed_stats["amount"],
+        "total_feeding_count": feed_stats["count"],
+        "total_born": total_born,
+        "born_alive": born_alive,
+        "farrowing_count": len(farrowing_records),
+        "environment_count": env_stats["count"],
+        "avg_temp": env_stats["avg_temp"],
+        "avg_humidity": env_stats["avg_humidity"],
+        "abnormal_feeding": [row._asdict() for row in abnormal_feeding],
+        "abnormal_health": plain_rows(abnormal_health)
+    }
+
+@router.get("/daily-summary", response_class=HTMLResponse)
+def daily_summary(
+    request: Request, 
+    date: Optional[str] = None,
+    db: Session = Depends(get_db), 
+    user = Depends(get_current_user)
+):
+    """每日汇总页面"""
+    # 设置默认日期为今天
+    if not date:
+        date = datetime.datetime.now().strftime("%Y-%m-%d")
+    
+    target_date = datetime.datetime.strptime(date, "%Y-%m-%d")
+    
+    # 历史日期的数据不再变化，缓存不过期（补录或删除记录时仍会失效）；当天的数据按有效期缓存
+    is_history = target_date.date() < datetime.date.today()
+    context = page_cache.get_or_compute(
+        ("daily_summary", target_date.date()),
+        lambda: build_daily_summary_context(db, target_date),
+        tags=[tag for kind in DAILY_SUMMARY_KINDS for tag in day_tags(kind, [target_date.date()])] + ["daily_summary"],
+        ttl=None if is_history else -1
+    )
+    
     return templates.TemplateResponse("pig/daily_summary.html", {
         "request": request,
         "user": user,
         "page_title": "每日汇总",
         "date": date,
-        "feeding_records": feeding_records,
-        "health_records": health_records,
-        "farrowing_records": farrowing_records,
-        "environment_records": environment_records,
-        "alerts": alerts,
-        "total_feed_amount": total_feed_amount,
-        "total_feeding_count": len(feeding_records),
-        "total_born": total_born,
-        "born_alive": born_alive,
-        "farrowing_count": len(farrowing_records),
-        "avg_temp": avg_temp,
-        "avg_humidity": avg_humidity,
-        "abnormal_feeding": abnormal_feeding,
-        "abnormal_health": abnormal_health
+        **context
     })
 
-@router.get("/alerts", response_class=HTMLResponse)
-async def alerts(
-    request: Request,
-    status: Optional[str] = None,
-    level: Optional[str] = None,
-    type: Optional[str] = None,
-    db: Session = Depends(get_db),
-    user = Depends(get_current_user)
-):
-    """报警信息页面"""
+def build_alerts_context(db: Session, status, level, type):
+    """按筛选条件查询报警并统计各级别、状态和类型的数量"""
     # 构建查询
     query = db.query(Alert)
     
@@ -618,15 +904,35 @@ async def alerts(
     for t in alert_types:
         type_counts[t] = len([a for a in alerts if a.alert_type == t])
     
+    return {
+        "alerts": plain_rows(alerts),
+        "total_alerts": total_alerts,
+        "level_counts": level_counts,
+        "status_counts": status_counts,
+        "type_counts": type_counts
+    }
+
+@router.get("/alerts", response_class=HTMLResponse)
+def alerts(
+    request: Request,
+    status: Optional[str] = None,
+    level: Optional[str] = None,
+    type: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    """报警信息页面"""
+    context = page_cache.get_or_compute(
+        ("alerts", status, level, type),
+        lambda: build_alerts_context(db, status, level, type),
+        tags=("alerts",)
+    )
+    
     return templates.TemplateResponse("pig/alerts.html", {
         "request": request,
         "user": user,
         "page_title": "报警信息",
-        "alerts": alerts,
-        "total_alerts": total_alerts,
-        "level_counts": level_counts,
-        "status_counts": status_counts,
-        "type_counts": type_counts,
+        **context,
         "filter_status": status,
         "filter_level": level,
         "filter_type": type
@@ -638,5 +944,6 @@ async def control_interface(request: Request, user = Depends(get_current_user)):
     return templates.TemplateResponse("pig/control.html", {
         "request": request,
         "user": user,
-        "page_title": "控制界面"
+        "page_title": "控制界面",
+        "device_summary": device_gateway.summary()
     }) 
\ No newline at end of file
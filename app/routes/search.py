@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+from app.models.database import get_db
+from app.routes.auth import get_current_user
+from app.services.pig_search import search_pigs, ear_tag_index
+
+router = APIRouter(
+    prefix="/pig/api/search",
+    tags=["search"],
+)
+
+def unauthorized():
+    return JSONResponse(
+        status_code=401,
+        content={"success": False, "message": "请先登录"}
+    )
+
+@router.get("")
+def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    """按耳标号、品种或备注搜索猪只（全文索引），耳标号以关键词开头的排在前面"""
+    if not user:
+        return unauthorized()
+    return {"success": True, "pigs": search_pigs(db, q, limit)}
+
+@router.get("/ear-tags")
+def complete_ear_tags(
+    prefix: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    """耳标号前缀补全，从内存中的有序索引查询（首次调用时加载）"""
+    if not user:
+        return unauthorized()
+    ear_tag_index.ensure_loaded(db)
+    return {"success": True, "pigs": ear_tag_index.complete(prefix, limit)}
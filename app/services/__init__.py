@@ -0,0 +1 @@
+# 业务服务层：封装跨路由复用的查询与计算逻辑
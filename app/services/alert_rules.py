@@ -0,0 +1,387 @@
+import datetime
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional, List
+
+from sqlalchemy import bindparam, select
+
+from app.config import ALERT_RULES_FILE
+from app.models.database import SessionLocal, Alert, PigPen
+from app.services.rollup import apply_alert_rows
+
+# 视为未关闭的报警状态
+OPEN_STATUSES = ["未处理", "处理中"]
+
+# 重新加载未关闭报警（运维人员可能已在其他地方处理）的间隔（秒）
+OPEN_ALERT_RELOAD_INTERVAL = 60
+
+# 只实时评估这么多秒以内的读数（不短于规则的最长时间窗口），更早的记录（如批量补录的历史数据）
+# 不生成报警，也不进入规则的滑动窗口
+REALTIME_HORIZON = 3600
+
+# 指标的显示名称和单位
+METRIC_LABELS = {
+    "temperature": ("温度", "°C"),
+    "humidity": ("湿度", "%"),
+    "co2_level": ("二氧化碳浓度", "ppm"),
+    "ammonia_level": ("氨气浓度", "ppm"),
+    "air_quality_index": ("空气质量指数", ""),
+    "feed_amount": ("采食量", "kg"),
+    "duration": ("采食时长", "分钟"),
+}
+
+# 未配置 ALERT_RULES_FILE 时使用的默认规则
+DEFAULT_RULES = [
+    {"type": "threshold", "source": "environment", "metric": "temperature", "min": 20, "max": 26,
+     "alert_type": "温度异常", "alert_level": "重要"},
+    {"type": "rate", "source": "environment", "metric": "temperature", "max_change": 3, "window": 1800,
+     "alert_type": "温度异常", "alert_level": "紧急"},
+    {"type": "sustained", "source": "environment", "metric": "humidity", "min": 50, "max": 75, "duration": 600,
+     "alert_type": "环境异常", "alert_level": "一般"},
+    {"type": "sustained", "source": "environment", "metric": "ammonia_level", "max": 25, "duration": 600,
+     "alert_type": "环境异常", "alert_level": "重要"},
+    {"type": "threshold", "source": "environment", "metric": "co2_level", "max": 1500,
+     "alert_type": "环境异常", "alert_level": "重要"},
+    {"type": "threshold", "source": "feeding", "metric": "feed_amount", "min": 0.5,
+     "alert_type": "采食异常", "alert_level": "一般"},
+]
+
+def describe_range(low, high, unit):
+    if low is not None and high is not None:
+        return f"正常范围：{low:g}-{high:g}{unit}"
+    if low is not None:
+        return f"正常范围：不低于{low:g}{unit}"
+    return f"正常范围：不高于{high:g}{unit}"
+
+@dataclass
+class Rule(ABC):
+    """报警规则基类；scope 为空表示适用于所有猪舍（环境）或猪圈（采食）"""
+    source: str
+    metric: str
+    alert_type: str
+    alert_level: str = "一般"
+    scope: Optional[set] = None
+    rule_id: int = 0
+
+    @abstractmethod
+    def evaluate(self, state, moment, value):
+        """返回 (是否违规, 报警详情)"""
+
+    def new_state(self):
+        return None
+
+@dataclass
+class ThresholdRule(Rule):
+    """读数超出上下限即违规"""
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+    def evaluate(self, state, moment, value):
+        violated = (self.low is not None and value < self.low) or (self.high is not None and value > self.high)
+        label, unit = METRIC_LABELS.get(self.metric, (self.metric, ""))
+        return violated, f"当前{label}{value:.1f}{unit}，{describe_range(self.low, self.high, unit)}"
+
+@dataclass
+class RateOfChangeRule(Rule):
+    """时间窗口内最大值与最小值之差超过 max_change 即违规"""
+    max_change: float = 0
+    window: float = 1800
+
+    def new_state(self):
+        # 单调队列分别维护窗口内的最小值和最大值
+        return {"min": deque(), "max": deque()}
+
+    def evaluate(self, state, moment, value):
+        lows, highs = state["min"], state["max"]
+        while lows and lows[-1][1] >= value:
+            lows.pop()
+        lows.append((moment, value))
+        while highs and highs[-1][1] <= value:
+            highs.pop()
+        highs.append((moment, value))
+
+        horizon = moment - datetime.timedelta(seconds=self.window)
+        while lows[0][0] < horizon:
+            lows.popleft()
+        while highs[0][0] < horizon:
+            highs.popleft()
+
+        change = highs[0][1] - lows[0][1]
+        label, unit = METRIC_LABELS.get(self.metric, (self.metric, ""))
+        minutes = self.window / 60
+        return change > self.max_change, f"{minutes:g}分钟内{label}变化{change:.1f}{unit}，超过{self.max_change:g}{unit}"
+
+@dataclass
+class SustainedRule(Rule):
+    """读数持续超出上下限达到 duration 秒才违规"""
+    low: Optional[float] = None
+    high: Optional[float] = None
+    duration: float = 600
+
+    def new_state(self):
+        return {"since": None}
+
+    def evaluate(self, state, moment, value):
+        outside = (self.low is not None and value < self.low) or (self.high is not None and value > self.high)
+        if not outside:
+            state["since"] = None
+            return False, ""
+        if state["since"] is None:
+            state["since"] = moment
+        lasted = (moment - state["since"]).total_seconds()
+        label, unit = METRIC_LABELS.get(self.metric, (self.metric, ""))
+        return lasted >= self.duration, (
+            f"{label}{value:.1f}{unit}已持续{lasted / 60:.0f}分钟超出范围，{describe_range(self.low, self.high, unit)}"
+        )
+
+RULE_TYPES = {
+    "threshold": ThresholdRule,
+    "rate": RateOfChangeRule,
+    "sustained": SustainedRule,
+}
+
+def build_rule(config, rule_id):
+    """根据配置字典创建规则"""
+    rule_class = RULE_TYPES[config["type"]]
+    kwargs = {
+        "source": config.get("source", "environment"),
+        "metric": config["metric"],
+        "alert_type": config["alert_type"],
+        "alert_level": config.get("alert_level", "一般"),
+        "scope": set(config["scope"]) if config.get("scope") else None,
+        "rule_id": rule_id,
+    }
+    if rule_class is RateOfChangeRule:
+        kwargs.update(max_change=config["max_change"], window=config.get("window", 1800))
+    else:
+        kwargs.update(low=config.get("min"), high=config.get("max"))
+        if rule_class is SustainedRule:
+            kwargs["duration"] = config.get("duration", 600)
+    return rule_class(**kwargs)
+
+def load_rules(path=None):
+    """从JSON文件（ALERT_RULES_FILE）加载规则，未配置时使用默认规则"""
+    path = path or ALERT_RULES_FILE
+    configs = DEFAULT_RULES
+    if path:
+        with open(path, encoding="utf-8") as f:
+            configs = json.load(f)
+    return [build_rule(config, rule_id) for rule_id, config in enumerate(configs, start=1)]
+
+@dataclass
+class OpenAlert:
+    """未关闭的报警，以及当前仍处于违规状态的规则"""
+    alert_id: int
+    alert_time: datetime.datetime
+    active_rules: set = field(default_factory=set)
+
+class AlertRuleEngine:
+    """在内存中增量评估环境和采食读数，生成并去重报警"""
+
+    def __init__(self, rules: List[Rule] = None):
+        self.lock = threading.Lock()
+        self.open_alerts = {}
+        self.open_alerts_loaded_at = 0
+        self.pen_numbers = {}
+        self.listeners = []
+        self.set_rules(rules if rules is not None else load_rules())
+
+    def set_rules(self, rules):
+        """替换规则集，并按 (数据来源, 指标, 猪舍/猪圈) 建立索引，每条读数只评估相关规则"""
+        with self.lock:
+            self.rules = rules
+            # (数据来源, 指标) -> (全局规则列表, {猪舍/猪圈ID: 限定范围的规则列表})
+            self.index = {}
+            for rule in rules:
+                global_rules, scoped_rules = self.index.setdefault((rule.source, rule.metric), ([], {}))
+                if rule.scope is None:
+                    global_rules.append(rule)
+                else:
+                    for key in rule.scope:
+                        scoped_rules.setdefault(key, []).append(rule)
+            self.states = {}
+
+    def rules_for(self, source, metric, key):
+        entry = self.index.get((source, metric))
+        if entry is None:
+            return ()
+        global_rules, scoped_rules = entry
+        scoped = scoped_rules.get(key)
+        return global_rules + scoped if scoped else global_rules
+
+    def add_listener(self, callback):
+        """注册新报警的回调，参数为新写入的报警字典列表"""
+        self.listeners.append(callback)
+
+    def location_of(self, source, key):
+        if source == "environment":
+            return f"猪舍{key}"
+        return f"圈舍{self.pen_numbers.get(key, key)}"
+
+    def load_open_alerts(self, conn):
+        """从数据库加载未关闭的报警，用于去重"""
+        rows = conn.execute(
+            select(Alert.id, Alert.location, Alert.alert_type, Alert.alert_time)
+            .where(Alert.status.in_(OPEN_STATUSES))
+        )
+        previous = self.open_alerts
+        self.open_alerts = {}
+        for alert_id, location, alert_type, alert_time in rows:
+            key = (location, alert_type)
+            active = previous[key].active_rules if key in previous and previous[key].alert_id == alert_id else set()
+            self.open_alerts[key] = OpenAlert(alert_id, alert_time, active)
+        self.pen_numbers = dict(conn.execute(select(PigPen.id, PigPen.pen_number)).all())
+        self.open_alerts_loaded_at = time.monotonic()
+
+    def evaluate(self, source, readings, key_field, time_field):
+        """评估一批读数，返回 (新报警, 需更新持续时间的报警)"""
+        new_alerts = {}
+        cleared = {}
+        for reading in readings:
+            key = reading.get(key_field)
+            moment = reading.get(time_field)
+            if key is None or moment is None:
+                continue
+            location = self.location_of(source, key)
+
+            for metric, value in reading.items():
+                if value is None:
+                    continue
+                for rule in self.rules_for(source, metric, key):
+                    state_key = (rule.rule_id, key)
+                    if state_key not in self.states:
+                        self.states[state_key] = {"state": rule.new_state(), "last": None}
+                    entry = self.states[state_key]
+                    if entry["last"] is not None and moment < entry["last"] and not isinstance(rule, ThresholdRule):
+                        # 时间乱序的读数不参与窗口类规则
+                        continue
+                    entry["last"] = moment
+
+                    violated, details = rule.evaluate(entry["state"], moment, value)
+                    alert_key = (location, rule.alert_type)
+                    open_alert = self.open_alerts.get(alert_key)
+                    if violated:
+                        if open_alert is None:
+                            open_alert = self.open_alerts[alert_key] = OpenAlert(None, moment)
+                            new_alerts[alert_key] = {
+                                "alert_time": moment,
+                                "alert_type": rule.alert_type,
+                                "alert_level": rule.alert_level,
+                                "location": location,
+                                "details": f"{location}{rule.alert_type}，{details}",
+                                "status": "未处理",
+                            }
+                        open_alert.active_rules.add(rule.rule_id)
+                        cleared.pop(alert_key, None)
+                    elif open_alert is not None and rule.rule_id in open_alert.active_rules:
+                        open_alert.active_rules.discard(rule.rule_id)
+                        if not open_alert.active_rules:
+                            # 所有规则都恢复正常，记录报警持续时间
+                            cleared[alert_key] = moment
+        return new_alerts, cleared
+
+    def process(self, source, readings, key_field, time_field):
+        """评估读数，并在一个事务内写入新报警和持续时间"""
+        if not readings:
+            return []
+        with self.lock:
+            db = SessionLocal()
+            try:
+                conn = db.connection()
+                if time.monotonic() - self.open_alerts_loaded_at > OPEN_ALERT_RELOAD_INTERVAL:
+                    self.load_open_alerts(conn)
+
+                new_alerts, cleared = self.evaluate(source, readings, key_field, time_field)
+                self.insert_alerts(conn, new_alerts)
+
+                durations = []
+                for alert_key, moment in cleared.items():
+                    open_alert = self.open_alerts[alert_key]
+                    if open_alert.alert_id is None:
+                        continue
+                    minutes = int((moment - open_alert.alert_time).total_seconds() // 60)
+                    durations.append({"alert_id": open_alert.alert_id, "minutes": max(minutes, 0)})
+                if durations:
+                    conn.execute(
+                        Alert.__table__.update().where(Alert.id == bindparam("alert_id"))
+                        .values(duration=bindparam("minutes")),
+                        durations
+                    )
+                db.commit()
+            except Exception:
+                db.rollback()
+                # 状态可能与数据库不一致，下次处理时重新加载
+                self.open_alerts_loaded_at = 0
+                raise
+            finally:
+                db.close()
+
+        created = list(new_alerts.values())
+        self.notify(created)
+        return created
+
+    def insert_alerts(self, conn, new_alerts):
+        """写入新报警 {(位置, 报警类型): 报警字典}，并累加到每日报警汇总表"""
+        for alert_key, alert in new_alerts.items():
+            alert_id = conn.execute(Alert.__table__.insert(), alert).inserted_primary_key[0]
+            alert["id"] = alert_id
+            self.open_alerts[alert_key].alert_id = alert_id
+        apply_alert_rows(conn, list(new_alerts.values()))
+
+    def notify(self, created):
+        for callback in self.listeners:
+            try:
+                callback(created)
+            except Exception as e:
+                print(f"报警回调出错: {e}")
+
+    def raise_alerts(self, alerts):
+        """写入规则引擎之外（如采食分析任务）产生的报警，同一位置同类型已有未关闭报警时跳过"""
+        if not alerts:
+            return []
+        with self.lock:
+            db = SessionLocal()
+            try:
+                conn = db.connection()
+                if time.monotonic() - self.open_alerts_loaded_at > OPEN_ALERT_RELOAD_INTERVAL:
+                    self.load_open_alerts(conn)
+                new_alerts = {}
+                for alert in alerts:
+                    alert_key = (alert["location"], alert["alert_type"])
+                    if alert_key in self.open_alerts or alert_key in new_alerts:
+                        continue
+                    self.open_alerts[alert_key] = OpenAlert(None, alert["alert_time"])
+                    new_alerts[alert_key] = dict(alert, status=alert.get("status") or "未处理")
+                self.insert_alerts(conn, new_alerts)
+                db.commit()
+            except Exception:
+                db.rollback()
+                self.open_alerts_loaded_at = 0
+                raise
+            finally:
+                db.close()
+
+        created = list(new_alerts.values())
+        self.notify(created)
+        return created
+
+    def process_environment(self, rows):
+        """评估环境读数（按猪舍）"""
+        return self.process("environment", rows, "pig_house_id", "record_time")
+
+    @staticmethod
+    def recent(rows, time_key, now=None):
+        """筛选出需要实时评估的读数（REALTIME_HORIZON 以内）"""
+        cutoff = (now or datetime.datetime.now()) - datetime.timedelta(seconds=REALTIME_HORIZON)
+        return [row for row in rows if row[time_key] >= cutoff]
+
+    def process_feeding(self, rows):
+        """评估喂食记录（按猪圈），rows 需包含 pen_id"""
+        return self.process("feeding", rows, "pen_id", "feed_time")
+
+# 应用内共享的规则引擎
+alert_engine = AlertRuleEngine()
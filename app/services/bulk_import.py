@@ -0,0 +1,386 @@
+import argparse
+import csv
+import datetime
+import io
+import os
+from dataclasses import dataclass, field
+from typing import List
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.database import (
+    SessionLocal, PigHouse, PigPen, Pig, FeedingRecord, HealthRecord, BreedingRecord
+)
+from app.services.rollup import apply_feeding_rows
+from app.services.alert_rules import alert_engine
+from app.services.page_cache import days_of
+
+# 每批校验和写入的行数
+DEFAULT_CHUNK_SIZE = 5000
+
+# 错误明细最多保留的条数
+MAX_ERRORS = 200
+
+DATETIME_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y/%m/%d"]
+TRUE_VALUES = {"1", "true", "yes", "y", "是", "自动"}
+FALSE_VALUES = {"0", "false", "no", "n", "否", "手动"}
+
+class ImportRowError(ValueError):
+    """单行数据校验失败"""
+
+class ImportFileError(ValueError):
+    """文件无法继续读取（如编码错误），result 为出错前已经导入的结果"""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+@dataclass
+class ImportResult:
+    """导入结果"""
+    kind: str
+    total_rows: int = 0
+    inserted: int = 0
+    error_count: int = 0
+    errors: List[dict] = field(default_factory=list)
+    days: set = field(default_factory=set)  # 导入记录涉及的日期，用于使对应日期的页面缓存失效
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"row": row_number, "message": message})
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "total_rows": self.total_rows,
+            "inserted": self.inserted,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+# 字段解析函数
+def parse_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def parse_datetime(value):
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    text = str(value).strip()
+    if not text:
+        return None
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ImportRowError(f"无法识别的日期: {text}")
+
+def parse_float(value):
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ImportRowError(f"无法识别的数值: {value}")
+
+def parse_int(value):
+    number = parse_float(value)
+    return int(number) if number is not None else None
+
+def parse_bool(value):
+    if value is None or isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if not text:
+        return None
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ImportRowError(f"无法识别的布尔值: {value}")
+
+# 各类数据的列定义：列名 -> (解析函数, 是否必填, 默认值)
+IMPORT_COLUMNS = {
+    "pigs": {
+        "ear_tag": (parse_text, True, None),
+        "birth_date": (parse_datetime, False, None),
+        "breed": (parse_text, False, None),
+        "gender": (parse_text, False, "母"),
+        "weight": (parse_float, False, None),
+        "backfat_thickness": (parse_float, False, None),
+        "status": (parse_text, False, "正常"),
+        "health_status": (parse_text, False, "健康"),
+        "pen_number": (parse_text, False, None),
+        "entry_date": (parse_datetime, False, None),
+        "notes": (parse_text, False, None),
+    },
+    "feeding": {
+        "ear_tag": (parse_text, True, None),
+        "feed_time": (parse_datetime, True, None),
+        "feed_amount": (parse_float, True, None),
+        "duration": (parse_int, False, None),
+        "feed_type": (parse_text, False, None),
+        "feed_status": (parse_text, False, "正常"),
+        "automatic": (parse_bool, False, True),
+    },
+    "health": {
+        "ear_tag": (parse_text, True, None),
+        "record_date": (parse_datetime, True, None),
+        "temperature": (parse_float, False, None),
+        "symptoms": (parse_text, False, None),
+        "diagnosis": (parse_text, False, None),
+        "treatment": (parse_text, False, None),
+        "vet_name": (parse_text, False, None),
+        "follow_up_date": (parse_datetime, False, None),
+    },
+    "breeding": {
+        "ear_tag": (parse_text, True, None),
+        "breeding_date": (parse_datetime, True, None),
+        "expected_farrowing_date": (parse_datetime, False, None),
+        "actual_farrowing_date": (parse_datetime, False, None),
+        "total_born": (parse_int, False, None),
+        "born_alive": (parse_int, False, None),
+        "stillborn": (parse_int, False, None),
+        "weaned": (parse_int, False, None),
+        "weaning_date": (parse_datetime, False, None),
+        "notes": (parse_text, False, None),
+    },
+}
+
+# 各类记录中按日期汇总的时间列
+IMPORT_DAY_COLUMNS = {
+    "feeding": ["feed_time"],
+    "health": ["record_date"],
+    "breeding": ["breeding_date", "actual_farrowing_date"],
+}
+
+IMPORT_MODELS = {
+    "pigs": Pig,
+    "feeding": FeedingRecord,
+    "health": HealthRecord,
+    "breeding": BreedingRecord,
+}
+
+def iter_csv_rows(stream):
+    """逐行读取CSV（二进制流），兼容带BOM的UTF-8，遇到其他编码（如Excel默认的GBK）时抛出 ImportFileError"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    try:
+        for row in reader:
+            yield row
+    except UnicodeDecodeError:
+        # 按块解码，出错的字节在已读取的行之后
+        raise ImportFileError(
+            f"第 {reader.line_num + 1} 行或之后的内容不是UTF-8编码（可能是GBK），"
+            "请将文件另存为“CSV UTF-8”格式后重新导入未导入的行"
+        )
+    finally:
+        text.detach()
+
+def iter_excel_rows(stream):
+    """逐行读取Excel第一个工作表，需要安装openpyxl"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("导入Excel文件需要安装openpyxl：pip install openpyxl")
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        names = [str(name).strip() if name is not None else "" for name in header]
+        for values in rows:
+            if values is None or all(value is None for value in values):
+                continue
+            yield dict(zip(names, values))
+    finally:
+        workbook.close()
+
+def iter_rows(stream, filename):
+    """根据文件扩展名选择CSV或Excel读取方式"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return iter_excel_rows(stream)
+    return iter_csv_rows(stream)
+
+def iter_chunks(rows, chunk_size):
+    """把行迭代器按 chunk_size 分批，附带从2开始的行号（第1行为表头）"""
+    chunk = []
+    for row_number, row in enumerate(rows, start=2):
+        chunk.append((row_number, row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class BulkImporter:
+    """分批校验并批量写入猪只、喂食、健康和繁育记录"""
+
+    def __init__(self, db: Session, kind: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if kind not in IMPORT_COLUMNS:
+            raise ValueError(f"不支持的导入类型: {kind}")
+        self.db = db
+        self.kind = kind
+        self.chunk_size = chunk_size
+        self.columns = IMPORT_COLUMNS[kind]
+        self.model = IMPORT_MODELS[kind]
+        self.result = ImportResult(kind=kind)
+
+        # 耳标号和猪圈编号的内存查找表，整个导入过程中只查询一次
+        self.pigs_by_tag = {
+            ear_tag: (pig_id, pen_id)
+            for ear_tag, pig_id, pen_id in db.execute(select(Pig.ear_tag, Pig.id, Pig.pen_id))
+        }
+        self.pens_by_number = {}
+        if kind == "pigs":
+            self.pens_by_number = dict(db.execute(select(PigPen.pen_number, PigPen.id)).all())
+
+    def parse_row(self, row):
+        """按列定义解析一行，返回字段字典"""
+        values = {}
+        for name, (parser, required, default) in self.columns.items():
+            value = parser(row.get(name))
+            if value is None:
+                if required:
+                    raise ImportRowError(f"缺少必填列 {name}")
+                value = default
+            values[name] = value
+        return values
+
+    def build_mapping(self, values, seen_tags):
+        """把解析后的字段转换为待插入的行"""
+        ear_tag = values.pop("ear_tag")
+        if self.kind == "pigs":
+            if ear_tag in self.pigs_by_tag or ear_tag in seen_tags:
+                raise ImportRowError(f"耳标号已存在: {ear_tag}")
+            seen_tags.add(ear_tag)
+
+            pen_number = values.pop("pen_number")
+            pen_id = None
+            if pen_number:
+                pen_id = self.pens_by_number.get(pen_number)
+                if pen_id is None:
+                    raise ImportRowError(f"猪圈不存在: {pen_number}")
+
+            now = datetime.datetime.now()
+            values.update(ear_tag=ear_tag, pen_id=pen_id, last_update=now)
+            if values["entry_date"] is None:
+                values["entry_date"] = now
+            return values
+
+        pig = self.pigs_by_tag.get(ear_tag)
+        if pig is None:
+            raise ImportRowError(f"耳标号不存在: {ear_tag}")
+        values["pig_id"] = pig[0]
+        return values
+
+    def import_chunk(self, chunk):
+        """校验一批数据，并在一个事务内批量写入其中的有效行"""
+        mappings = []
+        seen_tags = set()
+        for row_number, row in chunk:
+            self.result.total_rows += 1
+            try:
+                mappings.append(self.build_mapping(self.parse_row(row), seen_tags))
+            except ImportRowError as e:
+                self.result.add_error(row_number, str(e))
+
+        if not mappings:
+            return
+
+        feeding_rows = []
+        try:
+            conn = self.db.connection()
+            conn.execute(self.model.__table__.insert(), mappings)
+
+            if self.kind == "pigs":
+                # 记录新猪只的ID，供同一批次之后的查找使用
+                tags = [mapping["ear_tag"] for mapping in mappings]
+                for ear_tag, pig_id, pen_id in conn.execute(
+                    select(Pig.ear_tag, Pig.id, Pig.pen_id).where(Pig.ear_tag.in_(tags))
+                ):
+                    self.pigs_by_tag[ear_tag] = (pig_id, pen_id)
+            elif self.kind == "feeding":
+                # 批量插入不触发ORM事件，这里直接累加每日采食汇总
+                pen_of_pig = {pig_id: pen_id for pig_id, pen_id in self.pigs_by_tag.values()}
+                feeding_rows = [dict(mapping, pen_id=pen_of_pig.get(mapping["pig_id"])) for mapping in mappings]
+                apply_feeding_rows(conn, feeding_rows)
+
+            self.db.commit()
+            self.result.inserted += len(mappings)
+            for name in IMPORT_DAY_COLUMNS.get(self.kind, ()):
+                self.result.days.update(days_of(mappings, name))
+        except Exception:
+            self.db.rollback()
+            raise
+
+        # 只有最近的喂食记录按时间顺序交给报警规则引擎评估，历史补录不生成报警
+        feeding_rows = alert_engine.recent(feeding_rows, "feed_time")
+        if feeding_rows:
+            feeding_rows.sort(key=lambda row: row["feed_time"])
+            alert_engine.process_feeding(feeding_rows)
+
+    def run(self, rows):
+        for chunk in iter_chunks(rows, self.chunk_size):
+            self.import_chunk(chunk)
+        if self.kind == "pigs" and self.result.inserted:
+            recount_pen_and_house_counts(self.db)
+        return self.result
+
+def recount_pen_and_house_counts(db: Session):
+    """根据猪只表重新计算猪圈和猪舍的当前数量"""
+    pen_count = select(func.count(Pig.id)).where(Pig.pen_id == PigPen.id).scalar_subquery()
+    db.execute(update(PigPen).values(current_count=pen_count))
+
+    house_count = select(func.coalesce(func.sum(PigPen.current_count), 0)).where(
+        PigPen.pig_house_id == PigHouse.id
+    ).scalar_subquery()
+    db.execute(update(PigHouse).values(current_count=house_count))
+    db.commit()
+
+def import_file(db: Session, kind: str, stream, filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """从CSV或Excel文件流导入数据，返回ImportResult；文件无法读取时抛出带已导入结果的 ImportFileError"""
+    importer = BulkImporter(db, kind, chunk_size)
+    try:
+        return importer.run(iter_rows(stream, filename))
+    except ImportFileError as e:
+        e.result = importer.result
+        raise
+
+def import_file_in_session(kind: str, stream, filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """在独立的数据库会话中导入，供线程池调用，不与请求共用会话"""
+    db = SessionLocal()
+    try:
+        return import_file(db, kind, stream, filename, chunk_size)
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="从CSV/Excel批量导入猪只及各类记录")
+    parser.add_argument("kind", choices=sorted(IMPORT_COLUMNS))
+    parser.add_argument("path", help="CSV或xlsx文件路径")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with open(args.path, "rb") as stream:
+        try:
+            result = import_file_in_session(args.kind, stream, args.path, args.chunk_size)
+        except ImportFileError as e:
+            raise SystemExit(f"{e}（已导入 {e.result.inserted} 行）")
+
+    print(f"共 {result.total_rows} 行，成功导入 {result.inserted} 行，失败 {result.error_count} 行")
+    for error in result.errors:
+        print(f"  第 {error['row']} 行: {error['message']}")
+
+if __name__ == "__main__":
+    main()
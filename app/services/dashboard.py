@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+import datetime
+
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from app.models.database import Pig
+from app.services.rollup import feeding_daily_stats
+
+# 首页统计的状态与健康状态（顺序即饼图顺序）
+PIG_STATUSES = ["妊娠", "哺乳", "休息", "正常", "分娩", "治疗", "淘汰"]
+HEALTH_STATUSES = ["健康", "待观察", "治疗中", "隔离中"]
+
+# 背膘厚度区间：(下限, 上限, 标签)，上限为None表示不设上限
+BACKFAT_RANGES = [
+    (0, 10, "0-10mm"),
+    (10, 15, "10-15mm"),
+    (15, 20, "15-20mm"),
+    (20, 25, "20-25mm"),
+    (25, None, ">25mm"),
+]
+
+@dataclass
+class DashboardSnapshot:
+    """首页统计快照"""
+    total_pigs: int = 0
+    status_counts: Dict[str, int] = field(default_factory=dict)
+    health_counts: Dict[str, int] = field(default_factory=dict)
+    backfat_counts: Dict[str, int] = field(default_factory=dict)
+    daily_feed: Dict[datetime.date, float] = field(default_factory=dict)
+    today_feed: float = 0
+    week_feed: float = 0
+    month_feed: float = 0
+
+    @property
+    def feed_chart_data(self) -> List[dict]:
+        """近7天饲料消耗折线图数据"""
+        days = sorted(self.daily_feed)[-7:]
+        return [
+            {"date": day.strftime("%m-%d"), "value": round(self.daily_feed[day], 1)}
+            for day in days
+        ]
+
+    @property
+    def backfat_chart_data(self) -> List[dict]:
+        """背膘厚度分布柱状图数据"""
+        return [
+            {"range": label, "count": self.backfat_counts.get(label, 0)}
+            for _, _, label in BACKFAT_RANGES
+        ]
+
+    @property
+    def status_chart_data(self) -> List[dict]:
+        """猪只状态分布饼图数据"""
+        return [
+            {"name": name, "value": self.status_counts.get(name, 0)}
+            for name in PIG_STATUSES
+        ]
+
+def count_pig_statuses(db: Session, snapshot: DashboardSnapshot):
+    """一次GROUP BY统计猪只总数、各状态及各健康状态数量"""
+    rows = db.query(
+        Pig.status, Pig.health_status, func.count(Pig.id)
+    ).group_by(Pig.status, Pig.health_status).all()
+
+    status_counts = {name: 0 for name in PIG_STATUSES}
+    health_counts = {name: 0 for name in HEALTH_STATUSES}
+    total = 0
+    for pig_status, health_status, count in rows:
+        total += count
+        if pig_status in status_counts:
+            status_counts[pig_status] += count
+        if health_status in health_counts:
+            health_counts[health_status] += count
+
+    snapshot.total_pigs = total
+    snapshot.status_counts = status_counts
+    snapshot.health_counts = health_counts
+
+def count_backfat_ranges(db: Session, snapshot: DashboardSnapshot):
+    """一次CASE分桶查询统计背膘厚度分布"""
+    columns = []
+    for low, high, label in BACKFAT_RANGES:
+        if high is None:
+            condition = Pig.backfat_thickness >= low
+        else:
+            condition = (Pig.backfat_thickness >= low) & (Pig.backfat_thickness < high)
+        columns.append(func.sum(case((condition, 1), else_=0)).label(label))
+
+    row = db.query(*columns).one()
+    snapshot.backfat_counts = {
+        label: row[i] or 0 for i, (_, _, label) in enumerate(BACKFAT_RANGES)
+    }
+
+def sum_daily_feed(db: Session, snapshot: DashboardSnapshot, today: datetime.datetime):
+    """按天汇总得到近7天、本周和本月饲料消耗（历史日期读每日汇总表）"""
+    tomorrow = today + datetime.timedelta(days=1)
+    chart_start = today - datetime.timedelta(days=6)
+    week_start = today - datetime.timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    range_start = min(chart_start, week_start, month_start)
+
+    stats = feeding_daily_stats(db, range_start.date(), tomorrow.date())
+    totals = {day: entry["amount"] for day, entry in stats.items()}
+
+    snapshot.daily_feed = {}
+    for i in range(7):
+        day = (chart_start + datetime.timedelta(days=i)).date()
+        snapshot.daily_feed[day] = totals.get(day, 0)
+    snapshot.today_feed = totals.get(today.date(), 0)
+    snapshot.week_feed = sum(v for d, v in totals.items() if d >= week_start.date())
+    snapshot.month_feed = sum(v for d, v in totals.items() if d >= month_start.date())
+
+def build_dashboard_snapshot(db: Session, today: datetime.datetime = None) -> DashboardSnapshot:
+    """汇总首页所需的全部统计数据"""
+    if today is None:
+        today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    snapshot = DashboardSnapshot()
+    count_pig_statuses(db, snapshot)
+    count_backfat_ranges(db, snapshot)
+    sum_daily_feed(db, snapshot, today)
+    return snapshot
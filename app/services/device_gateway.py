@@ -0,0 +1,334 @@
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.config import DEVICE_COMMAND_TIMEOUT_MS, DEVICE_COMMAND_RETRIES, DEVICE_QUEUE_SIZE, DEVICE_TRANSPORT
+from app.models.database import SessionLocal, PigHouse, PigPen
+
+# 设备类型 -> 支持的命令
+DEVICE_ACTIONS = {
+    "feeder": {"dispense", "stop"},
+    "fan": {"set_speed", "on", "off"},
+    "heater": {"set_temperature", "on", "off"},
+}
+
+DEVICE_KIND_NAMES = {"feeder": "下料器", "fan": "风机", "heater": "加热器"}
+
+# 一次发送给同一设备的最多命令数
+BATCH_SIZE = 20
+
+# 第一次重试前等待的秒数，之后每次翻倍
+RETRY_BACKOFF = 0.2
+
+# 内存中保留的命令数，超出时丢弃最早已完成的命令
+MAX_TRACKED_COMMANDS = 10000
+
+# 命令状态
+QUEUED = "排队中"
+SENT = "已发送"
+ACKED = "已确认"
+REJECTED = "已拒绝"
+FAILED = "失败"
+FINISHED_STATUSES = {ACKED, REJECTED, FAILED}
+
+class DeviceUnavailable(Exception):
+    """设备离线或通信失败，命令可以重发"""
+
+@dataclass
+class Device:
+    id: str
+    kind: str
+    target_id: int  # 下料器对应猪圈ID，风机和加热器对应猪舍ID
+    name: str
+    online: bool = True
+    failures: int = 0  # 连续发送失败次数
+    last_ack_at: Optional[float] = None
+
+@dataclass
+class DeviceCommand:
+    id: int
+    device_id: str
+    action: str
+    params: dict
+    created_at: float
+    status: str = QUEUED
+    attempts: int = 0
+    message: Optional[str] = None
+    finished_at: Optional[float] = None
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "device_id": self.device_id,
+            "action": self.action,
+            "params": self.params,
+            "status": self.status,
+            "attempts": self.attempts,
+            "message": self.message,
+            "latency_ms": round((self.finished_at - self.created_at) * 1000, 1) if self.finished_at else None,
+        }
+
+def load_devices():
+    """按猪圈和猪舍生成设备列表：每个猪圈一台下料器，每个猪舍一台风机和一台加热器"""
+    db = SessionLocal()
+    try:
+        pens = db.execute(select(PigPen.id, PigPen.pen_number)).all()
+        houses = db.execute(select(PigHouse.id, PigHouse.name)).all()
+    finally:
+        db.close()
+    devices = [Device(f"feeder-{pen_id}", "feeder", pen_id, f"圈舍{pen_number}下料器") for pen_id, pen_number in pens]
+    for house_id, name in houses:
+        devices.append(Device(f"fan-{house_id}", "fan", house_id, f"{name}风机"))
+        devices.append(Device(f"heater-{house_id}", "heater", house_id, f"{name}加热器"))
+    return devices
+
+def create_transport(name=DEVICE_TRANSPORT):
+    """根据配置 DEVICE_TRANSPORT 创建网关的传输层，未配置时返回 None"""
+    if not name:
+        return None
+    if name == "simulated":
+        from app.services.device_simulator import SimulatedFleet
+        return SimulatedFleet()
+    raise ValueError(f"不支持的设备传输层: {name}")
+
+class DeviceGateway:
+    """设备命令网关：每台设备一个命令队列和一个发送协程
+
+    同一设备的排队命令合并为一批发送，等待设备逐条确认；超时或通信失败时按退避时间重发，
+    超过重试次数后标记为失败。各设备的发送相互独立，慢设备或离线设备只阻塞自己的队列。
+    除 submit_threadsafe 外的方法都必须在网关所在的事件循环中调用。
+    """
+
+    def __init__(self, timeout=DEVICE_COMMAND_TIMEOUT_MS / 1000, retries=DEVICE_COMMAND_RETRIES,
+                 batch_size=BATCH_SIZE, queue_size=DEVICE_QUEUE_SIZE):
+        self.timeout = timeout
+        self.retries = retries
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.transport = None
+        self.loop = None
+        self.devices = {}
+        self.queues = {}
+        self.workers = {}
+        self.commands = OrderedDict()
+        self.ids = itertools.count(1)
+        self.stats = {"submitted": 0, "acked": 0, "rejected": 0, "failed": 0, "retries": 0, "batches": 0}
+
+    @property
+    def running(self):
+        return self.loop is not None
+
+    async def start(self, transport, devices=None):
+        """在当前事件循环中启动网关，transport 需提供 async connect(devices) 和 async send(device, commands)"""
+        if self.running:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.transport = transport
+        if devices is None:
+            devices = await self.loop.run_in_executor(None, load_devices)
+        self.devices = {device.id: device for device in devices}
+        await transport.connect(list(self.devices.values()))
+
+    async def stop(self):
+        """停止所有发送协程，未发送的命令标记为失败"""
+        if not self.running:
+            return
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        for command in self.commands.values():
+            if not command.finished:
+                self.finish(command, FAILED, "网关已停止")
+        self.workers.clear()
+        self.queues.clear()
+        self.loop = None
+
+    def submit(self, device_id, action, params=None):
+        """把命令放入设备队列，返回 DeviceCommand；设备或命令无效时抛出 ValueError"""
+        if not self.running:
+            raise ValueError("设备网关未启动")
+        device = self.devices.get(device_id)
+        if device is None:
+            raise ValueError(f"设备不存在: {device_id}")
+        if action not in DEVICE_ACTIONS[device.kind]:
+            raise ValueError(f"{DEVICE_KIND_NAMES[device.kind]}不支持命令: {action}")
+        if params is not None and not isinstance(params, dict):
+            raise ValueError("params 必须是JSON对象")
+
+        command = DeviceCommand(
+            next(self.ids), device_id, action, params or {}, time.monotonic(), future=self.loop.create_future()
+        )
+        self.track(command)
+        self.stats["submitted"] += 1
+
+        queue = self.queues.get(device_id)
+        if queue is None:
+            queue = self.queues[device_id] = asyncio.Queue(self.queue_size)
+            self.workers[device_id] = self.loop.create_task(self._worker(device))
+        try:
+            queue.put_nowait(command)
+        except asyncio.QueueFull:
+            self.finish(command, FAILED, "设备命令队列已满")
+        return command
+
+    def submit_threadsafe(self, items):
+        """从其他线程（如下料调度器）提交 [(设备ID, 命令, 参数)]，网关未启动时忽略"""
+        loop = self.loop
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(self._submit_many, items)
+
+    def _submit_many(self, items):
+        for device_id, action, params in items:
+            try:
+                self.submit(device_id, action, params)
+            except ValueError as e:
+                print(f"提交设备命令失败: {e}")
+
+    def submit_feed_commands(self, commands, on_result):
+        """下料调度器的指令回调：转换为对应猪圈下料器的 dispense 命令，下料量为全圈总量（可在任意线程调用）
+
+        每条指令完成（确认、拒绝或失败）后调用 on_result(指令, 状态, 说明)，网关未启动时直接报告失败。
+        """
+        loop = self.loop
+        if loop is None:
+            for command in commands:
+                on_result(command, FAILED, "设备网关未启动")
+            return
+        loop.call_soon_threadsafe(self._submit_feed, commands, on_result)
+
+    def _submit_feed(self, commands, on_result):
+        for command in commands:
+            try:
+                device_command = self.submit(
+                    f"feeder-{command['pen_id']}", "dispense",
+                    {"amount": command["total_amount"], "per_pig_amount": command["amount"],
+                     "head_count": len(command["pig_ids"]), "feed_type": command["feed_type"],
+                     "setting_id": command["setting_id"]}
+                )
+            except ValueError as e:
+                on_result(command, REJECTED, str(e))
+                continue
+            device_command.future.add_done_callback(
+                lambda future, command=command: on_result(command, future.result().status, future.result().message)
+            )
+
+    async def wait(self, commands, timeout=None):
+        """等待命令完成（确认、拒绝或失败），最多等待 timeout 秒"""
+        futures = [command.future for command in commands if not command.finished]
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+
+    def track(self, command):
+        self.commands[command.id] = command
+        while len(self.commands) > MAX_TRACKED_COMMANDS:
+            oldest = next(iter(self.commands.values()))
+            if not oldest.finished:
+                break
+            self.commands.popitem(last=False)
+
+    def finish(self, command, status, message=None):
+        command.status = status
+        command.message = message
+        command.finished_at = time.monotonic()
+        self.stats[{ACKED: "acked", REJECTED: "rejected", FAILED: "failed"}[status]] += 1
+        if command.future is not None and not command.future.done():
+            command.future.set_result(command)
+
+    async def _worker(self, device):
+        queue = self.queues[device.id]
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._deliver(device, batch)
+            except Exception as e:
+                # 传输层的意外错误不能让设备的发送协程退出
+                for command in batch:
+                    if not command.finished:
+                        self.finish(command, FAILED, f"发送出错: {e}")
+
+    async def _deliver(self, device, batch):
+        """发送一批命令并处理确认，未确认的命令按退避时间重发"""
+        pending = batch
+        message = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+            for command in pending:
+                command.status = SENT
+                command.attempts += 1
+            self.stats["batches"] += 1
+
+            try:
+                acks = await asyncio.wait_for(self.transport.send(device, pending), self.timeout)
+            except asyncio.TimeoutError:
+                message = "设备响应超时"
+            except DeviceUnavailable as e:
+                message = str(e) or "设备不可用"
+            else:
+                device.online = True
+                device.failures = 0
+                device.last_ack_at = time.monotonic()
+                # 设备逐条确认，没有返回确认的命令重发
+                unacked = []
+                for command in pending:
+                    ack = acks.get(command.id)
+                    if ack is None:
+                        unacked.append(command)
+                    else:
+                        ok, detail = ack
+                        self.finish(command, ACKED if ok else REJECTED, detail)
+                pending = unacked
+                message = "设备未确认"
+                if not pending:
+                    return
+                continue
+
+            device.failures += 1
+            device.online = False
+
+        for command in pending:
+            self.finish(command, FAILED, message)
+
+    def device_list(self):
+        """设备状态列表，包括排队命令数和模拟设备的当前状态"""
+        state_of = getattr(self.transport, "state", None)
+        now = time.monotonic()
+        return [
+            {
+                "id": device.id,
+                "kind": device.kind,
+                "kind_name": DEVICE_KIND_NAMES[device.kind],
+                "target_id": device.target_id,
+                "name": device.name,
+                "online": device.online,
+                "queued": self.queues[device.id].qsize() if device.id in self.queues else 0,
+                "last_ack_seconds": round(now - device.last_ack_at, 1) if device.last_ack_at else None,
+                "state": state_of(device.id) if state_of else None,
+            }
+            for device in self.devices.values()
+        ]
+
+    def summary(self):
+        """按设备类型统计设备总数和在线数"""
+        result = {kind: {"name": name, "total": 0, "online": 0} for kind, name in DEVICE_KIND_NAMES.items()}
+        for device in self.devices.values():
+            result[device.kind]["total"] += 1
+            result[device.kind]["online"] += device.online
+        return result
+
+# 应用内共享的设备网关，随应用启动和关闭
+device_gateway = DeviceGateway()
@@ -0,0 +1,99 @@
+import asyncio
+import random
+
+from app.services.device_gateway import DeviceUnavailable
+
+# 风机转速、加热器目标温度的取值范围
+FAN_SPEED_RANGE = (0, 100)
+HEATER_TEMPERATURE_RANGE = (10, 35)
+
+class SimulatedDevice:
+    """一台模拟设备：保存当前状态，按命令更新并返回 (是否成功, 说明)"""
+
+    def __init__(self, device, latency):
+        self.device = device
+        self.latency = latency
+        self.offline = False
+        if device.kind == "feeder":
+            self.state = {"running": True, "dispensed_kg": 0.0, "dispense_count": 0}
+        elif device.kind == "fan":
+            self.state = {"on": True, "speed": 60}
+        else:
+            self.state = {"on": False, "target_temperature": 22.0}
+
+    def apply(self, command):
+        action, params = command.action, command.params
+        if action in ("on", "off"):
+            self.state["on"] = action == "on"
+            return True, "已开启" if action == "on" else "已关闭"
+        if action == "stop":
+            self.state["running"] = False
+            return True, "已停止下料"
+        if action == "dispense":
+            amount = number(params.get("amount"))
+            if amount is None or amount <= 0:
+                return False, "下料量无效"
+            self.state.update(
+                running=True,
+                dispensed_kg=round(self.state["dispensed_kg"] + amount, 3),
+                dispense_count=self.state["dispense_count"] + 1,
+            )
+            return True, f"已下料 {amount}kg"
+        if action == "set_speed":
+            speed = number(params.get("speed"))
+            if speed is None or not FAN_SPEED_RANGE[0] <= speed <= FAN_SPEED_RANGE[1]:
+                return False, f"转速应在 {FAN_SPEED_RANGE[0]}-{FAN_SPEED_RANGE[1]} 之间"
+            self.state.update(on=speed > 0, speed=speed)
+            return True, f"转速已设为 {speed}%"
+        if action == "set_temperature":
+            temperature = number(params.get("temperature"))
+            if temperature is None or not HEATER_TEMPERATURE_RANGE[0] <= temperature <= HEATER_TEMPERATURE_RANGE[1]:
+                return False, f"温度应在 {HEATER_TEMPERATURE_RANGE[0]}-{HEATER_TEMPERATURE_RANGE[1]}°C 之间"
+            self.state.update(on=True, target_temperature=temperature)
+            return True, f"目标温度已设为 {temperature}°C"
+        return False, f"未知命令: {action}"
+
+def number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class SimulatedFleet:
+    """本地模拟设备群，作为设备网关的传输层，用于开发和压测
+
+    每台设备每批命令的往返延迟在 latency 范围内随机，failure_rate 为单次通信失败的概率。
+    slow_devices 中的设备使用 slow_latency（秒），可用于验证慢设备不影响其他设备。
+    """
+
+    def __init__(self, latency=(0.02, 0.1), failure_rate=0.0, slow_devices=(), slow_latency=5.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.slow_devices = set(slow_devices)
+        self.slow_latency = slow_latency
+        self.random = random.Random(seed)
+        self.devices = {}
+
+    async def connect(self, devices):
+        for device in devices:
+            if device.id not in self.devices:
+                self.devices[device.id] = SimulatedDevice(device, self.slow_latency if device.id in self.slow_devices else None)
+
+    def set_offline(self, device_id, offline=True):
+        self.devices[device_id].offline = offline
+
+    def state(self, device_id):
+        simulated = self.devices.get(device_id)
+        return dict(simulated.state) if simulated else None
+
+    async def send(self, device, commands):
+        """模拟一次往返：等待延迟后返回 {命令ID: (是否成功, 说明)}"""
+        simulated = self.devices.get(device.id)
+        if simulated is None:
+            raise DeviceUnavailable("设备未连接")
+        await asyncio.sleep(simulated.latency or self.random.uniform(*self.latency))
+        if simulated.offline:
+            raise DeviceUnavailable("设备离线")
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            raise DeviceUnavailable("通信失败")
+        return {command.id: simulated.apply(command) for command in commands}
@@ -0,0 +1,121 @@
+import calendar
+import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.database import PigHouse
+from app.services.retention import record_source
+from app.utils.dialect import epoch_seconds
+
+# 每个猪舍每项指标返回的最大点数
+DEFAULT_POINTS = 96
+
+# LTTB模式下先在SQL中按 points * LTTB_OVERSAMPLE 个时间桶聚合，再在内存中选点
+LTTB_OVERSAMPLE = 4
+
+ENV_METRICS = ["temperature", "humidity"]
+
+def to_epoch(moment):
+    """与 epoch_seconds 一致：把不带时区的时间按UTC换算为秒数"""
+    return calendar.timegm(moment.timetuple())
+
+def bucket_averages(db: Session, start, end, buckets):
+    """在SQL中把 [start, end) 等分为 buckets 个时间桶，按猪舍求每桶的平均温湿度
+
+    返回 {猪舍ID: [(桶起始秒数, 平均温度, 平均湿度), ...]}，没有读数的桶不返回。
+    """
+    start_epoch = to_epoch(start)
+    bucket_seconds = max(1, -(-(to_epoch(end) - start_epoch) // buckets))
+    environment = record_source("environment", start, end)
+    # 整数相除（各数据库都向零取整，读数不早于 start 时即向下取整），不能用 / 再转换类型：
+    # PostgreSQL 会先按小数相除再四舍五入，桶整体偏移半个桶，末尾的读数还会落到第 buckets 个桶
+    bucket = (epoch_seconds(environment.c.record_time) - start_epoch) // bucket_seconds
+    rows = db.execute(
+        select(
+            environment.c.pig_house_id,
+            bucket.label("bucket"),
+            func.avg(environment.c.temperature),
+            func.avg(environment.c.humidity)
+        )
+        .where(environment.c.record_time >= start, environment.c.record_time < end)
+        .group_by(environment.c.pig_house_id, bucket)
+        .order_by(environment.c.pig_house_id, bucket)
+    )
+    series = {}
+    for house_id, index, temperature, humidity in rows:
+        moment = start_epoch + int(index) * bucket_seconds + bucket_seconds // 2
+        series.setdefault(house_id, []).append((moment, temperature, humidity))
+    return series
+
+def to_milliseconds(moment):
+    """把 to_epoch 得到的秒数换回本地时间，再转换为浏览器使用的毫秒时间戳"""
+    local = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=moment)
+    return int(local.timestamp() * 1000)
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的下标（需要numpy）
+
+    保留首尾两点，其余按等分的桶各选一个与前一选中点、后一桶均值构成三角形面积最大的点，
+    能在点数很少时保留峰值和拐点。
+    """
+    import numpy as np
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 下一个桶的均值点（最后一个桶使用终点）
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (avg_y - y[previous])
+        )
+        previous = lo + int(areas.argmax())
+        selected[i + 1] = previous
+    return selected
+
+def numpy_available():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def environment_series(db: Session, start, end, points=DEFAULT_POINTS, mode="lttb"):
+    """按猪舍返回 [start, end) 的温湿度曲线，每项指标最多 points 个点
+
+    mode 为 "bucket" 时返回时间桶平均值；为 "lttb" 时先细分时间桶再用LTTB保留曲线形状，
+    未安装numpy时退回 "bucket"。返回的数据量只取决于猪舍数和 points，与传感器上报频率无关。
+    """
+    use_lttb = mode == "lttb" and numpy_available()
+    buckets = points * LTTB_OVERSAMPLE if use_lttb else points
+    averages = bucket_averages(db, start, end, buckets)
+    names = dict(db.execute(select(PigHouse.id, PigHouse.name)).all())
+
+    series = []
+    for house_id, rows in sorted(averages.items(), key=lambda item: item[0] or 0):
+        entry = {"house_id": house_id, "name": names.get(house_id) or f"猪舍{house_id}"}
+        for position, metric in enumerate(ENV_METRICS, start=1):
+            points_of_metric = [(to_milliseconds(row[0]), round(row[position], 2)) for row in rows if row[position] is not None]
+            if use_lttb and len(points_of_metric) > points:
+                indexes = lttb([p[0] for p in points_of_metric], [p[1] for p in points_of_metric], points)
+                points_of_metric = [points_of_metric[i] for i in indexes]
+            entry[metric] = points_of_metric
+        series.append(entry)
+    return series
+
+def last_24_hours(now=None):
+    now = now or datetime.datetime.now()
+    return now - datetime.timedelta(hours=24), now
@@ -0,0 +1,243 @@
+import argparse
+import csv
+import datetime
+import io
+import zlib
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.models.database import (
+    SessionLocal, PigPen, Pig, FeedingRecord, HealthRecord, BreedingRecord, EnvironmentRecord, Alert
+)
+from app.services.retention import ARCHIVE_SOURCES, record_source
+
+# 每批从数据库读取并写出的行数
+BATCH_SIZE = 5000
+
+# 可导出的数据：模型、时间筛选列、是否关联猪只（附带耳标号并可按猪圈/猪舍筛选）
+EXPORT_SOURCES = {
+    "pigs": (Pig, Pig.entry_date, False),
+    "feeding": (FeedingRecord, FeedingRecord.feed_time, True),
+    "health": (HealthRecord, HealthRecord.record_date, True),
+    "breeding": (BreedingRecord, BreedingRecord.breeding_date, True),
+    "environment": (EnvironmentRecord, EnvironmentRecord.record_time, False),
+    "alerts": (Alert, Alert.alert_time, False),
+}
+
+# 导出格式：扩展名和响应类型
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv; charset=utf-8"),
+    "csv.gz": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+def export_columns(kind):
+    """导出的列名列表"""
+    model, _, linked_to_pig = EXPORT_SOURCES[kind]
+    names = [column.name for column in model.__table__.columns]
+    if linked_to_pig:
+        names.append("ear_tag")
+    return names
+
+def build_export_query(kind, start=None, end=None, pen_id=None, house_id=None):
+    """构建导出查询，start/end 为时间范围（左闭右开）"""
+    model, time_column, linked_to_pig = EXPORT_SOURCES[kind]
+    source = model.__table__
+    if kind in ARCHIVE_SOURCES:
+        # 喂食和环境记录同时导出范围内的归档数据
+        source = record_source(kind, start, end)
+        time_column = source.c[time_column.name]
+    columns = list(source.c)
+    query = select(*columns).select_from(source)
+
+    if linked_to_pig:
+        query = select(*columns, Pig.ear_tag).select_from(source).outerjoin(Pig, Pig.id == source.c.pig_id)
+        if pen_id:
+            query = query.where(Pig.pen_id == pen_id)
+        if house_id:
+            query = query.where(Pig.pen_id.in_(select(PigPen.id).where(PigPen.pig_house_id == house_id)))
+    elif model is Pig:
+        if pen_id:
+            query = query.where(Pig.pen_id == pen_id)
+        if house_id:
+            query = query.where(Pig.pen_id.in_(select(PigPen.id).where(PigPen.pig_house_id == house_id)))
+    elif model is EnvironmentRecord:
+        if house_id:
+            query = query.where(source.c.pig_house_id == house_id)
+    elif model is Alert:
+        # 报警位置为“猪舍N”或“圈舍<猪圈编号>”
+        if pen_id:
+            query = query.where(Alert.location.in_(
+                select("圈舍" + PigPen.pen_number).where(PigPen.id == pen_id)
+            ))
+        if house_id:
+            query = query.where(or_(
+                Alert.location == f"猪舍{house_id}",
+                Alert.location.in_(select("圈舍" + PigPen.pen_number).where(PigPen.pig_house_id == house_id))
+            ))
+
+    if start:
+        query = query.where(time_column >= start)
+    if end:
+        query = query.where(time_column < end)
+
+    return query.order_by(source.c.id)
+
+def iter_batches(db: Session, query):
+    """使用服务端游标分批读取查询结果"""
+    result = db.execute(query.execution_options(stream_results=True, yield_per=BATCH_SIZE))
+    for partition in result.partitions(BATCH_SIZE):
+        yield [tuple(row) for row in partition]
+
+def format_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, datetime.date):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+def iter_csv(columns, batches):
+    """逐批生成CSV文本"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows([format_value(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def iter_gzip(chunks):
+    """流式gzip压缩"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+class _ChunkSink:
+    """供Parquet写入器使用的只追加输出，写入的数据由生成器逐段取走"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def iter_parquet(kind, columns, batches):
+    """逐批写出Parquet行组，需要安装pyarrow"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    model = EXPORT_SOURCES[kind][0]
+    table_columns = model.__table__.columns
+    fields = []
+    for name in columns:
+        column = table_columns[name] if name in table_columns else None
+        python_type = column.type.python_type if column is not None else str
+        if python_type is datetime.datetime:
+            arrow_type = pa.timestamp("us")
+        elif python_type is datetime.date:
+            arrow_type = pa.date32()
+        elif python_type is bool:
+            arrow_type = pa.bool_()
+        elif python_type is int:
+            arrow_type = pa.int64()
+        elif python_type is float:
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    schema = pa.schema(fields)
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for batch in batches:
+            arrays = [pa.array([row[i] for row in batch], type=field.type) for i, field in enumerate(fields)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def check_format(export_format):
+    """检查导出格式是否可用，不可用时抛出ValueError或ImportError"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {export_format}")
+    if export_format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ImportError("导出Parquet需要安装pyarrow：pip install pyarrow")
+
+def iter_export(kind, export_format="csv", start=None, end=None, pen_id=None, house_id=None):
+    """生成导出文件内容；使用独立会话，可直接交给StreamingResponse"""
+    columns = export_columns(kind)
+    query = build_export_query(kind, start, end, pen_id, house_id)
+    db = SessionLocal()
+    try:
+        batches = iter_batches(db, query)
+        if export_format == "parquet":
+            yield from iter_parquet(kind, columns, batches)
+        elif export_format == "csv.gz":
+            yield from iter_gzip(iter_csv(columns, batches))
+        else:
+            yield from iter_csv(columns, batches)
+    finally:
+        db.close()
+
+def export_filename(kind, export_format):
+    extension = EXPORT_FORMATS[export_format][0]
+    return f"{kind}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.{extension}"
+
+def main():
+    parser = argparse.ArgumentParser(description="流式导出猪只及各类记录")
+    parser.add_argument("kind", choices=sorted(EXPORT_SOURCES))
+    parser.add_argument("--format", default="csv", choices=sorted(EXPORT_FORMATS))
+    parser.add_argument("--start", help="起始日期 YYYY-MM-DD（含）")
+    parser.add_argument("--end", help="结束日期 YYYY-MM-DD（含）")
+    parser.add_argument("--pen-id", type=int)
+    parser.add_argument("--house-id", type=int)
+    parser.add_argument("--output", help="输出文件路径，默认按类型和时间生成")
+    args = parser.parse_args()
+
+    check_format(args.format)
+    start = datetime.datetime.strptime(args.start, "%Y-%m-%d") if args.start else None
+    end = datetime.datetime.strptime(args.end, "%Y-%m-%d") + datetime.timedelta(days=1) if args.end else None
+    output = args.output or export_filename(args.kind, args.format)
+
+    size = 0
+    with open(output, "wb") as f:
+        for chunk in iter_export(args.kind, args.format, start, end, args.pen_id, args.house_id):
+            f.write(chunk)
+            size += len(chunk)
+    print(f"已导出到 {output}（{size} 字节）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+import argparse
+import datetime
+import threading
+import time
+
+from sqlalchemy import bindparam, distinct, func, select
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from app.config import FEED_ANOMALY_DAYS, FEED_ANOMALY_INTERVAL_MINUTES
+from app.models.database import SessionLocal, FeedingRecord, Pig, PigPen
+from app.services.alert_rules import alert_engine
+from app.services.rollup import FEED_STATUSES, apply_feeding_totals
+from app.utils.dialect import epoch_seconds
+
+# 采食状态在 FEED_STATUSES 中的下标
+NORMAL, LOW, REFUSED, EXCESS = (FEED_STATUSES.index(status) for status in ("正常", "少食", "拒食", "过量"))
+
+# 基线：前若干天的日采食量均值和标准差，有记录的天数不足时不判断
+BASELINE_DAYS = 7
+MIN_BASELINE_DAYS = 3
+
+# 日采食量偏离基线超过多少个标准差判为少食或过量，低于基线的多少比例判为拒食
+Z_THRESHOLD = 2.5
+REFUSAL_RATIO = 0.2
+
+# 标准差下限：基线均值的比例和绝对值(kg)，避免采食很稳定的猪只因微小波动被判为异常
+MIN_STD_RATIO = 0.1
+MIN_STD_KG = 0.1
+
+# 只为最近两天（昨天和今天）的异常生成报警，更早的异常只更新采食状态
+ALERT_DAYS = 2
+
+# 报警详情中最多列出的猪只数
+ALERT_LIST_LIMIT = 5
+
+# 增量分析时每条查询包含的猪只ID数
+ID_CHUNK = 500
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+def epoch_day(day):
+    return (day - EPOCH.date()).days
+
+def day_start(number):
+    return EPOCH + datetime.timedelta(days=int(number))
+
+def require_numpy():
+    if np is None:
+        raise ImportError("采食异常分析需要安装numpy：pip install numpy")
+
+def detect(intake, baseline_days=BASELINE_DAYS, threshold=Z_THRESHOLD):
+    """对 (猪只数, 天数) 的日采食量矩阵（无记录为NaN）做一次向量化计算
+
+    每一天的基线为此前 baseline_days 天（不含当天）有记录的日采食量的均值和标准差，
+    用前缀和一次算出所有猪只、所有天的滚动窗口。返回 (状态下标矩阵, z分数, 基线均值)，
+    无记录或基线不足的天为正常。
+    """
+    require_numpy()
+    present = ~np.isnan(intake)
+    values = np.where(present, intake, 0.0)
+    pigs, days = intake.shape
+
+    def prefix(array):
+        return np.concatenate([np.zeros((pigs, 1)), np.cumsum(array, axis=1)], axis=1)
+
+    sums, squares, counts = prefix(values), prefix(values * values), prefix(present.astype(np.float64))
+    end = np.arange(days)
+    start = np.maximum(end - baseline_days, 0)
+    window_count = counts[:, end] - counts[:, start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (sums[:, end] - sums[:, start]) / window_count
+        variance = (squares[:, end] - squares[:, start]) / window_count - mean * mean
+        std = np.maximum(np.sqrt(np.clip(variance, 0, None)), np.maximum(mean * MIN_STD_RATIO, MIN_STD_KG))
+        z = (intake - mean) / std
+
+    valid = present & (window_count >= MIN_BASELINE_DAYS) & (mean > 0)
+    labels = np.full(intake.shape, NORMAL, dtype=np.int8)
+    labels[valid & (z <= -threshold)] = LOW
+    labels[valid & (z >= threshold)] = EXCESS
+    labels[valid & (intake < mean * REFUSAL_RATIO)] = REFUSED
+    return labels, z, mean
+
+class FeedAnomalyDetector:
+    """采食异常分析：按猪只日采食量的滚动基线标注喂食记录的采食状态，并为最近的异常生成"采食异常"报警
+
+    全量模式分析热表中最近 days 天有喂食记录的全部猪只；增量模式只分析上次之后有新记录的猪只
+    （首次运行时为全量）。已移动到归档表的记录不重新标注。状态变化的记录同时调整每日采食汇总表。
+    """
+
+    def __init__(self, days=FEED_ANOMALY_DAYS, interval_minutes=FEED_ANOMALY_INTERVAL_MINUTES):
+        self.days = days
+        self.interval = interval_minutes * 60
+        self.last_record_id = None
+        self.listeners = []
+        self.lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def add_listener(self, callback):
+        """注册采食状态更新后的回调，参数为本次分析的结果摘要"""
+        self.listeners.append(callback)
+
+    def load(self, conn, first_day, end_day, pig_ids=None):
+        """按 (猪只, 天, 采食状态) 汇总 [first_day, end_day) 的喂食记录，返回行列表"""
+        day = epoch_seconds(FeedingRecord.feed_time) // 86400
+        query = (
+            select(FeedingRecord.pig_id, day, FeedingRecord.feed_status,
+                   func.count(), func.coalesce(func.sum(FeedingRecord.feed_amount), 0))
+            .where(FeedingRecord.feed_time >= day_start(first_day), FeedingRecord.feed_time < day_start(end_day),
+                   FeedingRecord.pig_id.isnot(None))
+            .group_by(FeedingRecord.pig_id, day, FeedingRecord.feed_status)
+        )
+        if pig_ids is None:
+            return conn.execute(query).all()
+        pig_ids = sorted(pig_ids)
+        rows = []
+        for index in range(0, len(pig_ids), ID_CHUNK):
+            rows += conn.execute(query.where(FeedingRecord.pig_id.in_(pig_ids[index:index + ID_CHUNK]))).all()
+        return rows
+
+    def analyze(self, conn, today=None, pig_ids=None, dry_run=False):
+        """分析并写入采食状态，返回 (结果摘要, 报警列表)；不提交事务"""
+        require_numpy()
+        started = time.perf_counter()
+        today = epoch_day(today or datetime.date.today())
+        label_start = today - self.days + 1
+        first_day = label_start - BASELINE_DAYS
+        rows = self.load(conn, first_day, today + 1, pig_ids)
+        summary = {"pigs": 0, "pig_days": 0, "anomalies": {}, "updated": 0, "alerts": 0, "days": []}
+        if not rows:
+            return summary, []
+
+        pig_column, day_column, status_column, count_column, amount_column = zip(*rows)
+        statuses = list(FEED_STATUSES)
+        codes = {status: index for index, status in enumerate(statuses)}
+        for status in set(status_column) - set(codes):
+            codes[status] = len(statuses)
+            statuses.append(status or "")
+        old_codes = np.array([codes[status] for status in status_column], dtype=np.int16)
+        counts = np.array(count_column, dtype=np.int64)
+        amounts = np.array(amount_column, dtype=np.float64)
+        pig_ids, rows_of = np.unique(np.array(pig_column, dtype=np.int64), return_inverse=True)
+        columns = np.array(day_column, dtype=np.int64) - first_day
+        days = today + 1 - first_day
+
+        flat = rows_of * days + columns
+        size = len(pig_ids) * days
+        present = np.bincount(flat, minlength=size) > 0
+        intake = np.where(present, np.bincount(flat, weights=amounts, minlength=size), np.nan).reshape(len(pig_ids), days)
+        labels, z, baseline = detect(intake)
+
+        labeled = columns >= label_start - first_day
+        new_codes = labels.reshape(-1)[flat]
+        changed = labeled & (old_codes != new_codes)
+        window = labels[:, label_start - first_day:]
+        window_present = present.reshape(len(pig_ids), days)[:, label_start - first_day:]
+        summary.update(
+            pigs=len(pig_ids),
+            pig_days=int(window_present.sum()),
+            anomalies={
+                FEED_STATUSES[code]: int(((window == code) & window_present).sum())
+                for code in (LOW, REFUSED, EXCESS)
+            },
+            updated=int(counts[changed].sum()),
+            # 采食状态有变化的日期，用于使这些日期的页面缓存失效
+            days=[EPOCH.date() + datetime.timedelta(days=int(day)) for day in np.unique(columns[changed] + first_day)],
+        )
+
+        pigs = self.load_pigs(conn, pig_ids.tolist())
+        if not dry_run and changed.any():
+            self.write_statuses(conn, pig_ids, days, first_day, flat, changed, old_codes, new_codes,
+                                counts, amounts, statuses, pigs)
+
+        alerts = self.build_alerts(pig_ids, labels, intake, baseline, first_day, today, pigs)
+        summary["alerts"] = len(alerts)
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        return summary, alerts
+
+    def load_pigs(self, conn, pig_ids):
+        """{猪只ID: (耳标号, 猪圈ID, 圈舍编号)}"""
+        query = select(Pig.id, Pig.ear_tag, Pig.pen_id, PigPen.pen_number).outerjoin(PigPen, Pig.pen_id == PigPen.id)
+        pigs = {}
+        for index in range(0, len(pig_ids), ID_CHUNK):
+            for pig_id, ear_tag, pen_id, pen_number in conn.execute(query.where(Pig.id.in_(pig_ids[index:index + ID_CHUNK]))):
+                pigs[pig_id] = (ear_tag, pen_id, pen_number)
+        return pigs
+
+    def write_statuses(self, conn, pig_ids, days, first_day, flat, changed, old_codes, new_codes,
+                       counts, amounts, statuses, pigs):
+        """按 (猪只, 天) 批量更新采食状态，并把变化的记录数和采食量从旧状态移到新状态的汇总行"""
+        cells, first = np.unique(flat[changed], return_index=True)
+        new_of_cell = new_codes[changed][first]
+        conn.execute(
+            FeedingRecord.__table__.update()
+            .where(FeedingRecord.pig_id == bindparam("pig"), FeedingRecord.feed_time >= bindparam("start"),
+                   FeedingRecord.feed_time < bindparam("end"))
+            .values(feed_status=bindparam("status")),
+            [
+                {"pig": int(pig_ids[cell // days]), "start": day_start(first_day + cell % days),
+                 "end": day_start(first_day + cell % days + 1), "status": FEED_STATUSES[code]}
+                for cell, code in zip(cells.tolist(), new_of_cell.tolist())
+            ]
+        )
+
+        totals = {}
+        for cell, old, new, count, amount in zip(flat[changed].tolist(), old_codes[changed].tolist(),
+                                                 new_codes[changed].tolist(), counts[changed].tolist(),
+                                                 amounts[changed].tolist()):
+            day = day_start(first_day + cell % days).date()
+            pen_id = pigs.get(int(pig_ids[cell // days]), (None, None, None))[1] or 0
+            for status, sign in ((statuses[old], -1), (FEED_STATUSES[new], 1)):
+                entry = totals.setdefault((day, pen_id, status), [0, 0.0])
+                entry[0] += sign * count
+                entry[1] += sign * amount
+        apply_feeding_totals(conn, totals)
+
+    def build_alerts(self, pig_ids, labels, intake, baseline, first_day, today, pigs):
+        """最近 ALERT_DAYS 天有异常的猪只按猪圈合并为一条报警，有拒食时为重要报警"""
+        recent = labels[:, today - ALERT_DAYS + 1 - first_day:]
+        rows, columns = np.nonzero(recent != NORMAL)
+        latest = {}
+        for row, column in zip(rows.tolist(), columns.tolist()):
+            latest[row] = column + today - ALERT_DAYS + 1 - first_day
+        by_pen = {}
+        for row, column in sorted(latest.items()):
+            ear_tag, pen_id, pen_number = pigs.get(int(pig_ids[row]), (None, None, None))
+            if pen_id is None:
+                continue
+            by_pen.setdefault((pen_id, pen_number), []).append((
+                ear_tag or f"ID{int(pig_ids[row])}", FEED_STATUSES[labels[row, column]],
+                float(intake[row, column]), float(baseline[row, column])
+            ))
+
+        moment = datetime.datetime.now().replace(microsecond=0)
+        alerts = []
+        for (pen_id, pen_number), items in by_pen.items():
+            location = f"圈舍{pen_number or pen_id}"
+            listed = "、".join(
+                f"{ear_tag}{status}（{amount:.1f}kg，基线{base:.1f}kg）"
+                for ear_tag, status, amount, base in items[:ALERT_LIST_LIMIT]
+            )
+            more = f"等{len(items)}头" if len(items) > ALERT_LIST_LIMIT else f"共{len(items)}头"
+            alerts.append({
+                "alert_time": moment,
+                "alert_type": "采食异常",
+                "alert_level": "重要" if any(item[1] == "拒食" for item in items) else "一般",
+                "location": location,
+                "details": f"{location}采食异常，日采食量偏离基线：{listed}，{more}",
+                "status": "未处理",
+            })
+        return alerts
+
+    def run(self, incremental=True, dry_run=False, today=None):
+        """执行一次分析并提交；增量模式下没有新记录时直接返回 None"""
+        with self.lock:
+            db = SessionLocal()
+            try:
+                conn = db.connection()
+                last_id = conn.execute(select(func.max(FeedingRecord.id))).scalar() or 0
+                pig_ids = None
+                if incremental and self.last_record_id is not None:
+                    if last_id <= self.last_record_id:
+                        return None
+                    pig_ids = conn.execute(
+                        select(distinct(FeedingRecord.pig_id))
+                        .where(FeedingRecord.id > self.last_record_id, FeedingRecord.pig_id.isnot(None))
+                    ).scalars().all()
+                summary, alerts = self.analyze(conn, today, pig_ids, dry_run)
+                if dry_run:
+                    db.rollback()
+                    return summary
+                db.commit()
+                self.last_record_id = last_id
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+        summary["alerts"] = len(alert_engine.raise_alerts(alerts))
+        if summary["updated"]:
+            for callback in self.listeners:
+                try:
+                    callback(summary)
+                except Exception as e:
+                    print(f"采食分析回调出错: {e}")
+        return summary
+
+    def start(self):
+        if not self.interval or (self._thread is not None and self._thread.is_alive()):
+            return
+        if np is None:
+            print("未安装numpy，不启动采食异常分析")
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="feed-anomaly", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.run()
+            except Exception as e:
+                print(f"采食异常分析出错: {e}")
+            self._stopping.wait(self.interval)
+
+# 应用内共享的采食异常分析任务，随应用启动和关闭；未安装numpy时不启动
+feed_anomaly_detector = FeedAnomalyDetector()
+
+def main():
+    parser = argparse.ArgumentParser(description="按日采食量的滚动基线标注采食状态并生成采食异常报警")
+    parser.add_argument("--days", type=int, default=FEED_ANOMALY_DAYS, help="重新标注最近多少天的喂食记录")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写入采食状态和报警")
+    args = parser.parse_args()
+    try:
+        require_numpy()
+    except ImportError as e:
+        raise SystemExit(str(e))
+
+    detector = FeedAnomalyDetector(days=args.days)
+    summary = detector.run(incremental=False, dry_run=args.dry_run)
+    anomalies = "，".join(f"{status} {count}" for status, count in summary["anomalies"].items())
+    action = "需要更新" if args.dry_run else "已更新"
+    print(f"分析 {summary['pigs']} 头猪只的 {summary['pig_days']} 个采食日（{anomalies}），"
+          f"{action} {summary['updated']} 条记录的采食状态，生成报警 {summary['alerts']} 条，"
+          f"耗时 {summary.get('seconds', 0):.2f}s")
+
+if __name__ == "__main__":
+    main()
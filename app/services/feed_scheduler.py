@@ -0,0 +1,410 @@
+import bisect
+import datetime
+import functools
+import heapq
+import json
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import func, select
+
+from app.config import FEED_SCHEDULER
+from app.models.database import SessionLocal, Pig, FeedingRecord, FeedSetting
+from app.services.device_gateway import ACKED
+from app.services.rollup import apply_feeding_rows
+
+# 每个事务写入的下料指令数（每条指令按猪圈内的猪只数生成喂食记录），也是每次查询猪只的猪圈数
+BATCH_SIZE = 500
+
+# 写入喂食记录失败时，已确认的指令留在队列中，最多等待这么多秒后重试
+FLUSH_RETRY_WAIT = 5
+
+# 检查数据库中下料设置是否被（其他进程）修改的间隔秒数
+SETTINGS_CHECK_INTERVAL = 30
+
+# 超过这么多秒仍未执行的时间段视为错过，不再下料（如服务停机期间的时间段）
+MISSED_SLOT_GRACE = 300
+
+# 没有待执行时间段时的最长等待秒数，防止系统时间调整后长时间不检查
+MAX_WAIT = 60
+
+# 已淘汰的猪只不再生成喂食记录
+EXCLUDED_STATUSES = ["淘汰"]
+
+# 一个喂食时间段：当天第几秒、"HH:MM"、每头投喂量(kg)
+TimeSlot = namedtuple("TimeSlot", ["seconds", "time", "amount"])
+
+@functools.lru_cache(maxsize=4096)
+def parse_time_slots(text):
+    """解析 FeedSetting.time_slots（如 [{"time": "06:00", "amount": 1.5}]），返回按时间排序的 TimeSlot 元组
+
+    结果按原始字符串缓存，页面和调度器不会重复解析相同的设置；格式错误时抛出 ValueError。
+    """
+    try:
+        slots = json.loads(text or "[]")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"时间段不是有效的JSON: {e}")
+    if not isinstance(slots, list):
+        raise ValueError("时间段必须是列表")
+
+    parsed = []
+    for slot in slots:
+        if not isinstance(slot, dict):
+            raise ValueError("每个时间段必须包含 time 和 amount")
+        hour, _, minute = str(slot.get("time")).partition(":")
+        if not (hour.isdigit() and minute.isdigit() and int(hour) < 24 and int(minute) < 60):
+            raise ValueError(f"无效的投喂时间: {slot.get('time')}")
+        hour, minute = int(hour), int(minute)
+        try:
+            amount = float(slot.get("amount"))
+        except (TypeError, ValueError):
+            raise ValueError(f"无效的投喂量: {slot.get('amount')}")
+        if amount <= 0:
+            raise ValueError(f"投喂量必须大于0: {amount}")
+        parsed.append(TimeSlot(hour * 3600 + minute * 60, f"{hour:02d}:{minute:02d}", amount))
+    return tuple(sorted(parsed))
+
+class PenPlan:
+    """一个猪圈所有启用设置的时间段，按当天秒数排序，用二分查找下一次下料时间"""
+
+    def __init__(self, entries):
+        # entries: [(当天秒数, 设置ID, 饲料类型, 投喂量)]
+        self.entries = sorted(entries)
+        self.seconds = [entry[0] for entry in self.entries]
+
+    def next_due(self, after):
+        """after 之后（不含）的下一次下料时间"""
+        second = after.hour * 3600 + after.minute * 60 + after.second
+        index = bisect.bisect_right(self.seconds, second)
+        day = after.date()
+        if index == len(self.seconds):
+            index = 0
+            day += datetime.timedelta(days=1)
+        return datetime.datetime.combine(day, datetime.time()) + datetime.timedelta(seconds=self.seconds[index])
+
+    def entries_at(self, due):
+        """同一时刻需要执行的所有时间段（同一猪圈可能有多条设置）"""
+        second = due.hour * 3600 + due.minute * 60 + due.second
+        return self.entries[bisect.bisect_left(self.seconds, second):bisect.bisect_right(self.seconds, second)]
+
+class FeedScheduler:
+    """下料调度器：把启用的下料设置编译为按时间排序的优先队列，到点生成下料指令并批量写入喂食记录
+
+    队列中每个猪圈只保留下一次下料的条目，每次只弹出已到期的条目，不扫描全部设置。
+    设置变化时 reload_pen 只重新编译该猪圈，旧条目按版本号作废，弹出时丢弃；其他进程（如另一个
+    worker）修改的设置由后台线程按 updated_at 定期检查并重新加载。
+    指令交给指令回调（设备网关）发送，设备确认后才写入喂食记录，失败或被拒绝的指令只计数。
+    """
+
+    def __init__(self, enabled=FEED_SCHEDULER, batch_size=BATCH_SIZE):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.plans = {}  # 猪圈ID -> PenPlan
+        self.versions = {}  # 猪圈ID -> 版本号
+        self.heap = []  # (下料时间, 猪圈ID, 版本号)
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.command_listeners = []
+        self.missed = 0
+        self.failed = 0
+        self.acked = queue.Queue()  # 设备已确认、等待写入喂食记录的指令
+        self.settings_seen = None  # 上次加载时下料设置的 (条数, 最近修改时间)
+        self._thread = None
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_listener(self, callback):
+        """注册写入后的回调，参数为已提交的喂食记录列表（包含 pen_id）"""
+        self.listeners.append(callback)
+
+    def add_command_listener(self, callback):
+        """注册下料指令的回调，参数为到期的下料指令列表和结果回调 report_result"""
+        self.command_listeners.append(callback)
+
+    def start(self):
+        if not self.enabled or self.running:
+            return
+        self.reload()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="feed-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        # 停止前已确认的指令仍然写入
+        self.flush_acked()
+        if not self.acked.empty():
+            print(f"停止时仍有 {self.acked.qsize()} 条已确认的下料指令未能写入喂食记录")
+
+    def load_settings(self, rows, now=None):
+        """用 (设置ID, 猪圈ID, 饲料类型, 时间段JSON) 行重建全部猪圈的计划和优先队列"""
+        now = now or datetime.datetime.now()
+        entries_by_pen = {}
+        for setting_id, pen_id, feed_type, time_slots in rows:
+            entries = entries_by_pen.setdefault(pen_id, [])
+            entries += self._compile(setting_id, feed_type, time_slots)
+
+        with self.lock:
+            self.plans = {pen_id: PenPlan(entries) for pen_id, entries in entries_by_pen.items() if entries}
+            self.versions = {pen_id: self.versions.get(pen_id, 0) + 1 for pen_id in self.plans}
+            self.heap = [
+                (plan.next_due(now), pen_id, self.versions[pen_id]) for pen_id, plan in self.plans.items()
+            ]
+            heapq.heapify(self.heap)
+        self._wakeup.set()
+
+    def load_pen(self, pen_id, rows, now=None):
+        """只重新编译一个猪圈的计划，rows 为该猪圈启用的设置行"""
+        now = now or datetime.datetime.now()
+        entries = []
+        for setting_id, _, feed_type, time_slots in rows:
+            entries += self._compile(setting_id, feed_type, time_slots)
+
+        with self.lock:
+            version = self.versions.get(pen_id, 0) + 1
+            self.versions[pen_id] = version
+            if entries:
+                plan = self.plans[pen_id] = PenPlan(entries)
+                heapq.heappush(self.heap, (plan.next_due(now), pen_id, version))
+            else:
+                self.plans.pop(pen_id, None)
+            # 作废条目过多时重建队列，避免频繁修改设置后队列无限增长
+            if len(self.heap) > 2 * len(self.plans) + 64:
+                self.heap = [entry for entry in self.heap if self.versions.get(entry[1]) == entry[2]]
+                heapq.heapify(self.heap)
+        self._wakeup.set()
+
+    @staticmethod
+    def _compile(setting_id, feed_type, time_slots):
+        try:
+            slots = parse_time_slots(time_slots)
+        except ValueError as e:
+            print(f"下料设置 {setting_id} 的时间段无效，已跳过: {e}")
+            return []
+        return [(slot.seconds, setting_id, feed_type, slot.amount) for slot in slots]
+
+    def _query(self, pen_id=None):
+        query = select(FeedSetting.id, FeedSetting.pen_id, FeedSetting.feed_type, FeedSetting.time_slots).where(
+            FeedSetting.enabled.is_(True), FeedSetting.pen_id.isnot(None)
+        )
+        if pen_id is not None:
+            query = query.where(FeedSetting.pen_id == pen_id)
+        db = SessionLocal()
+        try:
+            return db.execute(query).all()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _settings_state():
+        """下料设置的 (条数, 最近修改时间)，用于发现其他进程的修改"""
+        db = SessionLocal()
+        try:
+            return tuple(db.execute(select(func.count(FeedSetting.id), func.max(FeedSetting.updated_at))).one())
+        finally:
+            db.close()
+
+    def reload(self):
+        """从数据库加载全部启用的下料设置"""
+        self.settings_seen = self._settings_state()
+        self.load_settings(self._query())
+
+    def reload_changed(self):
+        """加载上次之后被修改的设置所在的猪圈；设置条数变化（新增或删除）时全部重新加载，返回是否有变化"""
+        state = self._settings_state()
+        if self.settings_seen is None or state[0] != self.settings_seen[0]:
+            self.reload()
+            return True
+        if state == self.settings_seen:
+            return False
+        db = SessionLocal()
+        try:
+            query = select(FeedSetting.pen_id).where(FeedSetting.pen_id.isnot(None)).distinct()
+            if self.settings_seen[1] is not None:
+                query = query.where(FeedSetting.updated_at > self.settings_seen[1])
+            pen_ids = db.execute(query).scalars().all()
+        finally:
+            db.close()
+        self.settings_seen = state
+        for pen_id in pen_ids:
+            self.load_pen(pen_id, self._query(pen_id))
+        return True
+
+    def reload_pen(self, pen_id):
+        """下料设置修改后调用，只重新加载该猪圈"""
+        if self.enabled:
+            self.load_pen(pen_id, self._query(pen_id))
+
+    def next_due(self):
+        """最近一次有效的下料时间，没有计划时返回 None"""
+        with self.lock:
+            while self.heap and self.versions.get(self.heap[0][1]) != self.heap[0][2]:
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def pen_next_due(self, pen_id, now=None):
+        """某个猪圈的下一次下料时间，未启用调度或没有计划时返回 None"""
+        with self.lock:
+            plan = self.plans.get(pen_id)
+        return plan.next_due(now or datetime.datetime.now()) if plan else None
+
+    def pop_due(self, now=None):
+        """弹出 now 之前到期的条目并安排各猪圈的下一次下料，返回下料指令列表"""
+        now = now or datetime.datetime.now()
+        commands = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                due, pen_id, version = heapq.heappop(self.heap)
+                if self.versions.get(pen_id) != version:
+                    continue
+                plan = self.plans[pen_id]
+                if (now - due).total_seconds() > MISSED_SLOT_GRACE:
+                    # 跳过所有已错过的时间段（如停机期间），从宽限期内的第一个时间段继续
+                    self.missed += 1
+                    grace_start = now - datetime.timedelta(seconds=MISSED_SLOT_GRACE)
+                    heapq.heappush(self.heap, (plan.next_due(grace_start), pen_id, version))
+                    continue
+                heapq.heappush(self.heap, (plan.next_due(due), pen_id, version))
+                commands += [
+                    {"pen_id": pen_id, "setting_id": setting_id, "feed_type": feed_type,
+                     "amount": amount, "due_time": due}
+                    for _, setting_id, feed_type, amount in plan.entries_at(due)
+                ]
+        return commands
+
+    def dispatch(self, commands):
+        """把下料指令交给指令回调发送，喂食记录在设备确认后由 report_result 排队写入"""
+        commands = self.attach_pigs(commands)
+        if not commands:
+            return
+        for callback in self.command_listeners:
+            try:
+                callback(commands, self.report_result)
+            except Exception as e:
+                print(f"下料指令回调出错: {e}")
+
+    def attach_pigs(self, commands):
+        """为每条指令记录猪圈内未淘汰的猪只和总下料量（每头投喂量 × 头数），丢弃没有猪只的猪圈"""
+        db = SessionLocal()
+        try:
+            pigs_by_pen = {}
+            pen_ids = list({command["pen_id"] for command in commands})
+            for start in range(0, len(pen_ids), self.batch_size):
+                for pig_id, pen_id in db.execute(
+                    select(Pig.id, Pig.pen_id).where(
+                        Pig.pen_id.in_(pen_ids[start:start + self.batch_size]), Pig.status.notin_(EXCLUDED_STATUSES)
+                    )
+                ):
+                    pigs_by_pen.setdefault(pen_id, []).append(pig_id)
+        finally:
+            db.close()
+
+        result = []
+        for command in commands:
+            pig_ids = pigs_by_pen.get(command["pen_id"])
+            if pig_ids:
+                result.append(dict(command, pig_ids=pig_ids, total_amount=round(command["amount"] * len(pig_ids), 3)))
+        return result
+
+    def report_result(self, command, status, message=None):
+        """设备返回下料结果后调用（可在任意线程）：已确认的指令等待写入，失败或被拒绝的不写入喂食记录"""
+        if status == ACKED:
+            self.acked.put(command)
+            self._wakeup.set()
+        else:
+            self.failed += 1
+            print(f"猪圈{command['pen_id']}下料失败（{status}）: {message}")
+
+    def flush_acked(self):
+        """按批次写入已确认指令的喂食记录，返回写入的指令数
+
+        写入失败时本批次和之后的指令放回队列，下一轮再写入（同一批次在一个事务内，失败时不会部分写入）。
+        """
+        commands = []
+        while True:
+            try:
+                commands.append(self.acked.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(commands), self.batch_size):
+            try:
+                self.write_records(commands[start:start + self.batch_size])
+            except Exception as e:
+                print(f"写入下料记录时出错，{len(commands) - start} 条已确认的指令稍后重试: {e}")
+                for command in commands[start:]:
+                    self.acked.put(command)
+                return start
+        return len(commands)
+
+    def write_records(self, commands):
+        """为已确认指令下料时圈内的每头猪写入一条自动喂食记录，并在同一事务内累加每日采食汇总"""
+        rows = [
+            {"pig_id": pig_id, "pen_id": command["pen_id"], "feed_time": command["due_time"],
+             "feed_amount": command["amount"], "duration": None, "feed_type": command["feed_type"],
+             "feed_status": "正常", "automatic": True}
+            for command in commands for pig_id in command["pig_ids"]
+        ]
+        if not rows:
+            return
+
+        db = SessionLocal()
+        try:
+            conn = db.connection()
+            conn.execute(FeedingRecord.__table__.insert(), [
+                {key: value for key, value in row.items() if key != "pen_id"} for row in rows
+            ])
+            # 批量插入不触发ORM事件，这里直接累加每日采食汇总
+            apply_feeding_rows(conn, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        rows.sort(key=lambda row: row["feed_time"])
+        for callback in self.listeners:
+            try:
+                callback(rows)
+            except Exception as e:
+                print(f"下料记录回调出错: {e}")
+
+    def run_due(self, now=None):
+        """执行所有到期的下料，返回指令数"""
+        commands = self.pop_due(now)
+        self.dispatch(commands)
+        return len(commands)
+
+    def _run(self):
+        checked_at = time.monotonic()
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                self.run_due()
+                self.flush_acked()
+                if time.monotonic() - checked_at >= SETTINGS_CHECK_INTERVAL:
+                    checked_at = time.monotonic()
+                    self.reload_changed()
+            except Exception as e:
+                print(f"执行下料计划时出错: {e}")
+            due = self.next_due()
+            wait = MAX_WAIT if due is None else (due - datetime.datetime.now()).total_seconds()
+            wait = min(wait, SETTINGS_CHECK_INTERVAL - (time.monotonic() - checked_at))
+            if not self.acked.empty():
+                wait = min(wait, FLUSH_RETRY_WAIT)
+            # 设置修改或停止时通过 _wakeup 提前唤醒
+            self._wakeup.wait(min(max(wait, 0), MAX_WAIT))
+
+# 应用内共享的下料调度器，随应用启动和关闭
+feed_scheduler = FeedScheduler()
@@ -0,0 +1,311 @@
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import bindparam, func, select
+
+from app.config import INGESTION_SPILL_FILE
+from app.models.database import SessionLocal, PigHouse, EnvironmentRecord
+from app.services.rollup import apply_environment_rows
+
+# 传感器可上报的数值字段
+METRIC_FIELDS = ["temperature", "humidity", "co2_level", "ammonia_level", "air_quality_index"]
+
+# 单次请求返回的拒收明细上限
+MAX_REJECTED = 100
+
+# 后台写入连续失败时，重试间隔从 flush_interval 起逐次加倍，最长为该秒数
+MAX_RETRY_WAIT = 30
+
+# 遇到未知猪舍时重新加载猪舍列表的最小间隔（秒）
+HOUSE_RELOAD_INTERVAL = 10
+
+class IngestionBusy(Exception):
+    """缓冲队列已满，需要传感器稍后重试
+
+    accepted 为队列满之前已经排队（会被写入）的读数数量，retry_index 为第一条未排队读数的下标，
+    传感器从该下标开始重发即可，不会重复写入。
+    """
+
+    def __init__(self, message, accepted=0, retry_index=0):
+        super().__init__(message)
+        self.accepted = accepted
+        self.retry_index = retry_index
+
+class ReadingError(ValueError):
+    """单条读数校验失败"""
+
+def parse_record_time(value):
+    """解析读数时间：支持ISO字符串和Unix时间戳，缺省为当前时间"""
+    if value is None or value == "":
+        return datetime.datetime.now()
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.datetime.fromtimestamp(value)
+        except (OverflowError, OSError, ValueError):
+            raise ReadingError(f"无效的时间戳: {value}")
+    try:
+        moment = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        raise ReadingError(f"无法识别的时间: {value}")
+    if moment.tzinfo is not None:
+        # 数据库中统一保存本地时间
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+class EnvironmentIngestor:
+    """环境读数写入器：读数先进入内存队列，由后台线程按批次写入数据库"""
+
+    def __init__(self, batch_size=5000, flush_interval=0.5, max_queue=200000, spill_file=INGESTION_SPILL_FILE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.spill_file = spill_file
+        # 写入失败、等待重试的批次；重试成功之前不再从队列取新的读数，队列满后上报接口返回503
+        self.retry_batch = []
+        self.stats = {"written": 0, "flush_errors": 0, "spilled": 0, "lost": 0}
+        self.listeners = []
+        self.house_ids = set()
+        self.house_ids_loaded_at = 0
+        self.latest_times = {}
+        self._thread = None
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_listener(self, callback):
+        """注册写入后的回调，参数为本批次已提交的读数列表"""
+        self.listeners.append(callback)
+
+    def start(self):
+        if self.running:
+            return
+        self.load_house_ids()
+        self.replay_spill()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="environment-ingestor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程，并写入等待重试和队列中剩余的读数；仍无法写入时保存到 spill_file"""
+        if not self.running:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+        rows = self.retry_batch
+        self.retry_batch = []
+        while True:
+            batch = self._drain(0)
+            if not batch:
+                break
+            rows.extend(batch)
+        for start in range(0, len(rows), self.batch_size):
+            try:
+                self.flush(rows[start:start + self.batch_size])
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                print(f"停止时写入环境读数出错: {e}")
+                self.spill(rows[start:])
+                break
+
+    def spill(self, rows):
+        """把无法写入数据库的读数追加到 spill_file，下次启动时重新写入"""
+        if not rows:
+            return
+        try:
+            with open(self.spill_file, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({**row, "record_time": row["record_time"].isoformat()}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            self.stats["lost"] += len(rows)
+            print(f"保存未写入的环境读数失败，丢失 {len(rows)} 条: {e}")
+            return
+        self.stats["spilled"] += len(rows)
+        print(f"{len(rows)} 条环境读数未能写入数据库，已保存到 {self.spill_file}")
+
+    def replay_spill(self):
+        """重新写入上次停止时保存的读数，全部写入后删除文件"""
+        if not self.spill_file or not os.path.exists(self.spill_file):
+            return
+        with open(self.spill_file, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        for row in rows:
+            row["record_time"] = datetime.datetime.fromisoformat(row["record_time"])
+        os.remove(self.spill_file)
+        for start in range(0, len(rows), self.batch_size):
+            try:
+                self.flush(rows[start:start + self.batch_size])
+            except Exception as e:
+                # 只把尚未写入的读数重新保存，下次启动时再试
+                print(f"重新写入上次未保存的环境读数出错: {e}")
+                self.spill(rows[start:])
+                return
+        print(f"已重新写入 {len(rows)} 条上次未保存的环境读数")
+
+    def load_house_ids(self):
+        db = SessionLocal()
+        try:
+            self.house_ids = set(db.execute(select(PigHouse.id)).scalars())
+            self.house_ids_loaded_at = time.monotonic()
+        finally:
+            db.close()
+
+    def validate(self, reading):
+        """校验并规范化一条读数"""
+        if not isinstance(reading, dict):
+            raise ReadingError("读数必须是JSON对象")
+
+        try:
+            house_id = int(reading.get("pig_house_id", reading.get("house_id")))
+        except (TypeError, ValueError):
+            raise ReadingError("缺少或无效的 pig_house_id")
+        if house_id not in self.house_ids:
+            # 可能是新建的猪舍，间隔一段时间后重新加载一次
+            if time.monotonic() - self.house_ids_loaded_at > HOUSE_RELOAD_INTERVAL:
+                self.load_house_ids()
+            if house_id not in self.house_ids:
+                raise ReadingError(f"猪舍不存在: {house_id}")
+
+        row = {
+            "pig_house_id": house_id,
+            "record_time": parse_record_time(reading.get("record_time", reading.get("time"))),
+            "notes": reading.get("notes"),
+        }
+        has_metric = False
+        for name in METRIC_FIELDS:
+            value = reading.get(name)
+            if value is None:
+                row[name] = None
+                continue
+            try:
+                row[name] = float(value)
+            except (TypeError, ValueError):
+                raise ReadingError(f"无效的数值 {name}: {value}")
+            has_metric = True
+        if not has_metric:
+            raise ReadingError("读数中没有任何环境指标")
+        return row
+
+    def submit(self, readings):
+        """校验并提交一批读数，返回 (接收数量, 拒收明细)；队列满时抛出 IngestionBusy，已排队的读数仍会写入"""
+        accepted = []
+        indexes = []
+        rejected = []
+        for index, reading in enumerate(readings):
+            try:
+                accepted.append(self.validate(reading))
+                indexes.append(index)
+            except ReadingError as e:
+                if len(rejected) < MAX_REJECTED:
+                    rejected.append({"index": index, "message": str(e)})
+
+        if not self.running:
+            # 后台线程未启动（如命令行或测试环境）时直接同步写入
+            for start in range(0, len(accepted), self.batch_size):
+                self.flush(accepted[start:start + self.batch_size])
+            return len(accepted), rejected
+
+        for i, row in enumerate(accepted):
+            try:
+                self.queue.put_nowait(row)
+            except queue.Full:
+                raise IngestionBusy(f"写入队列已满，已接收 {i} 条", i, indexes[i])
+        return len(accepted), rejected
+
+    def _drain(self, timeout):
+        """从队列取出最多 batch_size 条读数"""
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        failures = 0
+        while not self._stopping.is_set():
+            batch = self.retry_batch or self._drain(self.flush_interval)
+            if not batch:
+                continue
+            try:
+                self.flush(batch)
+            except Exception as e:
+                # 这些读数已经答复202，写入失败（如数据库暂时不可用）时保留批次，等待后重试
+                failures += 1
+                self.retry_batch = batch
+                self.stats["flush_errors"] += 1
+                print(f"写入环境读数时出错（连续第{failures}次），{len(batch)} 条读数稍后重试: {e}")
+                self._stopping.wait(min(self.flush_interval * 2 ** (failures - 1), MAX_RETRY_WAIT))
+                continue
+            failures = 0
+            self.retry_batch = []
+
+    def flush_pending(self):
+        while True:
+            batch = self._drain(0)
+            if not batch:
+                return
+            self.flush(batch)
+
+    def flush(self, rows):
+        """在一个事务内批量写入读数、累加每日汇总并更新猪舍当前温湿度"""
+        if not rows:
+            return
+        with self._flush_lock:
+            # 只用比已知更新的读数覆盖猪舍当前温湿度
+            latest = {}
+            for row in rows:
+                house_id = row["pig_house_id"]
+                if row["record_time"] < self.latest_times.get(house_id, datetime.datetime.min):
+                    continue
+                if house_id not in latest or row["record_time"] >= latest[house_id]["record_time"]:
+                    latest[house_id] = row
+
+            db = SessionLocal()
+            try:
+                conn = db.connection()
+                conn.execute(EnvironmentRecord.__table__.insert(), rows)
+                apply_environment_rows(conn, rows)
+
+                if latest:
+                    conn.execute(
+                        PigHouse.__table__.update()
+                        .where(PigHouse.id == bindparam("house_id"))
+                        .values(
+                            temperature=func.coalesce(bindparam("new_temperature"), PigHouse.temperature),
+                            humidity=func.coalesce(bindparam("new_humidity"), PigHouse.humidity)
+                        ),
+                        [
+                            {"house_id": house_id, "new_temperature": row["temperature"], "new_humidity": row["humidity"]}
+                            for house_id, row in latest.items()
+                        ]
+                    )
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            for house_id, row in latest.items():
+                self.latest_times[house_id] = row["record_time"]
+            self.stats["written"] += len(rows)
+
+        for callback in self.listeners:
+            try:
+                callback(rows)
+            except Exception as e:
+                print(f"环境读数回调出错: {e}")
+
+# 应用内共享的写入器，随应用启动和关闭
+environment_ingestor = EnvironmentIngestor()
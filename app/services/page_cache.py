@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+
+from app.config import PAGE_CACHE_SIZE, PAGE_CACHE_TTL
+
+# 环境读数写入频繁，由它触发的失效最多每隔这么多秒执行一次
+ENVIRONMENT_INVALIDATE_INTERVAL = 5
+
+def day_tags(kind, days):
+    """按日期缓存的页面（如每日汇总）使用的标签 (数据类型, 日期)，写入只使涉及的日期失效"""
+    return [(kind, day) for day in days]
+
+def days_of(rows, time_key):
+    """记录列表涉及的日期"""
+    return {row[time_key].date() for row in rows if row.get(time_key) is not None}
+
+def plain_rows(objects):
+    """把ORM对象转换为只含列值的字典
+
+    缓存的上下文由多个请求和线程共用，不能保存已脱离会话的ORM实例（访问过期属性或关系时会出错）。
+    """
+    return [
+        {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+        for obj in objects
+    ]
+
+class PageCache:
+    """页面上下文缓存：按 (路由, 参数) 缓存计算结果，带过期时间、LRU淘汰和按数据类型失效
+
+    每个条目带有一组标签（如 "pigs"、"feeding"、"alerts"），写入对应数据后调用
+    invalidate(标签) 删除相关条目。ttl 为 None 的条目不过期（如历史日期的每日汇总），
+    这类条目使用 day_tags 生成的按日期标签，只在写入涉及该日期时失效。
+    计算期间相关标签被失效时不缓存计算结果，避免把失效前读到的数据存为新条目。
+    缓存的上下文只保存普通的值和字典（见 plain_rows），不保存ORM实例。
+    缓存只在当前进程内有效，多worker部署时其他进程的条目靠过期时间更新。
+    """
+
+    def __init__(self, max_entries=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.invalidated_at = {}
+        self.generations = {}  # 标签 -> 失效次数
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags=(), ttl=-1, generations=None):
+        """缓存计算结果；generations 为计算前 tag_generations 的结果，其间有标签被失效时不缓存"""
+        ttl = self.ttl if ttl == -1 else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self.lock:
+            if generations is not None and any(
+                self.generations.get(tag, 0) != generation for tag, generation in generations.items()
+            ):
+                return
+            self.entries[key] = (value, expires_at, frozenset(tags))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute, tags=(), ttl=-1):
+        """返回缓存的值；不存在时调用 compute() 计算并缓存
+
+        同一个键同时只有一个请求在计算，其余请求等待并直接使用它的结果。
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+            generations = self.tag_generations(tags)
+            value = compute()
+            self.set(key, value, tags, ttl, generations)
+        with self.lock:
+            self.key_locks.pop(key, None)
+        return value
+
+    def tag_generations(self, tags):
+        with self.lock:
+            return {tag: self.generations.get(tag, 0) for tag in tags}
+
+    def invalidate(self, *tags):
+        """删除带有任一指定标签的条目"""
+        tags = set(tags)
+        with self.lock:
+            for key in [key for key, (_, _, entry_tags) in self.entries.items() if entry_tags & tags]:
+                del self.entries[key]
+            now = time.monotonic()
+            for tag in tags:
+                self.invalidated_at[tag] = now
+                self.generations[tag] = self.generations.get(tag, 0) + 1
+
+    def invalidate_throttled(self, tag, interval):
+        """距离上次失效超过 interval 秒时才执行失效，用于高频写入的数据"""
+        if time.monotonic() - self.invalidated_at.get(tag, 0) >= interval:
+            self.invalidate(tag)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# 应用内共享的页面缓存
+page_cache = PageCache()
@@ -0,0 +1,175 @@
+import bisect
+import functools
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, or_, select
+
+from app.models.database import engine, Pig
+
+# SQLite上的猪只全文索引：trigram分词的FTS5外部内容表，按耳标号、品种和备注的任意子串检索，
+# 由触发器随 pigs 表的增删改同步。其他数据库或不支持FTS5时退回 LIKE 查询。
+SEARCH_TABLE = "pigs_fts"
+SEARCH_COLUMNS = ["ear_tag", "breed", "notes"]
+SEARCH_TRIGGERS = ["pigs_fts_insert", "pigs_fts_delete", "pigs_fts_update"]
+
+_columns = ", ".join(SEARCH_COLUMNS)
+_new_values = ", ".join(f"new.{column}" for column in SEARCH_COLUMNS)
+_old_values = ", ".join(f"old.{column}" for column in SEARCH_COLUMNS)
+_insert_new = f"INSERT INTO {SEARCH_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});"
+_delete_old = f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});"
+
+# 建表、触发器和全量重建语句，由 db_migrate 执行
+SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    f"{_columns}, content='pigs', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS pigs_fts_insert AFTER INSERT ON pigs BEGIN {_insert_new} END",
+    f"CREATE TRIGGER IF NOT EXISTS pigs_fts_delete AFTER DELETE ON pigs BEGIN {_delete_old} END",
+    f"CREATE TRIGGER IF NOT EXISTS pigs_fts_update AFTER UPDATE OF {_columns} ON pigs "
+    f"BEGIN {_delete_old} {_insert_new} END",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+]
+
+# trigram分词只能匹配至少3个字符的关键词，更短的关键词使用 LIKE
+MIN_MATCH_LENGTH = 3
+
+# 全文索引表不属于 Base.metadata，不会被 init_db 创建
+search_metadata = MetaData()
+pigs_fts = Table(
+    SEARCH_TABLE, search_metadata,
+    Column("rowid", Integer),
+    Column(SEARCH_TABLE, String),
+    *[Column(column, String) for column in SEARCH_COLUMNS]
+)
+
+@functools.lru_cache(maxsize=1)
+def fts_supported():
+    """当前SQLite是否支持FTS5的trigram分词（3.34及以上且编译了FTS5）"""
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(value, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+_search_ready = False
+
+def search_index_ready():
+    """数据库中是否已有全文索引表（建立后缓存结果）"""
+    global _search_ready
+    if not _search_ready and engine.dialect.name == "sqlite" and fts_supported():
+        with engine.connect() as conn:
+            _search_ready = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+            ).first() is not None
+    return _search_ready
+
+def match_phrase(keyword):
+    """把关键词转换为FTS5短语，双引号转义，避免被解析为查询语法"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+def keyword_filter(keyword):
+    """按耳标号、品种或备注包含关键词筛选猪只的查询条件"""
+    keyword = keyword.strip()
+    if len(keyword) >= MIN_MATCH_LENGTH and search_index_ready():
+        return Pig.id.in_(
+            select(pigs_fts.c.rowid).where(pigs_fts.c[SEARCH_TABLE].op("MATCH")(match_phrase(keyword)))
+        )
+    pattern = f"%{keyword}%"
+    return or_(Pig.ear_tag.like(pattern), Pig.breed.like(pattern), Pig.notes.like(pattern))
+
+def search_pigs(db, keyword, limit=20):
+    """搜索猪只，耳标号以关键词开头的排在前面"""
+    rows = db.execute(
+        select(Pig.id, Pig.ear_tag, Pig.breed, Pig.status, Pig.pen_id)
+        .where(keyword_filter(keyword))
+        .order_by(Pig.ear_tag.notlike(f"{keyword.strip()}%"), Pig.ear_tag)
+        .limit(limit)
+    ).all()
+    return [
+        {"id": pig_id, "ear_tag": ear_tag, "breed": breed, "status": status, "pen_id": pen_id}
+        for pig_id, ear_tag, breed, status, pen_id in rows
+    ]
+
+# 重新从数据库加载耳标号的间隔（秒），多worker部署时其他进程新增的猪只在此之后可见
+EAR_TAG_RELOAD_INTERVAL = 300
+
+class EarTagIndex:
+    """内存中按耳标号排序的索引，用二分查找做前缀补全（不区分大小写）
+
+    本进程内增删改猪只时调用 add/remove 直接更新；批量导入后调用 invalidate，下次查询时重新加载。
+    """
+
+    def __init__(self, reload_interval=EAR_TAG_RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        self.lock = threading.Lock()
+        self.keys = []
+        self.entries = []
+        self.tags = {}
+        self.loaded_at = None
+
+    def load(self, rows):
+        """用 (猪只ID, 耳标号) 行重建索引"""
+        entries = sorted((ear_tag.casefold(), ear_tag, pig_id) for pig_id, ear_tag in rows if ear_tag)
+        with self.lock:
+            self.entries = entries
+            self.keys = [entry[0] for entry in entries]
+            self.tags = {pig_id: ear_tag for _, ear_tag, pig_id in entries}
+            self.loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.reload_interval:
+            pigs = Pig.__table__
+            self.load(db.connection().execute(select(pigs.c.id, pigs.c.ear_tag)).all())
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    def add(self, pig_id, ear_tag):
+        """新增或修改猪只后更新索引（耳标号变化时替换旧条目）"""
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            self._discard(pig_id)
+            if ear_tag:
+                entry = (ear_tag.casefold(), ear_tag, pig_id)
+                index = bisect.bisect_left(self.entries, entry)
+                self.entries.insert(index, entry)
+                self.keys.insert(index, entry[0])
+                self.tags[pig_id] = ear_tag
+
+    def remove(self, pig_id):
+        with self.lock:
+            if self.loaded_at is not None:
+                self._discard(pig_id)
+
+    def _discard(self, pig_id):
+        ear_tag = self.tags.pop(pig_id, None)
+        if ear_tag is None:
+            return
+        index = bisect.bisect_left(self.entries, (ear_tag.casefold(), ear_tag, pig_id))
+        if index < len(self.entries) and self.entries[index][2] == pig_id:
+            del self.entries[index]
+            del self.keys[index]
+
+    def complete(self, prefix, limit=10):
+        """返回耳标号以 prefix 开头的前 limit 头猪只 [{"id", "ear_tag"}]"""
+        key = prefix.casefold()
+        with self.lock:
+            start = bisect.bisect_left(self.keys, key)
+            matches = []
+            for folded, ear_tag, pig_id in self.entries[start:start + limit]:
+                if not folded.startswith(key):
+                    break
+                matches.append({"id": pig_id, "ear_tag": ear_tag})
+        return matches
+
+    def __len__(self):
+        return len(self.entries)
+
+# 应用内共享的耳标号补全索引，首次查询时加载
+ear_tag_index = EarTagIndex()
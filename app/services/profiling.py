@@ -0,0 +1,164 @@
+import threading
+import time
+
+from app.config import QUERY_COUNT_HEADER
+from app.utils.query_count import count_queries, normalize_statement
+
+# 请求耗时直方图的分桶上限（秒）
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 每个路由保留的最慢SQL语句数
+SLOWEST_STATEMENTS = 5
+
+# 未匹配到路由的请求（404、静态文件）统一归为一个标签，避免标签数量随URL增长
+UNMATCHED_ROUTE = "其他"
+
+class RouteStats:
+    """单个路由的累计统计"""
+
+    def __init__(self):
+        self.requests = {}  # (方法, 状态码) -> 次数
+        self.duration_sum = 0.0
+        self.duration_buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.statements = 0
+        self.max_statements = 0
+        self.db_seconds = 0.0
+        self.slowest = {}  # 语句 -> 最长耗时秒数
+
+    def add(self, method, status, duration, statements):
+        self.requests[(method, status)] = self.requests.get((method, status), 0) + 1
+        self.count += 1
+        self.duration_sum += duration
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                self.duration_buckets[i] += 1
+        self.statements += len(statements)
+        self.max_statements = max(self.max_statements, len(statements))
+        for statement, seconds in statements:
+            self.db_seconds += seconds
+            if seconds > self.slowest.get(statement, 0):
+                self.slowest[statement] = seconds
+        if len(self.slowest) > SLOWEST_STATEMENTS * 4:
+            self.slowest = dict(self.top_statements())
+
+    def top_statements(self):
+        return sorted(self.slowest.items(), key=lambda item: item[1], reverse=True)[:SLOWEST_STATEMENTS]
+
+class RequestMetrics:
+    """按路由汇总请求数、耗时、SQL语句数和数据库耗时，输出Prometheus文本格式"""
+
+    def __init__(self):
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def record(self, route, method, status, duration, statements):
+        statements = [(normalize_statement(statement), seconds) for statement, seconds in statements]
+        with self.lock:
+            self.routes.setdefault(route, RouteStats()).add(method, status, duration, statements)
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+    def render(self, extra=()):
+        """返回Prometheus文本格式的指标；extra 为额外的 (名称, 类型, 说明, 值) 列表"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+        with self.lock:
+            routes = sorted(self.routes.items())
+            metric("pig_http_requests_total", "counter", "按路由、方法和状态码统计的请求数", [
+                ({"route": route, "method": method, "status": status}, count)
+                for route, stats in routes for (method, status), count in sorted(stats.requests.items())
+            ])
+
+            lines.append("# HELP pig_http_request_duration_seconds 请求处理耗时")
+            lines.append("# TYPE pig_http_request_duration_seconds histogram")
+            for route, stats in routes:
+                for bound, count in zip(DURATION_BUCKETS, stats.duration_buckets):
+                    lines.append(f"pig_http_request_duration_seconds_bucket{format_labels({'route': route, 'le': format_value(bound)})} {count}")
+                lines.append(f"pig_http_request_duration_seconds_bucket{format_labels({'route': route, 'le': '+Inf'})} {stats.count}")
+                lines.append(f"pig_http_request_duration_seconds_sum{format_labels({'route': route})} {format_value(stats.duration_sum)}")
+                lines.append(f"pig_http_request_duration_seconds_count{format_labels({'route': route})} {stats.count}")
+
+            metric("pig_db_statements_total", "counter", "请求执行的SQL语句总数",
+                   [({"route": route}, stats.statements) for route, stats in routes])
+            metric("pig_db_statements_max", "gauge", "单个请求执行的最多SQL语句数",
+                   [({"route": route}, stats.max_statements) for route, stats in routes])
+            metric("pig_db_duration_seconds_total", "counter", "请求中SQL语句的累计执行耗时",
+                   [({"route": route}, stats.db_seconds) for route, stats in routes])
+            metric("pig_db_slowest_statement_seconds", "gauge", "每个路由最慢的几条SQL语句的最长耗时", [
+                ({"route": route, "statement": statement}, seconds)
+                for route, stats in routes for statement, seconds in stats.top_statements()
+            ])
+
+        for name, kind, help_text, value in extra:
+            metric(name, kind, help_text, [({}, value)])
+        return "\n".join(lines) + "\n"
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + "}"
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class ProfilingMiddleware:
+    """记录每个HTTP请求的路由、耗时、SQL语句数和数据库耗时
+
+    请求在响应体发送完毕时计入指标，流式响应（导出、喂食记录API）在传输过程中
+    执行的查询也会统计在内。设置 QUERY_COUNT_HEADER=1 时在响应头 X-Query-Count
+    中返回发出响应头之前执行的语句数。
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+        self.route_paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        response_status = [500]
+
+        with count_queries(f"{scope['method']} {scope['path']}") as statements:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    response_status[0] = message["status"]
+                    if QUERY_COUNT_HEADER:
+                        message["headers"] = list(message.get("headers", [])) + [
+                            (b"x-query-count", str(len(statements)).encode())
+                        ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self.metrics.record(
+                    self.route_of(scope), scope["method"], response_status[0],
+                    time.perf_counter() - started, list(statements)
+                )
+
+    def route_of(self, scope):
+        """路由模板（如 /pig/detail/{pig_id}），由路由匹配后写入 scope 的 endpoint 查找"""
+        if self.route_paths is None:
+            app = scope.get("app")
+            routes = getattr(app, "routes", [])
+            self.route_paths = {route.endpoint: route.path for route in routes if hasattr(route, "endpoint")}
+        return self.route_paths.get(scope.get("endpoint"), UNMATCHED_ROUTE)
+
+# 应用内共享的请求指标
+request_metrics = RequestMetrics()
@@ -0,0 +1,169 @@
+import asyncio
+import datetime
+import itertools
+import json
+from collections import deque
+
+from app.config import PUSH_BUFFER_SIZE, PUSH_MAX_CLIENTS
+
+# 可订阅的主题：新报警、各猪舍最新环境读数、自动下料写入的喂食记录汇总
+TOPICS = ("alerts", "environment", "feeding")
+
+# 保留最近的消息数，客户端断线重连时（SSE 的 Last-Event-ID）补发
+HISTORY_SIZE = 256
+
+class TooManyClients(Exception):
+    """订阅的客户端数已达上限"""
+
+def to_json(value):
+    return json.dumps(value, ensure_ascii=False, default=json_default)
+
+def json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+class Subscriber:
+    """一个推送客户端：订阅的主题和有界的待发送缓冲区
+
+    缓冲区满时丢弃最早的消息并计数，广播方不会因为慢客户端而等待；
+    客户端收到丢弃通知后应重新加载页面数据。
+    """
+
+    def __init__(self, topics, buffer_size):
+        self.topics = set(topics)
+        self.queue = asyncio.Queue(buffer_size)
+        self.dropped = 0
+
+    def offer(self, item):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+    async def next(self, timeout):
+        """等待下一条消息 (消息ID, 主题, JSON)，超时返回 None；推送中心关闭时返回 False"""
+        if not self.queue.empty():
+            # 有积压时直接取出，避免每条消息都创建超时任务
+            return self.queue.get_nowait()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def take_dropped(self):
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+class PushHub:
+    """进程内的发布/订阅中心：把报警、环境读数和喂食汇总推送给 WebSocket/SSE 客户端
+
+    publish 可以在任意线程调用（如传感器写入线程、报警回调），消息只序列化一次，
+    再由事件循环逐个放入各客户端的有界缓冲区。没有客户端时 publish 直接返回。
+    """
+
+    def __init__(self, buffer_size=PUSH_BUFFER_SIZE, max_clients=PUSH_MAX_CLIENTS, history_size=HISTORY_SIZE):
+        self.buffer_size = buffer_size
+        self.max_clients = max_clients
+        self.loop = None
+        self.subscribers = set()
+        self.history = deque(maxlen=history_size)
+        self.ids = itertools.count(1)
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0}
+
+    @property
+    def running(self):
+        return self.loop is not None
+
+    def start(self):
+        """在当前事件循环中启动，必须在事件循环中调用"""
+        self.loop = asyncio.get_running_loop()
+
+    def stop(self):
+        """通知所有客户端断开"""
+        for subscriber in self.subscribers:
+            subscriber.offer(False)
+        self.subscribers.clear()
+        self.loop = None
+
+    def publish(self, topic, data):
+        """发布一条消息，可在任意线程调用"""
+        loop = self.loop
+        if loop is None or not self.subscribers or data in (None, [], {}):
+            return
+        message = to_json({"topic": topic, "data": data})
+        try:
+            loop.call_soon_threadsafe(self._fanout, topic, message)
+        except RuntimeError:
+            # 事件循环已关闭（应用正在退出）
+            pass
+
+    def _fanout(self, topic, message):
+        event_id = next(self.ids)
+        self.history.append((event_id, topic, message))
+        self.stats["published"] += 1
+        for subscriber in self.subscribers:
+            if topic in subscriber.topics:
+                if subscriber.queue.full():
+                    self.stats["dropped"] += 1
+                subscriber.offer((event_id, topic, message))
+                self.stats["delivered"] += 1
+
+    def subscribe(self, topics=TOPICS, last_event_id=None):
+        """注册客户端，last_event_id 之后的历史消息先放入缓冲区；必须在事件循环中调用"""
+        if len(self.subscribers) >= self.max_clients:
+            raise TooManyClients(f"推送客户端数已达上限 {self.max_clients}")
+        subscriber = Subscriber(topics, self.buffer_size)
+        if last_event_id is not None:
+            for event_id, topic, message in self.history:
+                if event_id > last_event_id and topic in subscriber.topics:
+                    subscriber.offer((event_id, topic, message))
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    # 以下方法作为各数据源的写入回调，把写入结果转换为推送消息
+
+    def publish_alerts(self, alerts):
+        """报警规则引擎的回调：推送新报警"""
+        self.publish("alerts", [
+            {key: alert.get(key) for key in ("id", "alert_time", "alert_type", "alert_level", "location", "details", "status")}
+            for alert in alerts
+        ])
+
+    def publish_environment(self, rows):
+        """环境读数写入器的回调：每个猪舍只推送本批次最新的一条读数"""
+        if not self.subscribers:
+            return
+        latest = {}
+        for row in rows:
+            house_id = row["pig_house_id"]
+            if house_id not in latest or row["record_time"] >= latest[house_id]["record_time"]:
+                latest[house_id] = row
+        self.publish("environment", [
+            {"house_id": house_id, "record_time": row["record_time"],
+             "timestamp": int(row["record_time"].timestamp() * 1000),
+             "temperature": row["temperature"], "humidity": row["humidity"]}
+            for house_id, row in sorted(latest.items())
+        ])
+
+    def publish_feeding(self, rows):
+        """下料调度器的回调：推送本批次按天汇总的喂食记录数和投喂量"""
+        if not self.subscribers:
+            return
+        totals = {}
+        for row in rows:
+            entry = totals.setdefault(row["feed_time"].date(), {"records": 0, "feed_amount": 0.0})
+            entry["records"] += 1
+            entry["feed_amount"] += row["feed_amount"] or 0
+        self.publish("feeding", [
+            {"day": day, "records": entry["records"], "feed_amount": round(entry["feed_amount"], 3)}
+            for day, entry in sorted(totals.items())
+        ])
+
+# 应用内共享的推送中心，随应用启动和关闭
+push_hub = PushHub()
@@ -0,0 +1,201 @@
+import argparse
+import datetime
+import re
+import threading
+import time
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, func, inspect, select, union_all
+from sqlalchemy.orm import Session
+
+from app.config import RETENTION_DAYS, RETENTION_INTERVAL_HOURS
+from app.models.database import SessionLocal, engine, FeedingRecord, EnvironmentRecord
+
+# 可归档的记录：热表模型、时间列名、归档表上额外建立的索引列
+ARCHIVE_SOURCES = {
+    "feeding": (FeedingRecord, "feed_time", ["pig_id", "feed_time"]),
+    "environment": (EnvironmentRecord, "record_time", ["pig_house_id", "record_time"]),
+}
+
+# 未配置 RETENTION_DAYS 时命令行默认保留的天数
+DEFAULT_RETENTION_DAYS = 90
+
+# 重新读取数据库中已有归档表的间隔（秒），其他进程可能新建了归档表
+ARCHIVE_TABLES_TTL = 60
+
+# 归档表不属于 Base.metadata，不会被 init_db 和索引迁移创建
+archive_metadata = MetaData()
+
+_archive_months = {}
+_archive_months_loaded_at = 0
+_archive_lock = threading.Lock()
+
+def month_start(moment):
+    return datetime.datetime(moment.year, moment.month, 1)
+
+def next_month(moment):
+    return datetime.datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+
+def archive_table_name(kind, month):
+    hot_table = ARCHIVE_SOURCES[kind][0].__table__
+    return f"{hot_table.name}_{month.year:04d}{month.month:02d}"
+
+def archive_table(kind, month):
+    """返回某月的归档表，列与热表相同（保留原ID）"""
+    name = archive_table_name(kind, month)
+    if name in archive_metadata.tables:
+        return archive_metadata.tables[name]
+
+    model, time_name, index_columns = ARCHIVE_SOURCES[kind]
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False)
+        for column in model.__table__.columns
+    ]
+    table = Table(name, archive_metadata, *columns)
+    Index(f"ix_{name}_{time_name}", table.c[time_name])
+    Index(f"ix_{name}_{'_'.join(index_columns)}", *[table.c[column] for column in index_columns])
+    return table
+
+def archive_months(kind):
+    """数据库中已有归档表的月份（升序）"""
+    global _archive_months, _archive_months_loaded_at
+    with _archive_lock:
+        if time.monotonic() - _archive_months_loaded_at > ARCHIVE_TABLES_TTL:
+            months = {name: [] for name in ARCHIVE_SOURCES}
+            for table_name in inspect(engine).get_table_names():
+                for name, (model, _, _) in ARCHIVE_SOURCES.items():
+                    match = re.fullmatch(rf"{model.__table__.name}_(\d{{4}})(\d{{2}})", table_name)
+                    if match:
+                        months[name].append(datetime.datetime(int(match.group(1)), int(match.group(2)), 1))
+            _archive_months = {name: sorted(values) for name, values in months.items()}
+            _archive_months_loaded_at = time.monotonic()
+        return _archive_months[kind]
+
+def refresh_archive_months():
+    global _archive_months_loaded_at
+    with _archive_lock:
+        _archive_months_loaded_at = 0
+
+def record_source(kind, start=None, end=None):
+    """返回覆盖 [start, end) 的记录来源，列名与热表相同
+
+    范围内没有归档月份时直接返回热表；否则返回热表与相关月份归档表的
+    UNION ALL 子查询，各分支先按时间过滤，以便使用各表的时间索引。
+    """
+    model, time_name, _ = ARCHIVE_SOURCES[kind]
+    months = [
+        month for month in archive_months(kind)
+        if (start is None or next_month(month) > start) and (end is None or month < end)
+    ]
+    if not months:
+        return model.__table__
+
+    tables = [model.__table__] + [archive_table(kind, month) for month in months]
+    branches = []
+    for table in tables:
+        query = select(*table.columns)
+        if start is not None:
+            query = query.where(table.c[time_name] >= start)
+        if end is not None:
+            query = query.where(table.c[time_name] < end)
+        branches.append(query)
+    return union_all(*branches).subquery(f"{model.__table__.name}_all")
+
+def archive_sources(kind):
+    """所有归档表，用于跨分区的删除"""
+    return [archive_table(kind, month) for month in archive_months(kind)]
+
+def archive_kind(db: Session, kind, cutoff, dry_run=False):
+    """把 cutoff 之前的记录按月移动到归档表，每个月一个事务，返回移动的行数"""
+    model, time_name, _ = ARCHIVE_SOURCES[kind]
+    hot_table = model.__table__
+    time_column = hot_table.c[time_name]
+
+    oldest = db.execute(select(func.min(time_column))).scalar()
+    moved = 0
+    if oldest is None or oldest >= cutoff:
+        return moved
+
+    month = month_start(oldest)
+    while month < cutoff:
+        end = min(next_month(month), cutoff)
+        condition = (time_column >= month) & (time_column < end)
+        count = db.execute(select(func.count()).select_from(hot_table).where(condition)).scalar()
+        if count and not dry_run:
+            table = archive_table(kind, month)
+            conn = db.connection()
+            table.create(conn, checkfirst=True)
+            conn.execute(table.insert().from_select(
+                [column.name for column in hot_table.columns],
+                select(*hot_table.columns).where(condition)
+            ))
+            # 直接删除热表中的行：每日汇总表保持不变，图表和统计仍包含归档数据
+            conn.execute(delete(hot_table).where(condition))
+            db.commit()
+            print(f"已归档 {count} 条{kind}记录到 {table.name}")
+        moved += count or 0
+        month = next_month(month)
+    return moved
+
+def archive_old_records(db: Session, days=None, dry_run=False):
+    """归档超过保留天数的喂食和环境记录，返回 {类型: 行数}"""
+    days = days or RETENTION_DAYS or DEFAULT_RETENTION_DAYS
+    cutoff = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=days), datetime.time())
+    try:
+        return {kind: archive_kind(db, kind, cutoff, dry_run) for kind in ARCHIVE_SOURCES}
+    finally:
+        refresh_archive_months()
+
+class RetentionScheduler:
+    """按 RETENTION_INTERVAL_HOURS 定期归档旧记录的后台线程，RETENTION_DAYS 为0时不启动"""
+
+    def __init__(self, days=RETENTION_DAYS, interval_hours=RETENTION_INTERVAL_HOURS):
+        self.days = days
+        self.interval = interval_hours * 3600
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        if not self.days or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            db = SessionLocal()
+            try:
+                archive_old_records(db, self.days)
+            except Exception as e:
+                db.rollback()
+                print(f"归档旧记录时出错: {e}")
+            finally:
+                db.close()
+            self._stopping.wait(self.interval)
+
+# 应用内共享的归档调度器，随应用启动和关闭
+retention_scheduler = RetentionScheduler()
+
+def main():
+    parser = argparse.ArgumentParser(description="把旧的喂食和环境记录按月移动到归档表")
+    parser.add_argument("--days", type=int, help=f"保留最近多少天的记录，默认 RETENTION_DAYS 或 {DEFAULT_RETENTION_DAYS}")
+    parser.add_argument("--dry-run", action="store_true", help="只统计需要归档的行数")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = archive_old_records(db, args.days, args.dry_run)
+    finally:
+        db.close()
+    action = "需要归档" if args.dry_run else "已归档"
+    print("，".join(f"{kind}: {action} {count} 条" for kind, count in result.items()))
+
+if __name__ == "__main__":
+    main()
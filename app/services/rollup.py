@@ -0,0 +1,337 @@
+import argparse
+import datetime
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.models.database import (
+    SessionLocal, Pig, FeedingRecord, EnvironmentRecord, Alert,
+    FeedingDailyRollup, EnvironmentDailyRollup, AlertDailyRollup
+)
+from app.utils.dialect import day_of, upsert_insert
+from app.services.retention import record_source
+
+# 每日汇总表：历史日期只读汇总表，当天的数据仍然读原始记录
+FEED_STATUSES = ["正常", "少食", "拒食", "过量"]
+
+def _as_date(value):
+    """把数据库返回的日期（SQLite中可能是字符串）统一转换为date"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.datetime.strptime(value[:10], "%Y-%m-%d").date()
+    return value
+
+def _upsert(conn, model, key_columns, value_columns, params):
+    """按唯一键累加汇总值，不存在时插入新行"""
+    if not params:
+        return
+    table = model.__table__
+    stmt = upsert_insert(conn, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={name: table.c[name] + stmt.excluded[name] for name in value_columns}
+    )
+    conn.execute(stmt, params)
+
+def apply_feeding_rows(conn, rows, sign=1):
+    """把喂食记录累加到每日采食汇总表，sign为-1时表示扣减
+
+    rows 中每项需包含 feed_time、feed_amount、feed_status 和 pen_id。
+    """
+    totals = {}
+    for row in rows:
+        if row.get("feed_time") is None:
+            continue
+        key = (row["feed_time"].date(), row.get("pen_id") or 0, row.get("feed_status") or "")
+        entry = totals.setdefault(key, [0, 0.0])
+        entry[0] += 1
+        entry[1] += row.get("feed_amount") or 0
+    apply_feeding_totals(conn, totals, sign)
+
+def apply_feeding_totals(conn, totals, sign=1):
+    """把已按 (日期, 猪圈, 采食状态) 汇总的 [记录数, 采食量] 累加到每日采食汇总表"""
+    _upsert(conn, FeedingDailyRollup, ["day", "pen_id", "feed_status"], ["record_count", "feed_amount"], [
+        {"day": day, "pen_id": pen_id, "feed_status": feed_status,
+         "record_count": sign * count, "feed_amount": sign * amount}
+        for (day, pen_id, feed_status), (count, amount) in totals.items()
+    ])
+
+def apply_environment_rows(conn, rows, sign=1):
+    """把环境记录累加到每日环境汇总表"""
+    totals = {}
+    for row in rows:
+        if row.get("record_time") is None:
+            continue
+        key = (row["record_time"].date(), row.get("pig_house_id") or 0)
+        entry = totals.setdefault(key, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += row.get("temperature") or 0
+        entry[2] += row.get("humidity") or 0
+
+    _upsert(conn, EnvironmentDailyRollup, ["day", "pig_house_id"], ["record_count", "temperature_sum", "humidity_sum"], [
+        {"day": day, "pig_house_id": house_id, "record_count": sign * count,
+         "temperature_sum": sign * temperature, "humidity_sum": sign * humidity}
+        for (day, house_id), (count, temperature, humidity) in totals.items()
+    ])
+
+def apply_alert_rows(conn, rows, sign=1):
+    """把报警记录累加到每日报警汇总表"""
+    totals = {}
+    for row in rows:
+        if row.get("alert_time") is None:
+            continue
+        key = (row["alert_time"].date(), row.get("alert_type") or "", row.get("alert_level") or "")
+        totals[key] = totals.get(key, 0) + 1
+
+    _upsert(conn, AlertDailyRollup, ["day", "alert_type", "alert_level"], ["alert_count"], [
+        {"day": day, "alert_type": alert_type, "alert_level": alert_level, "alert_count": sign * count}
+        for (day, alert_type, alert_level), count in totals.items()
+    ])
+
+def resolve_pen_ids(conn, pig_ids):
+    """查询猪只当前所在猪圈，返回 {pig_id: pen_id}"""
+    pig_ids = set(pig_id for pig_id in pig_ids if pig_id is not None)
+    if not pig_ids:
+        return {}
+    rows = conn.execute(select(Pig.id, Pig.pen_id).where(Pig.id.in_(pig_ids)))
+    return {pig_id: pen_id for pig_id, pen_id in rows}
+
+def retract_pig_feeding(conn, pig_id):
+    """删除猪只前，从采食汇总表中扣减它的全部喂食记录（包括已归档的记录）"""
+    feeding = record_source("feeding")
+    day_column = day_of(feeding.c.feed_time)
+    pen_id = resolve_pen_ids(conn, [pig_id]).get(pig_id) or 0
+    rows = conn.execute(
+        select(day_column, feeding.c.feed_status, func.count(feeding.c.id), func.sum(feeding.c.feed_amount))
+        .where(feeding.c.pig_id == pig_id)
+        .group_by(day_column, feeding.c.feed_status)
+    ).all()
+
+    _upsert(conn, FeedingDailyRollup, ["day", "pen_id", "feed_status"], ["record_count", "feed_amount"], [
+        {"day": _as_date(day), "pen_id": pen_id, "feed_status": feed_status or "",
+         "record_count": -count, "feed_amount": -(amount or 0)}
+        for day, feed_status, count, amount in rows if day is not None
+    ])
+
+def _feeding_row(record, pen_map):
+    return {
+        "feed_time": record.feed_time,
+        "feed_amount": record.feed_amount,
+        "feed_status": record.feed_status,
+        "pen_id": pen_map.get(record.pig_id),
+    }
+
+def _environment_row(record):
+    return {
+        "record_time": record.record_time,
+        "pig_house_id": record.pig_house_id,
+        "temperature": record.temperature,
+        "humidity": record.humidity,
+    }
+
+def _alert_row(record):
+    return {
+        "alert_time": record.alert_time,
+        "alert_type": record.alert_type,
+        "alert_level": record.alert_level,
+    }
+
+@event.listens_for(SessionLocal, "after_flush")
+def maintain_rollups(session, flush_context):
+    """ORM写入喂食、环境和报警记录时，在同一事务内增量更新汇总表"""
+    for objects, sign in ((session.new, 1), (session.deleted, -1)):
+        feeding = [obj for obj in objects if isinstance(obj, FeedingRecord)]
+        environment = [obj for obj in objects if isinstance(obj, EnvironmentRecord)]
+        alerts = [obj for obj in objects if isinstance(obj, Alert)]
+        if not (feeding or environment or alerts):
+            continue
+
+        conn = session.connection()
+        if feeding:
+            pen_map = resolve_pen_ids(conn, [record.pig_id for record in feeding])
+            apply_feeding_rows(conn, [_feeding_row(record, pen_map) for record in feeding], sign)
+        if environment:
+            apply_environment_rows(conn, [_environment_row(record) for record in environment], sign)
+        if alerts:
+            apply_alert_rows(conn, [_alert_row(record) for record in alerts], sign)
+
+def rebuild_rollups(db: Session, start=None, end=None):
+    """根据原始记录重建汇总表，可用 start/end（date，左闭右开）限定重建范围"""
+    start_time = datetime.datetime.combine(start, datetime.time()) if start else None
+    end_time = datetime.datetime.combine(end, datetime.time()) if end else None
+
+    def day_range(model):
+        conditions = []
+        if start:
+            conditions.append(model.day >= start)
+        if end:
+            conditions.append(model.day < end)
+        return conditions
+
+    def time_range(column):
+        conditions = []
+        if start_time:
+            conditions.append(column >= start_time)
+        if end_time:
+            conditions.append(column < end_time)
+        return conditions
+
+    # 采食汇总
+    db.query(FeedingDailyRollup).filter(*day_range(FeedingDailyRollup)).delete(synchronize_session=False)
+    # 原始记录包括热表和范围内的归档表
+    feeding = record_source("feeding", start_time, end_time)
+    day_column = day_of(feeding.c.feed_time)
+    pen_column = func.coalesce(Pig.pen_id, 0)
+    status_column = func.coalesce(feeding.c.feed_status, "")
+    db.execute(FeedingDailyRollup.__table__.insert().from_select(
+        ["day", "pen_id", "feed_status", "record_count", "feed_amount"],
+        select(day_column, pen_column, status_column, func.count(feeding.c.id),
+               func.coalesce(func.sum(feeding.c.feed_amount), 0))
+        .select_from(feeding)
+        .outerjoin(Pig, Pig.id == feeding.c.pig_id)
+        .where(feeding.c.feed_time.isnot(None), *time_range(feeding.c.feed_time))
+        .group_by(day_column, pen_column, status_column)
+    ))
+
+    # 环境汇总
+    db.query(EnvironmentDailyRollup).filter(*day_range(EnvironmentDailyRollup)).delete(synchronize_session=False)
+    environment = record_source("environment", start_time, end_time)
+    day_column = day_of(environment.c.record_time)
+    house_column = func.coalesce(environment.c.pig_house_id, 0)
+    db.execute(EnvironmentDailyRollup.__table__.insert().from_select(
+        ["day", "pig_house_id", "record_count", "temperature_sum", "humidity_sum"],
+        select(day_column, house_column, func.count(environment.c.id),
+               func.coalesce(func.sum(environment.c.temperature), 0),
+               func.coalesce(func.sum(environment.c.humidity), 0))
+        .where(environment.c.record_time.isnot(None), *time_range(environment.c.record_time))
+        .group_by(day_column, house_column)
+    ))
+
+    # 报警汇总
+    db.query(AlertDailyRollup).filter(*day_range(AlertDailyRollup)).delete(synchronize_session=False)
+    day_column = day_of(Alert.alert_time)
+    type_column = func.coalesce(Alert.alert_type, "")
+    level_column = func.coalesce(Alert.alert_level, "")
+    db.execute(AlertDailyRollup.__table__.insert().from_select(
+        ["day", "alert_type", "alert_level", "alert_count"],
+        select(day_column, type_column, level_column, func.count(Alert.id))
+        .where(Alert.alert_time.isnot(None), *time_range(Alert.alert_time))
+        .group_by(day_column, type_column, level_column)
+    ))
+
+    db.commit()
+
+def ensure_rollups(db: Session):
+    """汇总表为空但已有原始记录时（如旧数据库升级后）执行一次全量重建"""
+    has_rollups = db.query(FeedingDailyRollup.id).first() or db.query(EnvironmentDailyRollup.id).first()
+    has_records = db.query(FeedingRecord.id).first() or db.query(EnvironmentRecord.id).first()
+    if has_records and not has_rollups:
+        print("正在重建每日汇总表...")
+        rebuild_rollups(db)
+
+def feeding_daily_stats(db: Session, start: datetime.date, end: datetime.date):
+    """统计 [start, end) 每天的采食量、记录数和各采食状态次数
+
+    历史日期读每日采食汇总表，只有当天的数据查询原始喂食记录。
+    返回 {date: {"amount": float, "count": int, "status_counts": {状态: 次数}}}。
+    """
+    today = datetime.date.today()
+    stats = {}
+
+    def add(day, feed_status, count, amount):
+        day = _as_date(day)
+        entry = stats.setdefault(day, {"amount": 0, "count": 0, "status_counts": {}})
+        entry["amount"] += amount or 0
+        entry["count"] += count or 0
+        entry["status_counts"][feed_status] = entry["status_counts"].get(feed_status, 0) + (count or 0)
+
+    history_end = min(end, today)
+    if start < history_end:
+        rows = db.query(
+            FeedingDailyRollup.day, FeedingDailyRollup.feed_status,
+            func.sum(FeedingDailyRollup.record_count), func.sum(FeedingDailyRollup.feed_amount)
+        ).filter(
+            FeedingDailyRollup.day >= start,
+            FeedingDailyRollup.day < history_end
+        ).group_by(FeedingDailyRollup.day, FeedingDailyRollup.feed_status).all()
+        for row in rows:
+            add(*row)
+
+    live_start = max(start, today)
+    if live_start < end:
+        day_column = day_of(FeedingRecord.feed_time)
+        rows = db.query(
+            day_column, FeedingRecord.feed_status,
+            func.count(FeedingRecord.id), func.sum(FeedingRecord.feed_amount)
+        ).filter(
+            FeedingRecord.feed_time >= datetime.datetime.combine(live_start, datetime.time()),
+            FeedingRecord.feed_time < datetime.datetime.combine(end, datetime.time())
+        ).group_by(day_column, FeedingRecord.feed_status).all()
+        for day, feed_status, count, amount in rows:
+            add(day, feed_status or "", count, amount)
+
+    return stats
+
+def environment_daily_stats(db: Session, day: datetime.date):
+    """统计某天的环境记录数、平均温度和平均湿度"""
+    if day < datetime.date.today():
+        count, temperature_sum, humidity_sum = db.query(
+            func.sum(EnvironmentDailyRollup.record_count),
+            func.sum(EnvironmentDailyRollup.temperature_sum),
+            func.sum(EnvironmentDailyRollup.humidity_sum)
+        ).filter(EnvironmentDailyRollup.day == day).one()
+    else:
+        start = datetime.datetime.combine(day, datetime.time())
+        count, temperature_sum, humidity_sum = db.query(
+            func.count(EnvironmentRecord.id),
+            func.sum(EnvironmentRecord.temperature),
+            func.sum(EnvironmentRecord.humidity)
+        ).filter(
+            EnvironmentRecord.record_time >= start,
+            EnvironmentRecord.record_time < start + datetime.timedelta(days=1)
+        ).one()
+
+    count = count or 0
+    return {
+        "count": count,
+        "avg_temp": (temperature_sum or 0) / count if count else 0,
+        "avg_humidity": (humidity_sum or 0) / count if count else 0,
+    }
+
+def alert_daily_counts(db: Session, day: datetime.date):
+    """统计某天各级别报警数量"""
+    if day < datetime.date.today():
+        rows = db.query(
+            AlertDailyRollup.alert_level, func.sum(AlertDailyRollup.alert_count)
+        ).filter(AlertDailyRollup.day == day).group_by(AlertDailyRollup.alert_level).all()
+    else:
+        start = datetime.datetime.combine(day, datetime.time())
+        rows = db.query(Alert.alert_level, func.count(Alert.id)).filter(
+            Alert.alert_time >= start,
+            Alert.alert_time < start + datetime.timedelta(days=1)
+        ).group_by(Alert.alert_level).all()
+
+    return {level: count or 0 for level, count in rows}
+
+def main():
+    parser = argparse.ArgumentParser(description="重建每日汇总表")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--start", help="起始日期 YYYY-MM-DD（含）")
+    parser.add_argument("--end", help="结束日期 YYYY-MM-DD（不含）")
+    args = parser.parse_args()
+
+    start = datetime.datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+    end = datetime.datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+
+    from app.models.database import init_db
+    init_db()
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db, start, end)
+        print("每日汇总表重建完成！")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from app.config import SESSION_BACKEND
+from app.models.database import SessionLocal, UserSession
+
+# 会话有效期（秒），与cookie的max_age一致
+SESSION_TTL = 3600
+
+# 内存存储最多保留的会话数，超出时淘汰最久未使用的会话
+MAX_SESSIONS = 10000
+
+# 数据库存储清理过期会话的间隔（秒）
+PURGE_INTERVAL = 300
+
+# 会话内用户信息的缓存时间（秒）
+USER_CACHE_TTL = 30
+
+class SessionStore(ABC):
+    """会话存储接口：会话ID -> 用户ID，过期后自动失效"""
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+
+    def create(self, user_id):
+        """创建会话并返回会话ID"""
+        session_id = secrets.token_hex(16)
+        self.set(session_id, user_id)
+        return session_id
+
+    @abstractmethod
+    def set(self, session_id, user_id):
+        """保存会话，有效期为 ttl 秒"""
+
+    @abstractmethod
+    def get(self, session_id):
+        """返回会话对应的用户ID，不存在或已过期时返回None"""
+
+    @abstractmethod
+    def delete(self, session_id):
+        """删除会话（退出登录）"""
+
+class MemorySessionStore(SessionStore):
+    """进程内存储，带过期时间和LRU淘汰，只适用于单个进程"""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        super().__init__(ttl)
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def set(self, session_id, user_id):
+        with self.lock:
+            self.sessions[session_id] = (user_id, time.monotonic() + self.ttl)
+            self.sessions.move_to_end(session_id)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+
+    def get(self, session_id):
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.sessions[session_id]
+                return None
+            self.sessions.move_to_end(session_id)
+            return user_id
+
+    def delete(self, session_id):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self.sessions)
+
+class DatabaseSessionStore(SessionStore):
+    """保存在数据库 user_sessions 表中的会话，可在多个worker进程间共享"""
+
+    def __init__(self, ttl=SESSION_TTL):
+        super().__init__(ttl)
+        self.purged_at = 0
+
+    def set(self, session_id, user_id):
+        now = datetime.now()
+        db = SessionLocal()
+        try:
+            if time.monotonic() - self.purged_at > PURGE_INTERVAL:
+                db.execute(delete(UserSession).where(UserSession.expires_at <= now))
+                self.purged_at = time.monotonic()
+            db.execute(insert(UserSession).values(
+                session_id=session_id, user_id=user_id, expires_at=now + timedelta(seconds=self.ttl)
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def get(self, session_id):
+        db = SessionLocal()
+        try:
+            return db.execute(
+                select(UserSession.user_id)
+                .where(UserSession.session_id == session_id, UserSession.expires_at > datetime.now())
+            ).scalar()
+        finally:
+            db.close()
+
+    def delete(self, session_id):
+        db = SessionLocal()
+        try:
+            db.execute(delete(UserSession).where(UserSession.session_id == session_id))
+            db.commit()
+        finally:
+            db.close()
+
+SESSION_BACKENDS = {
+    "memory": MemorySessionStore,
+    "database": DatabaseSessionStore,
+}
+
+def create_session_store(backend=None):
+    """根据配置 SESSION_BACKEND（memory/database）创建会话存储，默认使用内存"""
+    backend = backend or SESSION_BACKEND
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"不支持的会话存储: {backend}")
+    return SESSION_BACKENDS[backend]()
+
+class SessionUserCache:
+    """按用户ID短时间缓存已登录用户，避免每次请求都查询用户表
+
+    只缓存用户信息，会话是否有效每次都由会话存储判断，其他worker上的退出登录和过期立即生效。
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        with self.lock:
+            self.entries[user_id] = (user, time.monotonic() + self.ttl)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """用户信息修改后删除其缓存"""
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+# 应用内共享的会话存储和用户缓存
+session_store = create_session_store()
+user_cache = SessionUserCache()
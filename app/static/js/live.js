@@ -0,0 +1,36 @@
+// 实时推送：通过 Server-Sent Events 订阅报警、环境读数和喂食汇总，页面无需定时刷新
+// 断线后浏览器自动重连，并用 Last-Event-ID 补发断线期间的消息
+function subscribeLive(topics, handlers) {
+  if (!window.EventSource) {
+    return null;
+  }
+  const source = new EventSource('/pig/api/live/events?topics=' + encodeURIComponent(topics.join(',')));
+  topics.forEach(function(topic) {
+    source.addEventListener(topic, function(event) {
+      const message = JSON.parse(event.data);
+      if (handlers[topic]) {
+        handlers[topic](message.data);
+      }
+    });
+  });
+  // 客户端处理太慢导致缓冲区溢出、丢失了消息时，重新加载页面获取完整数据
+  source.addEventListener('dropped', function() {
+    if (handlers.dropped) {
+      handlers.dropped();
+    } else {
+      location.reload();
+    }
+  });
+  return source;
+}
+
+// 报警等级对应的Bootstrap样式
+function alertLevelClass(level) {
+  return level === '紧急' ? 'danger' : (level === '重要' ? 'warning' : 'info');
+}
+
+function escapeHtml(value) {
+  const element = document.createElement('span');
+  element.textContent = value == null ? '' : String(value);
+  return element.innerHTML;
+}
@@ -0,0 +1,46 @@
+from sqlalchemy import Date, Integer
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+class day_of(FunctionElement):
+    """取时间列的日期部分，用于按天分组；各数据库生成对应的SQL"""
+    type = Date()
+    inherit_cache = True
+    name = "day_of"
+
+@compiles(day_of)
+def _day_of_default(element, compiler, **kw):
+    # SQLite、MySQL
+    return f"date({compiler.process(element.clauses, **kw)})"
+
+@compiles(day_of, "postgresql")
+def _day_of_postgresql(element, compiler, **kw):
+    return f"CAST(date_trunc('day', {compiler.process(element.clauses, **kw)}) AS DATE)"
+
+# 支持 INSERT ... ON CONFLICT DO UPDATE 的数据库
+UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+def upsert_insert(conn, table):
+    """返回当前数据库的INSERT语句，可继续调用 on_conflict_do_update"""
+    dialect = conn.dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise NotImplementedError(f"不支持在 {dialect} 上执行upsert")
+    return UPSERT_INSERTS[dialect](table)
+
+class epoch_seconds(FunctionElement):
+    """把时间列转换为Unix秒数（按UTC解释不带时区的时间），用于按固定间隔分桶"""
+    type = Integer()
+    inherit_cache = True
+    name = "epoch_seconds"
+
+@compiles(epoch_seconds)
+def _epoch_seconds_default(element, compiler, **kw):
+    return f"CAST(strftime('%s', {compiler.process(element.clauses, **kw)}) AS INTEGER)"
+
+@compiles(epoch_seconds, "postgresql")
+def _epoch_seconds_postgresql(element, compiler, **kw):
+    return f"CAST(EXTRACT(EPOCH FROM {compiler.process(element.clauses, **kw)}) AS BIGINT)"
@@ -0,0 +1,13 @@
+import datetime
+
+def encode_cursor(moment, record_id):
+    """把 (时间, ID) 编码为键集分页游标，时间为空时编码为空字符串"""
+    return f"{moment.isoformat() if moment else ''}_{record_id}"
+
+def decode_cursor(cursor):
+    """解析键集分页游标，返回 (时间或None, ID)，格式不正确时返回None"""
+    try:
+        moment, record_id = cursor.rsplit("_", 1)
+        return datetime.datetime.fromisoformat(moment) if moment else None, int(record_id)
+    except (AttributeError, ValueError):
+        return None
@@ -0,0 +1,62 @@
+import contextvars
+import logging
+import re
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.config import SLOW_QUERY_MS, SLOW_QUERY_LOG
+from app.database import engine
+
+# 当前请求（或代码块）记录 (SQL语句, 耗时秒数) 的列表；为 None 时不记录
+_statements = contextvars.ContextVar("query_statements", default=None)
+
+# 当前请求的描述（如 "GET /pig/feeding"），写入慢查询日志
+_label = contextvars.ContextVar("query_label", default=None)
+
+slow_query_logger = logging.getLogger("app.slow_query")
+slow_query_logger.propagate = False
+_handler = logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8") if SLOW_QUERY_LOG else logging.StreamHandler()
+_handler.setFormatter(logging.Formatter("%(asctime)s 慢查询 %(message)s"))
+slow_query_logger.addHandler(_handler)
+slow_query_logger.setLevel(logging.WARNING)
+
+def normalize_statement(statement, max_length=300):
+    """合并空白并截断，用于日志和指标标签"""
+    statement = re.sub(r"\s+", " ", statement).strip()
+    return statement if len(statement) <= max_length else statement[:max_length] + "..."
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+@event.listens_for(engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    statements = _statements.get()
+    if statements is not None:
+        statements.append((statement, elapsed))
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        params = repr(parameters)
+        slow_query_logger.warning(
+            "%.1fms [%s] %s 参数: %s",
+            elapsed * 1000, _label.get() or "后台", normalize_statement(statement, 2000),
+            params if len(params) <= 500 else params[:500] + "..."
+        )
+
+@contextmanager
+def count_queries(label=None):
+    """记录代码块内当前上下文执行的SQL语句，返回 [(语句, 耗时秒数)]
+
+    按上下文变量区分，同一线程池中并发的其他请求和后台线程执行的语句不会计入；
+    FastAPI 在线程池中执行同步路由和依赖时会复制上下文，因此路由内的查询都会记录。
+    """
+    statements = []
+    token = _statements.set(statements)
+    label_token = _label.set(label)
+    try:
+        yield statements
+    finally:
+        _label.reset(label_token)
+        _statements.reset(token)
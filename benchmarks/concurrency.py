@@ -0,0 +1,128 @@
+"""并发吞吐量基准测试
+
+启动一个单worker的uvicorn进程（或使用 --url 指定已运行的服务），
+让若干客户端并发请求较重的页面，同时测量轻量页面的响应延迟，
+用于比较路由阻塞事件循环前后的并发表现：
+
+    python -m benchmarks.concurrency --clients 32 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+# 较重的页面：并发压测
+HEAVY_URLS = ["/pig/feeding", "/pig/alerts", "/pig/management", "/pig/daily-summary", "/home"]
+
+# 轻量页面：在压测期间测量延迟
+LIGHT_URL = "/pig/control"
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+async def login(client):
+    response = await client.post("/login", data={"username": "admin", "password": "password"})
+    if "session_id" not in client.cookies:
+        raise RuntimeError(f"登录失败: {response.status_code}")
+
+async def heavy_worker(client, deadline, latencies, errors, offset):
+    index = offset
+    while time.perf_counter() < deadline:
+        url = HEAVY_URLS[index % len(HEAVY_URLS)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code != 200:
+                errors.append(url)
+        except httpx.HTTPError:
+            errors.append(url)
+        latencies.append(time.perf_counter() - started)
+
+async def light_probe(client, deadline, latencies, interval=0.05):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await client.get(LIGHT_URL)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+async def run_benchmark(base_url, clients, duration):
+    limits = httpx.Limits(max_connections=clients + 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        await login(client)
+        # 预热
+        for url in HEAVY_URLS + [LIGHT_URL]:
+            await client.get(url)
+
+        heavy, light, errors = [], [], []
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(
+            light_probe(client, deadline, light),
+            *[heavy_worker(client, deadline, heavy, errors, i) for i in range(clients)]
+        )
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(heavy),
+        "errors": len(errors),
+        "throughput": len(heavy) / elapsed,
+        "heavy_p50": percentile(heavy, 0.5),
+        "heavy_p95": percentile(heavy, 0.95),
+        "light_p50": percentile(light, 0.5),
+        "light_p95": percentile(light, 0.95),
+        "light_max": max(light) if light else 0.0,
+        "light_mean": statistics.mean(light) if light else 0.0,
+    }
+
+def start_server(port):
+    """在子进程中启动单worker的应用，并等待其可以响应"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/login", timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("服务启动超时")
+
+def main():
+    parser = argparse.ArgumentParser(description="并发请求吞吐量与延迟基准测试")
+    parser.add_argument("--url", help="已运行服务的地址，不指定则自动启动")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.url
+    if not base_url:
+        process, base_url = start_server(args.port)
+    try:
+        result = asyncio.run(run_benchmark(base_url, args.clients, args.duration))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    print(f"并发客户端: {args.clients}，持续时间: {args.duration:g}s")
+    print(f"重页面请求: {result['requests']}（失败 {result['errors']}），吞吐量 {result['throughput']:.1f} req/s")
+    print(f"重页面延迟: p50 {result['heavy_p50'] * 1000:.0f}ms，p95 {result['heavy_p95'] * 1000:.0f}ms")
+    print(f"轻页面延迟: p50 {result['light_p50'] * 1000:.0f}ms，p95 {result['light_p95'] * 1000:.0f}ms，"
+          f"最大 {result['light_max'] * 1000:.0f}ms")
+
+if __name__ == "__main__":
+    main()
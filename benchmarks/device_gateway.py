@@ -0,0 +1,72 @@
+"""设备命令网关基准测试
+
+用本地模拟设备群（不访问数据库）测试同时向大量设备下发命令：部分设备响应很慢、
+部分设备离线，检查正常设备的确认延迟不受影响，并统计批次数、重试次数和吞吐量：
+
+    python -m benchmarks.device_gateway --devices 500 --commands 5 --slow 10 --offline 5
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.device_gateway import Device, DeviceGateway, ACKED
+from app.services.device_simulator import SimulatedFleet
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0
+
+async def run(args):
+    devices = [Device(f"fan-{i}", "fan", i, f"模拟风机{i}") for i in range(1, args.devices + 1)]
+    slow = {device.id for device in devices[:args.slow]}
+    offline = [device.id for device in devices[args.slow:args.slow + args.offline]]
+    fleet = SimulatedFleet(
+        latency=(args.latency_ms / 2000, args.latency_ms / 1000), failure_rate=args.failure_rate,
+        slow_devices=slow, slow_latency=args.slow_ms / 1000, seed=0
+    )
+    gateway = DeviceGateway(timeout=args.timeout_ms / 1000, retries=args.retries)
+    await gateway.start(fleet, devices)
+    for device_id in offline:
+        fleet.set_offline(device_id)
+
+    started = time.perf_counter()
+    commands = [
+        gateway.submit(device.id, "set_speed", {"speed": (n * 10) % 100})
+        for n in range(args.commands) for device in devices
+    ]
+    submitted = time.perf_counter() - started
+    await gateway.wait(commands)
+    elapsed = time.perf_counter() - started
+    await gateway.stop()
+
+    normal = [c for c in commands if c.device_id not in slow and c.device_id not in offline]
+    latencies = [(c.finished_at - c.created_at) * 1000 for c in normal if c.status == ACKED]
+    print(f"{len(commands)} 条命令 / {args.devices} 台设备（慢设备 {args.slow}，离线 {args.offline}），"
+          f"提交 {submitted * 1000:.1f}ms，全部完成 {elapsed:.2f}s")
+    print(f"正常设备: 确认 {len(latencies)}/{len(normal)}，延迟 p50 {percentile(latencies, 0.5):.0f}ms，"
+          f"p95 {percentile(latencies, 0.95):.0f}ms，最大 {max(latencies, default=0):.0f}ms")
+    for label, ids in (("慢设备", slow), ("离线设备", set(offline))):
+        group = [c for c in commands if c.device_id in ids]
+        if group:
+            statuses = {}
+            for c in group:
+                statuses[c.status] = statuses.get(c.status, 0) + 1
+            print(f"{label}: {', '.join(f'{status} {count}' for status, count in statuses.items())}")
+    stats = gateway.stats
+    print(f"发送批次 {stats['batches']}，重试 {stats['retries']}，确认 {stats['acked']}，失败 {stats['failed']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="用模拟设备群测试设备命令网关的并发下发")
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--commands", type=int, default=5, help="每台设备的命令数")
+    parser.add_argument("--slow", type=int, default=10, help="响应很慢的设备数")
+    parser.add_argument("--offline", type=int, default=5, help="离线设备数")
+    parser.add_argument("--latency-ms", type=float, default=50, help="正常设备的最大往返延迟")
+    parser.add_argument("--slow-ms", type=float, default=3000, help="慢设备的往返延迟")
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    parser.add_argument("--timeout-ms", type=float, default=1000)
+    parser.add_argument("--retries", type=int, default=2)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
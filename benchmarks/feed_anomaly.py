@@ -0,0 +1,84 @@
+"""采食异常分析基准测试
+
+在内存中生成全场母猪的日采食量矩阵（含缺失天和人为注入的少食、拒食、过量），测量向量化
+计算滚动基线、z分数和标注的耗时，并检查注入的异常被识别出的比例（需要numpy）：
+
+    python -m benchmarks.feed_anomaly --sows 50000 --days 30
+
+指定 --database 时再对合成数据库（见 benchmarks/synthetic.py）执行一次完整的全量分析，
+只统计不写入：
+
+    python -m benchmarks.feed_anomaly --database benchmarks/data/medium.db
+"""
+import argparse
+import os
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    raise SystemExit("采食异常分析需要安装numpy：pip install numpy")
+
+from benchmarks.synthetic import use_database
+
+def generate(sows, days, missing_rate, anomaly_rate, seed):
+    """返回 (日采食量矩阵, 注入的异常 {状态下标: 掩码})"""
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(2.0, 6.0, size=(sows, 1))
+    intake = base * rng.normal(1.0, 0.05, size=(sows, days))
+    injected = rng.random((sows, days)) < anomaly_rate
+    injected[:, :8] = False
+    kinds = rng.integers(0, 3, size=(sows, days))
+    low, refused, excess = injected & (kinds == 0), injected & (kinds == 1), injected & (kinds == 2)
+    intake[low] *= 0.5
+    intake[refused] *= 0.05
+    intake[excess] *= 1.6
+    intake[rng.random((sows, days)) < missing_rate] = np.nan
+    return intake, {"少食": low, "拒食": refused, "过量": excess}
+
+def run_memory(args):
+    from app.services.feed_anomaly import detect, FEED_STATUSES
+
+    intake, injected = generate(args.sows, args.days + 7, args.missing_rate, args.anomaly_rate, seed=0)
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        labels, _, _ = detect(intake)
+        timings.append(time.perf_counter() - started)
+    print(f"{args.sows} 头母猪 × {args.days} 天（另加7天基线）: 向量化分析 "
+          f"最快 {min(timings) * 1000:.0f}ms，平均 {sum(timings) / len(timings) * 1000:.0f}ms")
+    present = ~np.isnan(intake)
+    for status, mask in injected.items():
+        mask = mask & present
+        found = (labels[mask] == FEED_STATUSES.index(status)).sum()
+        print(f"{status}: 注入 {mask.sum()}，识别 {found} ({found / max(mask.sum(), 1):.0%})")
+    flagged = (labels != 0) & present & ~np.any(list(injected.values()), axis=0)
+    print(f"误报: {flagged.sum()} / {present.sum()} 个采食日")
+
+def run_database(args):
+    from app.services.feed_anomaly import FeedAnomalyDetector
+
+    detector = FeedAnomalyDetector(days=args.days)
+    started = time.perf_counter()
+    summary = detector.run(incremental=False, dry_run=True)
+    elapsed = time.perf_counter() - started
+    print(f"{args.database}: 分析 {summary['pigs']} 头猪只的 {summary['pig_days']} 个采食日，"
+          f"异常 {summary['anomalies']}，需要更新 {summary['updated']} 条记录，耗时 {elapsed:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="测量采食异常向量化分析的耗时和识别率")
+    parser.add_argument("--sows", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--missing-rate", type=float, default=0.02, help="没有喂食记录的天数比例")
+    parser.add_argument("--anomaly-rate", type=float, default=0.01, help="注入异常的天数比例")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database", help="合成数据库文件，指定时同时测量完整的全量分析（不写入）")
+    args = parser.parse_args()
+    if args.database:
+        use_database(f"sqlite:///{os.path.abspath(args.database)}")
+    run_memory(args)
+    if args.database:
+        run_database(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""下料调度器基准测试
+
+在内存中生成指定数量猪圈的下料设置（不访问数据库），测量编译全部设置、
+单个猪圈重新编译，以及按分钟推进一整天弹出到期下料指令的耗时：
+
+    python -m benchmarks.feed_scheduler --pens 5000 --slots 4
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+
+from app.services.feed_scheduler import FeedScheduler
+
+def make_rows(pens, slots, seed=0):
+    """生成 (设置ID, 猪圈ID, 饲料类型, 时间段JSON) 行，时间段分散在一天中的整分钟上"""
+    rng = random.Random(seed)
+    rows = []
+    for pen_id in range(1, pens + 1):
+        minutes = sorted(rng.sample(range(5 * 60, 22 * 60), slots))
+        time_slots = [{"time": f"{m // 60:02d}:{m % 60:02d}", "amount": round(rng.uniform(1.0, 2.0), 1)} for m in minutes]
+        rows.append((pen_id, pen_id, "标准饲料", json.dumps(time_slots)))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="测量下料调度器的编译和出队耗时")
+    parser.add_argument("--pens", type=int, default=5000)
+    parser.add_argument("--slots", type=int, default=4, help="每个猪圈每天的喂食次数")
+    parser.add_argument("--reloads", type=int, default=1000, help="单个猪圈重新编译的次数")
+    args = parser.parse_args()
+
+    rows = make_rows(args.pens, args.slots)
+    start_of_day = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    scheduler = FeedScheduler(enabled=False)
+
+    started = time.perf_counter()
+    scheduler.load_settings(rows, now=start_of_day)
+    compile_ms = (time.perf_counter() - started) * 1000
+    print(f"编译 {args.pens} 个猪圈的设置: {compile_ms:.1f}ms，队列 {len(scheduler.heap)} 条")
+
+    # 修改部分猪圈的时间段，只重新编译这些猪圈
+    started = time.perf_counter()
+    for i in range(args.reloads):
+        setting_id, pen_id, feed_type, time_slots = rows[i % len(rows)]
+        slots = json.loads(time_slots)
+        slots[0]["amount"] = round(slots[0]["amount"] + 0.1, 1)
+        scheduler.load_pen(pen_id, [(setting_id, pen_id, feed_type, json.dumps(slots))], now=start_of_day)
+    reload_us = (time.perf_counter() - started) / max(args.reloads, 1) * 1e6
+    print(f"单个猪圈重新编译: 平均 {reload_us:.1f}us，队列 {len(scheduler.heap)} 条")
+
+    # 按分钟推进一天，每分钟弹出到期的指令
+    commands = 0
+    ticks = []
+    for minute in range(1, 24 * 60 + 1):
+        now = start_of_day + datetime.timedelta(minutes=minute)
+        started = time.perf_counter()
+        commands += len(scheduler.pop_due(now))
+        ticks.append(time.perf_counter() - started)
+    ticks.sort()
+    print(f"一天共 {commands} 条下料指令（预期 {args.pens * args.slots}），"
+          f"每分钟出队 中位数 {ticks[len(ticks) // 2] * 1e6:.1f}us，最大 {ticks[-1] * 1000:.2f}ms，"
+          f"合计 {sum(ticks) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""实时推送中心基准测试
+
+在同一个事件循环中注册大量订阅客户端（部分客户端从不读取，模拟网络很慢的浏览器），
+从后台线程发布消息，检查广播耗时不受慢客户端影响，并统计正常客户端的接收延迟和丢弃数：
+
+    python -m benchmarks.push_hub --clients 1000 --slow 100 --messages 2000
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+from app.services.push_hub import PushHub
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0
+
+async def consume(subscriber, count, latencies):
+    received = 0
+    while received < count:
+        item = await subscriber.next(5)
+        if not item:
+            return received
+        received += 1
+        if received % 50 == 0:
+            latencies.append((time.perf_counter() - json.loads(item[2])["data"]["sent"]) * 1000)
+    return received
+
+async def run(args):
+    hub = PushHub(buffer_size=args.buffer, max_clients=args.clients)
+    hub.start()
+    fast = [hub.subscribe(["environment"]) for _ in range(args.clients - args.slow)]
+    slow = [hub.subscribe(["environment"]) for _ in range(args.slow)]
+    latencies = []
+    consumers = [asyncio.ensure_future(consume(subscriber, args.messages, latencies)) for subscriber in fast]
+
+    def publisher():
+        for n in range(args.messages):
+            hub.publish("environment", {"n": n, "sent": time.perf_counter()})
+            if args.interval_ms:
+                time.sleep(args.interval_ms / 1000)
+
+    started = time.perf_counter()
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    received = await asyncio.gather(*consumers)
+    elapsed = time.perf_counter() - started
+    thread.join()
+    hub.stop()
+
+    print(f"{args.messages} 条消息 / {args.clients} 个客户端（慢客户端 {args.slow}，缓冲区 {args.buffer}），"
+          f"全部送达 {elapsed:.2f}s，{args.messages * len(fast) / elapsed:,.0f} 条/秒")
+    print(f"正常客户端: 收齐 {sum(1 for count in received if count == args.messages)}/{len(fast)}，"
+          f"延迟 p50 {percentile(latencies, 0.5):.1f}ms，p95 {percentile(latencies, 0.95):.1f}ms")
+    print(f"慢客户端: 缓冲区 {sum(s.queue.qsize() for s in slow) // max(len(slow), 1)} 条，"
+          f"丢弃 {sum(s.dropped for s in slow)} 条；推送中心统计 {hub.stats}")
+
+def main():
+    parser = argparse.ArgumentParser(description="测试实时推送中心向大量客户端广播的耗时")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--slow", type=int, default=100, help="从不读取的慢客户端数")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--buffer", type=int, default=100, help="每个客户端的缓冲区大小")
+    parser.add_argument("--interval-ms", type=float, default=0.5, help="两次发布的间隔")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""全部路由的延迟与SQL语句数基准测试
+
+在合成数据库（见 benchmarks/synthetic.py）上用 FastAPI TestClient 逐个请求
+app/routes 中的每个路由，报告每个请求的 p50/p95/最大延迟和SQL语句数：
+
+    python -m benchmarks.synthetic --scale medium
+    python -m benchmarks.routes --scale medium --iterations 20 --output before.json
+    （修改代码后）
+    python -m benchmarks.routes --scale medium --output after.json --compare before.json
+
+默认每次请求前清空页面缓存，测量的是页面实际计算的耗时；--warm-cache 测量缓存命中时的耗时。
+写入类请求在合成数据库上执行，不会修改应用默认的数据库。
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from fastapi.routing import APIRoute
+
+from benchmarks.synthetic import SCALES, default_database, use_database
+
+# 不参与测试的路由：退出登录会使测试会话失效；导出在 EXTRA_URLS 中按日期范围测试，
+# 否则大规模数据下每次请求都会导出全部历史记录；实时推送为不会结束的事件流
+SKIPPED_PATHS = {"/logout", "/pig/export/{kind}", "/pig/api/live/events"}
+
+# 除默认参数外，额外测试的带筛选条件的请求
+EXTRA_URLS = [
+    "/pig/management?status=妊娠&health_status=健康",
+    "/pig/management?keyword=ET1000",
+    "/pig/feeding?start_date={month_ago}&end_date={today}",
+    "/pig/api/feeding?limit=1000",
+    "/pig/daily-summary?date={yesterday}",
+    "/pig/alerts?status=未处理&level=紧急",
+    "/pig/export/pigs?format=csv",
+    "/pig/export/feeding?format=csv&start_date={week_ago}&end_date={today}",
+    "/pig/export/environment?format=csv&start_date={week_ago}&end_date={today}",
+]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def get_requests(app, sample_ids, dates):
+    """枚举所有GET路由，用示例参数填充路径，返回 [(标签, 方法, 生成 (URL, 请求参数) 的函数)]"""
+    urls = []
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods or route.path in SKIPPED_PATHS:
+            continue
+        names = re.findall(r"{(\w+)}", route.path)
+        if any(name not in sample_ids for name in names):
+            print(f"跳过 {route.path}：缺少路径参数示例")
+            continue
+        urls.append(route.path.format(**{name: sample_ids[name] for name in names}))
+    urls += [url.format(**dates) for url in EXTRA_URLS]
+    return [(f"GET {url}", "GET", lambda i, url=url: (url, {})) for url in urls]
+
+def write_requests(pig_id, pig_pen_id, pen_id, house_id, dates):
+    """写入类请求，返回 [(标签, 方法, 生成 (URL, 请求参数) 的函数)]
+
+    新增的猪只在随后的删除请求中删除，每次迭代使用新的耳标号。
+    """
+    pig_form = {
+        "birth_date": "2023-03-01", "breed": "大白", "gender": "母", "weight": "180",
+        "backfat_thickness": "16", "status": "正常", "health_status": "健康",
+        "pen_id": str(pen_id), "entry_date": dates["today"],
+    }
+    added = []
+
+    def add_pig(i):
+        return "/pig/add", {"data": dict(pig_form, ear_tag=f"BENCH-{time.time_ns()}")}
+
+    def update_pig(i):
+        data = dict(pig_form, ear_tag=f"BENCH-UPDATE-{pig_id}", pen_id=str(pig_pen_id), weight=str(180 + i))
+        return f"/pig/update/{pig_id}", {"data": data}
+
+    def delete_pig(i):
+        return f"/pig/delete/{added.pop()}", {}
+
+    def import_feeding(i):
+        lines = ["ear_tag,feed_time,feed_amount,feed_status"] + [
+            f"ET{100001 + n % 50},{dates['today']} 0{n % 10}:{n % 60:02d}:00,2.{n % 10},正常" for n in range(200)
+        ]
+        return "/pig/import/feeding", {"files": {"file": ("feeding.csv", "\n".join(lines).encode("utf-8"), "text/csv")}}
+
+    def ingest_readings(i):
+        return "/pig/api/environment/readings", {"json": [
+            {"pig_house_id": house_id, "temperature": 22.5 + n % 3, "humidity": 60 + n % 5}
+            for n in range(100)
+        ]}
+
+    def remember_pig(response):
+        if response.status_code == 200:
+            added.append(response.json()["pig_id"])
+
+    return [
+        ("POST /pig/add", "POST", add_pig, remember_pig),
+        ("PUT /pig/update/{pig_id}", "PUT", update_pig, None),
+        ("DELETE /pig/delete/{pig_id}", "DELETE", delete_pig, None),
+        ("POST /pig/import/feeding（200行）", "POST", import_feeding, None),
+        ("POST /pig/api/environment/readings（100条）", "POST", ingest_readings, None),
+    ]
+
+def measure(client, page_cache, request_metrics, method, build, iterations, warm_cache, on_response=None):
+    """执行 iterations 次请求（另加一次预热），SQL语句数取自请求指标，包括流式响应传输中的查询"""
+    latencies, queries, statuses = [], [], set()
+    # 预热：加载模板、归档表列表等进程级缓存
+    for i in range(-1, iterations):
+        if not warm_cache:
+            page_cache.clear()
+        request_metrics.reset()
+        url, params = build(i)
+        started = time.perf_counter()
+        response = client.request(method, url, **params)
+        elapsed = time.perf_counter() - started
+        if on_response:
+            on_response(response)
+        if i < 0:
+            continue
+        latencies.append(elapsed)
+        queries.append(sum(stats.statements for stats in request_metrics.routes.values()))
+        statuses.add(response.status_code)
+    return {
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "queries": max(queries),
+        "status": sorted(statuses),
+    }
+
+def run(iterations, warm_cache, include_writes):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.models.database import SessionLocal, Pig, PigPen, PigHouse
+    from app.services.page_cache import page_cache
+    from app.services.profiling import request_metrics
+
+    db = SessionLocal()
+    try:
+        pig_id, pig_pen_id = db.query(Pig.id, Pig.pen_id).order_by(Pig.id).first()
+        # 新增猪只放入空位最多的猪圈
+        pen_id = db.query(PigPen.id).order_by((PigPen.capacity - PigPen.current_count).desc()).first()[0]
+        house_id = db.query(PigHouse.id).order_by(PigHouse.id).first()[0]
+    finally:
+        db.close()
+    today = datetime.date.today()
+    dates = {
+        "today": today.isoformat(),
+        "yesterday": (today - datetime.timedelta(days=1)).isoformat(),
+        "week_ago": (today - datetime.timedelta(days=7)).isoformat(),
+        "month_ago": (today - datetime.timedelta(days=30)).isoformat(),
+    }
+
+    results = {}
+    with TestClient(app) as client:
+        response = client.post("/login", data={"username": "admin", "password": "password"})
+        if "session_id" not in client.cookies:
+            raise SystemExit(f"登录失败: {response.status_code}，请先用 benchmarks.synthetic 生成数据库")
+
+        requests = [
+            (label, method, build, None)
+            for label, method, build in get_requests(app, {"pig_id": pig_id}, dates)
+        ]
+        if include_writes:
+            requests += write_requests(pig_id, pig_pen_id, pen_id, house_id, dates)
+
+        for label, method, build, on_response in requests:
+            result = results[label] = measure(
+                client, page_cache, request_metrics, method, build, iterations, warm_cache, on_response
+            )
+            print(f"{label:<60} p50 {result['p50_ms']:8.1f}ms  p95 {result['p95_ms']:8.1f}ms  "
+                  f"SQL {result['queries']:4d}  {','.join(map(str, result['status']))}")
+    return results
+
+def compare(results, baseline):
+    print("\n与基线比较（p50延迟 / SQL语句数）：")
+    for label, result in results.items():
+        old = baseline.get(label)
+        if not old:
+            print(f"{label:<60} 新增")
+            continue
+        change = (result["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0
+        queries = result["queries"] - old["queries"]
+        print(f"{label:<60} {old['p50_ms']:8.1f} -> {result['p50_ms']:8.1f}ms ({change:+6.1f}%)  "
+              f"SQL {old['queries']} -> {result['queries']}{' !' if queries > 0 else ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description="在合成数据上测试全部路由的延迟和SQL语句数")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--database", help="SQLite文件路径，默认 benchmarks/data/<规模>.db")
+    parser.add_argument("--url", help="数据库连接地址，优先于 --database")
+    parser.add_argument("--generate", action="store_true", help="数据库不存在时按 --scale 生成")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warm-cache", action="store_true", help="不清空页面缓存，测量缓存命中时的延迟")
+    parser.add_argument("--no-writes", action="store_true", help="只测试GET请求")
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    parser.add_argument("--compare", help="与之前 --output 写出的JSON结果比较")
+    args = parser.parse_args()
+
+    url = args.url
+    if not url:
+        path = os.path.abspath(args.database or default_database(args.scale))
+        if not os.path.exists(path) and not args.generate:
+            raise SystemExit(f"{path} 不存在，先运行 python -m benchmarks.synthetic --scale {args.scale}，或加 --generate")
+        url = f"sqlite:///{path}"
+    use_database(url)
+
+    if args.generate and not args.url and not os.path.exists(path):
+        from benchmarks.synthetic import prepare_database
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        prepare_database(args.scale)
+
+    results = run(args.iterations, args.warm_cache, not args.no_writes)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "revision": git_revision(),
+                "scale": args.scale,
+                "database": url,
+                "iterations": args.iterations,
+                "warm_cache": args.warm_cache,
+                "results": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f)["results"])
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""猪只搜索基准测试
+
+在独立的SQLite文件中生成指定数量的猪只（耳标号、品种和备注），经触发器同步到全文索引后，
+对比原来的 ear_tag 前后通配 LIKE 查询与全文索引查询的延迟，并测量内存中耳标号前缀补全的耗时：
+
+    python -m benchmarks.search --pigs 100000
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+
+from benchmarks.synthetic import use_database
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BREEDS = ["大白", "长白", "杜洛克", "皮特兰", "巴克夏"]
+NOTES = ["左耳有缺口", "曾患腹泻已治愈", "产仔性能好", "乳头数14个", "脾气温顺", "需重点观察采食", ""]
+
+def percentiles(timings):
+    ordered = sorted(timings)
+    pick = lambda fraction: ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000
+    return f"p50 {pick(0.5):.2f}ms，p95 {pick(0.95):.2f}ms，最大 {ordered[-1] * 1000:.2f}ms"
+
+def populate(pigs, rng):
+    from sqlalchemy import insert
+    from app.models.database import init_db, SessionLocal, Pig, PigHouse, PigPen
+    from app.db_migrate import migrate_database
+
+    init_db()
+    migrate_database()
+    db = SessionLocal()
+    try:
+        if db.query(Pig.id).count() >= pigs:
+            return
+        conn = db.connection()
+        conn.execute(insert(PigHouse.__table__), [{"name": "基准猪舍", "capacity": pigs}])
+        conn.execute(insert(PigPen.__table__), [{"pen_number": "B-1", "pig_house_id": 1, "capacity": pigs}])
+        now = datetime.datetime.now()
+        started = time.perf_counter()
+        conn.execute(insert(Pig.__table__), [
+            {"ear_tag": f"ET{n:07d}", "breed": rng.choice(BREEDS), "status": "正常", "health_status": "健康",
+             "pen_id": 1, "entry_date": now - datetime.timedelta(minutes=n), "notes": f"{rng.choice(NOTES)} #{n}"}
+            for n in range(1, pigs + 1)
+        ])
+        db.commit()
+        print(f"写入 {pigs} 头猪只（含全文索引触发器）用时 {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+def run(args):
+    rng = random.Random(0)
+    populate(args.pigs, rng)
+
+    from sqlalchemy import func, select
+    from app.models.database import SessionLocal, Pig
+    from app.services.pig_search import keyword_filter, search_index_ready, ear_tag_index
+
+    # 耳标号片段只匹配少数猪只；品种和备注关键词匹配上万头，耗时主要在统计匹配数
+    groups = {
+        "耳标号片段": [f"{rng.randint(1, args.pigs):07d}"[rng.randint(0, 3):] for _ in range(args.queries)],
+        "品种/备注": [rng.choice(["缺口", "腹泻已治", "温顺", "重点观察", "杜洛克"]) for _ in range(args.queries // 5)],
+    }
+    print(f"全文索引: {'可用' if search_index_ready() else '不可用，使用LIKE'}")
+
+    def page_query(db, condition):
+        # 与管理页面相同：统计总数并取第一页
+        db.execute(select(func.count(Pig.id)).where(condition)).scalar()
+        db.execute(select(Pig.id).where(condition).order_by(Pig.entry_date.desc(), Pig.id.desc()).limit(20)).all()
+
+    db = SessionLocal()
+    try:
+        for label, condition_of in (
+            ("LIKE '%关键词%'（耳标号）", lambda keyword: Pig.ear_tag.like(f"%{keyword}%")),
+            ("全文索引（耳标号/品种/备注）", keyword_filter),
+        ):
+            for group, keywords in groups.items():
+                timings = []
+                for keyword in keywords:
+                    started = time.perf_counter()
+                    page_query(db, condition_of(keyword))
+                    timings.append(time.perf_counter() - started)
+                print(f"{label}，{group} {len(keywords)} 个: {percentiles(timings)}")
+
+        started = time.perf_counter()
+        ear_tag_index.ensure_loaded(db)
+        print(f"耳标号索引加载 {len(ear_tag_index)} 条，用时 {(time.perf_counter() - started) * 1000:.0f}ms")
+    finally:
+        db.close()
+
+    timings = []
+    for _ in range(args.queries):
+        prefix = "ET" + f"{rng.randint(1, args.pigs):07d}"[:rng.randint(1, 5)]
+        started = time.perf_counter()
+        ear_tag_index.complete(prefix, 10)
+        timings.append(time.perf_counter() - started)
+    print(f"耳标号前缀补全: {percentiles(timings)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="对比LIKE与全文索引的猪只搜索延迟")
+    parser.add_argument("--pigs", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--database", help="SQLite文件路径，默认 benchmarks/data/search-<猪只数>.db")
+    args = parser.parse_args()
+    database = args.database or os.path.join(BENCHMARK_DIR, "data", f"search-{args.pigs}.db")
+    os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+    use_database(f"sqlite:///{os.path.abspath(database)}")
+    run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""应用启动耗时基准测试
+
+在新的子进程中导入应用并执行启动事件，分别测量导入耗时和启动检查耗时，
+启动检查超过预算时以非零状态退出（默认使用 STARTUP_BUDGET_MS）：
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --database benchmarks/data/medium.db --budget-ms 100
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中执行：输出导入和启动耗时（秒）
+CHILD_SCRIPT = """
+import asyncio, contextlib, io, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def run():
+    await app.router.startup()
+    ready = time.perf_counter()
+    # 关闭后台线程和设备网关
+    await app.router.shutdown()
+    return ready
+
+with contextlib.redirect_stdout(io.StringIO()):
+    ready = asyncio.run(run())
+print(json.dumps({"import": imported - started, "startup": ready - imported}))
+"""
+
+def measure_once(env):
+    output = subprocess.check_output([sys.executable, "-c", CHILD_SCRIPT], cwd=PROJECT_DIR, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="测量应用导入和启动检查的耗时")
+    parser.add_argument("--database", help="SQLite文件路径，默认使用应用配置的数据库")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=int, help="启动检查的耗时预算，默认 STARTUP_BUDGET_MS")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.database:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.database)}"
+    env["PYTHONPATH"] = PROJECT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+
+    if args.budget_ms is None:
+        sys.path.insert(0, PROJECT_DIR)
+        from app.config import STARTUP_BUDGET_MS
+        args.budget_ms = STARTUP_BUDGET_MS
+
+    runs = [measure_once(env) for _ in range(args.runs)]
+    # 第一次运行可能执行建表或修复数据，单独列出
+    first, steady = runs[0], runs[1:] or runs
+    import_ms = statistics.median(run["import"] for run in steady) * 1000
+    startup_ms = statistics.median(run["startup"] for run in steady) * 1000
+    print(f"首次启动: 导入 {first['import'] * 1000:.0f}ms，启动检查 {first['startup'] * 1000:.0f}ms")
+    print(f"之后 {len(steady)} 次中位数: 导入 {import_ms:.0f}ms，启动检查 {startup_ms:.0f}ms（预算 {args.budget_ms}ms）")
+    if args.budget_ms and startup_ms > args.budget_ms:
+        print("启动检查超出预算")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
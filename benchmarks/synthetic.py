@@ -0,0 +1,443 @@
+"""大规模养殖场合成数据生成器
+
+按配置的猪舍数、每舍猪圈数、母猪数和历史天数，用numpy按列批量生成
+猪舍、猪圈、母猪、喂食、环境、健康、繁育和报警数据，通过数据库驱动的
+executemany 直接写入，不经过ORM，几百万行记录可在数十秒内生成。
+同时按天累加生成每日汇总表，并创建 admin / password 账号。
+
+    python -m benchmarks.synthetic --scale medium
+    python -m benchmarks.synthetic --database /tmp/farm.db --houses 8 --sows 1500 --days 730
+
+数据写入 --database 指定的SQLite文件（默认 benchmarks/data/<规模>.db）或
+--url 指定的数据库，不会修改应用默认的 app/pig_management.db。需要安装numpy。
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import numpy as np
+except ImportError:
+    raise SystemExit("生成合成数据需要安装numpy：pip install numpy")
+
+# 预设规模：猪舍数、每舍猪圈数、母猪数、历史天数、每头每天喂食次数、环境读数间隔（分钟）
+SCALES = {
+    "small": {"houses": 3, "pens_per_house": 10, "sows": 300, "days": 90, "feedings_per_day": 2, "env_interval": 30},
+    "medium": {"houses": 10, "pens_per_house": 20, "sows": 2000, "days": 365, "feedings_per_day": 2, "env_interval": 10},
+    "large": {"houses": 20, "pens_per_house": 40, "sows": 5000, "days": 730, "feedings_per_day": 2, "env_interval": 5},
+}
+
+# 喂食和环境记录每批生成并写入的行数，限制内存占用
+CHUNK_ROWS = 500_000
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BREEDS = ["大白", "长白", "杜洛克", "皮特兰", "巴克夏"]
+PIG_STATUSES = ["正常", "妊娠", "哺乳", "分娩", "休息", "治疗"]
+HEALTH_STATUSES = ["健康", "待观察", "治疗中", "隔离中"]
+PEN_TYPES = ["妊娠舍", "分娩舍", "保育舍", "育成舍"]
+MANAGERS = ["张三", "李四", "王五", "赵六"]
+FEED_TYPES = ["标准饲料", "妊娠饲料", "哺乳饲料", "恢复饲料"]
+FEED_STATUSES = ["正常", "少食", "拒食", "过量"]
+FEED_STATUS_WEIGHTS = [0.9, 0.05, 0.02, 0.03]
+SYMPTOMS = ["食欲不振", "发热", "咳嗽", "皮肤异常", "呼吸急促"]
+DIAGNOSES = ["轻微感染", "呼吸道疾病", "消化系统问题", "皮肤病", "产后综合症"]
+TREATMENTS = ["观察", "抗生素治疗", "补充营养", "隔离治疗"]
+VETS = ["张医生", "李医生", "王医生", "赵医生"]
+ALERT_TYPES = ["温度异常", "采食异常", "健康异常", "设备故障", "环境异常"]
+ALERT_LEVELS = ["紧急", "重要", "一般"]
+ALERT_STATUSES = ["未处理", "处理中", "已解决", "已忽略"]
+
+def default_database(scale):
+    return os.path.join(BENCHMARK_DIR, "data", f"{scale}.db")
+
+def use_database(url):
+    """让随后导入的 app 模块连接到指定数据库，必须在导入 app 之前调用"""
+    os.environ["DATABASE_URL"] = url
+    # 生成的历史数据不应被后台归档线程移动
+    os.environ["RETENTION_DAYS"] = "0"
+    # 测量期间不按下料设置自动写入喂食记录
+    os.environ["FEED_SCHEDULER"] = "0"
+    # 也不在后台重新标注采食状态
+    os.environ["FEED_ANOMALY_INTERVAL_MINUTES"] = "0"
+
+class ColumnWriter:
+    """把按列组织的numpy数组转换为驱动参数并批量插入"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.sqlite = conn.dialect.name == "sqlite"
+        self.placeholder = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+        self.quote = conn.dialect.identifier_preparer.quote
+
+    def values(self, array):
+        if not isinstance(array, np.ndarray):
+            return list(array)
+        if array.dtype == "datetime64[D]":
+            return np.datetime_as_string(array).tolist() if self.sqlite else array.tolist()
+        if np.issubdtype(array.dtype, np.datetime64):
+            array = array.astype("datetime64[us]")
+            if not self.sqlite:
+                return array.tolist()
+            # 与SQLAlchemy在SQLite中保存DateTime的格式一致，NaT写为NULL
+            values = np.char.replace(np.datetime_as_string(array, unit="us"), "T", " ").tolist()
+            for i in np.flatnonzero(np.isnat(array)).tolist():
+                values[i] = None
+            return values
+        return array.tolist()
+
+    def insert(self, table, columns):
+        names = list(columns)
+        sql = (
+            f"INSERT INTO {self.quote(table.name)} ({', '.join(self.quote(name) for name in names)}) "
+            f"VALUES ({', '.join([self.placeholder] * len(names))})"
+        )
+        rows = list(zip(*[self.values(values) for values in columns.values()]))
+        if rows:
+            self.conn.exec_driver_sql(sql, rows)
+        return len(rows)
+
+@contextmanager
+def deferred_indexes(conn, tables):
+    """写入期间删除大表的二级索引，写完后一次性重建，比逐行维护索引快得多"""
+    indexes = [index for table in tables for index in table.indexes]
+    for index in indexes:
+        index.drop(conn, checkfirst=True)
+    yield
+    for index in indexes:
+        index.create(conn)
+
+class DailyTotals:
+    """按 (天序号, 分组编号) 累加各批记录的条数和数值，直接生成每日汇总表的行"""
+
+    def __init__(self, days, groups, value_count=0):
+        self.groups = groups
+        self.counts = np.zeros(days * groups, dtype="int64")
+        self.sums = np.zeros((value_count, days * groups))
+
+    def add(self, day_index, group, *values):
+        key = day_index * self.groups + group
+        self.counts += np.bincount(key, minlength=len(self.counts))
+        for i, value in enumerate(values):
+            self.sums[i] += np.bincount(key, weights=value, minlength=len(self.counts))
+
+    def rows(self, first_day):
+        """返回 (日期数组, 分组编号数组, 条数数组, [各数值列合计])，只包含有记录的组合"""
+        keys = np.flatnonzero(self.counts)
+        return first_day + keys // self.groups, keys % self.groups, self.counts[keys], list(self.sums[:, keys])
+
+def pick(rng, choices, size, p=None):
+    return np.asarray(choices, dtype=object)[rng.choice(len(choices), size=size, p=p)]
+
+def minutes(values):
+    return np.asarray(values, dtype="int64").astype("timedelta64[m]")
+
+def generate(engine, houses, pens_per_house, sows, days, feedings_per_day, env_interval, alerts=None, seed=42):
+    """向空数据库写入合成数据和对应的每日汇总，返回 {表名: 行数}"""
+    from app.models.database import (
+        PigHouse, PigPen, Pig, FeedingRecord, FeedSetting, HealthRecord, BreedingRecord,
+        EnvironmentRecord, Alert, User, FeedingDailyRollup, EnvironmentDailyRollup, AlertDailyRollup
+    )
+    from app.utils.password import get_password_hash
+
+    rng = np.random.default_rng(seed)
+    now = np.datetime64(datetime.datetime.now().replace(second=0, microsecond=0), "m")
+    today = now.astype("datetime64[D]")
+    first_day = today - days
+    history_start = first_day.astype("datetime64[m]")
+    counts = {}
+
+    def day_index(times):
+        return (times - history_start).astype("int64") // 1440
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        writer = ColumnWriter(conn)
+
+        # 猪舍、猪圈（ID从1开始连续分配）
+        house_ids = np.arange(1, houses + 1)
+        counts["pig_houses"] = writer.insert(PigHouse.__table__, {
+            "name": [f"第{i}号猪舍" for i in house_ids],
+            "location": [f"{chr(65 + (i - 1) // 10 % 26)}区{i}号位置" for i in house_ids],
+            "capacity": np.full(houses, pens_per_house * max(12, int(np.ceil(sows / (houses * pens_per_house) * 1.5)))),
+            "current_count": np.zeros(houses, dtype=int),
+            "manager": pick(rng, MANAGERS, houses),
+            "temperature": rng.uniform(20.0, 26.0, houses).round(1),
+            "humidity": rng.uniform(50.0, 70.0, houses).round(1),
+            "created_at": np.full(houses, history_start),
+        })
+
+        pen_count = houses * pens_per_house
+        # 留出空位，便于基准测试中新增猪只
+        pen_capacity = max(12, int(np.ceil(sows / pen_count * 1.5)))
+        pen_house = np.repeat(house_ids, pens_per_house)
+        pen_index = np.tile(np.arange(1, pens_per_house + 1), houses)
+        pen_ids = np.arange(1, pen_count + 1)
+        counts["pig_pens"] = writer.insert(PigPen.__table__, {
+            "pen_number": [f"P{h}-{i}" for h, i in zip(pen_house.tolist(), pen_index.tolist())],
+            "pig_house_id": pen_house,
+            "capacity": np.full(pen_count, pen_capacity),
+            "current_count": np.zeros(pen_count, dtype=int),
+            "type": pick(rng, PEN_TYPES, pen_count),
+            "area": rng.uniform(20.0, 30.0, pen_count).round(1),
+            "created_at": np.full(pen_count, history_start),
+        })
+
+        # 母猪：均匀分配到各猪圈
+        pig_ids = np.arange(1, sows + 1)
+        pig_pen = rng.integers(1, pen_count + 1, sows)
+        counts["pigs"] = writer.insert(Pig.__table__, {
+            "ear_tag": [f"ET{100000 + i}" for i in pig_ids],
+            "birth_date": now - minutes(rng.integers(365, 1460, sows) * 1440),
+            "breed": pick(rng, BREEDS, sows),
+            "gender": ["母"] * sows,
+            "weight": rng.uniform(150.0, 250.0, sows).round(1),
+            "backfat_thickness": rng.uniform(10.0, 25.0, sows).round(1),
+            "status": pick(rng, PIG_STATUSES, sows),
+            "pen_id": pig_pen,
+            "health_status": pick(rng, HEALTH_STATUSES, sows, p=[0.85, 0.08, 0.05, 0.02]),
+            "entry_date": now - minutes(rng.integers(30, 1000, sows) * 1440),
+            "last_update": np.full(sows, now),
+        })
+        pen_counts = np.bincount(pig_pen, minlength=pen_count + 1)[1:]
+        house_counts = np.bincount(pen_house, weights=pen_counts, minlength=houses + 1)[1:].astype(int)
+        conn.exec_driver_sql(
+            f"UPDATE pig_pens SET current_count = {writer.placeholder} WHERE id = {writer.placeholder}",
+            list(zip(pen_counts.tolist(), pen_ids.tolist()))
+        )
+        conn.exec_driver_sql(
+            f"UPDATE pig_houses SET current_count = {writer.placeholder} WHERE id = {writer.placeholder}",
+            list(zip(house_counts.tolist(), house_ids.tolist()))
+        )
+
+        # 下料设置：每个猪圈一条
+        times = rng.integers(3, 5, pen_count)
+        slots = [
+            [{"time": f"{6 + i * (12 // n):02d}:00", "amount": round(float(a), 1)} for i, a in enumerate(rng.uniform(1.0, 2.0, n))]
+            for n in times.tolist()
+        ]
+        counts["feed_settings"] = writer.insert(FeedSetting.__table__, {
+            "pen_id": pen_ids,
+            "feed_type": pick(rng, FEED_TYPES, pen_count),
+            "daily_amount": [round(sum(slot["amount"] for slot in s), 1) for s in slots],
+            "feeding_times": times,
+            "time_slots": [json.dumps(s) for s in slots],
+            "enabled": [True] * pen_count,
+            "created_at": np.full(pen_count, history_start),
+            "updated_at": np.full(pen_count, history_start),
+        })
+
+        with deferred_indexes(conn, [FeedingRecord.__table__, EnvironmentRecord.__table__]):
+            # 喂食记录：每头母猪每天 feedings_per_day 次，按天分批生成
+            per_day = sows * feedings_per_day
+            days_per_chunk = max(1, CHUNK_ROWS // per_day)
+            slot_minutes = (6 * 60 + np.arange(feedings_per_day) * (12 * 60 // feedings_per_day))
+            feeding_totals = DailyTotals(days + 1, (pen_count + 1) * len(FEED_STATUSES), 1)
+            counts["feeding_records"] = 0
+            for chunk_start in range(0, days, days_per_chunk):
+                chunk_days = min(days_per_chunk, days - chunk_start)
+                size = chunk_days * per_day
+                day_offsets = np.repeat(np.arange(chunk_start, chunk_start + chunk_days), per_day)
+                feed_time = history_start + minutes(
+                    day_offsets * 1440 + np.tile(np.repeat(slot_minutes, sows), chunk_days) + rng.integers(0, 30, size)
+                )
+                keep = feed_time <= now
+                pig_id = np.tile(pig_ids, chunk_days * feedings_per_day)[keep]
+                feed_amount = rng.normal(2.5, 0.4, size).clip(0.5, 5.0).round(2)[keep]
+                status_code = rng.choice(len(FEED_STATUSES), size=size, p=FEED_STATUS_WEIGHTS)[keep]
+                counts["feeding_records"] += writer.insert(FeedingRecord.__table__, {
+                    "pig_id": pig_id,
+                    "feed_time": feed_time[keep],
+                    "feed_amount": feed_amount,
+                    "duration": rng.integers(10, 45, size)[keep],
+                    "feed_type": pick(rng, FEED_TYPES, size)[keep],
+                    "feed_status": np.asarray(FEED_STATUSES, dtype=object)[status_code],
+                    "automatic": (rng.random(size) < 0.75)[keep],
+                })
+                feeding_totals.add(
+                    day_index(feed_time[keep]), pig_pen[pig_id - 1] * len(FEED_STATUSES) + status_code, feed_amount
+                )
+
+            # 环境记录：每个猪舍每 env_interval 分钟一条，温度带日周期
+            per_house = days * 1440 // env_interval
+            chunk_steps = max(1, CHUNK_ROWS // houses)
+            phase = rng.uniform(0, 2 * np.pi, houses)
+            environment_totals = DailyTotals(days + 1, houses + 1, 2)
+            counts["environment_records"] = 0
+            for first_step in range(0, per_house, chunk_steps):
+                steps = np.arange(first_step, min(first_step + chunk_steps, per_house))
+                offsets = steps * env_interval
+                size = len(steps) * houses
+                record_time = history_start + minutes(np.repeat(offsets, houses))
+                hour_angle = (np.repeat(offsets, houses) % 1440) / 1440 * 2 * np.pi
+                house_id = np.tile(house_ids, len(steps))
+                temperature = (23 + 3 * np.sin(hour_angle - np.pi / 2) + np.tile(phase, len(steps)) * 0.3
+                               + rng.normal(0, 0.6, size)).round(2)
+                humidity = (60 - 8 * np.sin(hour_angle - np.pi / 2) + rng.normal(0, 2.5, size)).clip(20, 100).round(2)
+                counts["environment_records"] += writer.insert(EnvironmentRecord.__table__, {
+                    "pig_house_id": house_id,
+                    "record_time": record_time,
+                    "temperature": temperature,
+                    "humidity": humidity,
+                    "co2_level": rng.uniform(400.0, 1200.0, size).round(1),
+                    "ammonia_level": rng.uniform(5.0, 25.0, size).round(2),
+                    "air_quality_index": rng.uniform(50.0, 150.0, size).round(1),
+                })
+                environment_totals.add(day_index(record_time), house_id, temperature, humidity)
+
+        # 健康记录：平均每头母猪每300天一条
+        size = max(1, sows * days // 300)
+        record_date = history_start + minutes(rng.integers(0, days * 1440, size))
+        counts["health_records"] = writer.insert(HealthRecord.__table__, {
+            "pig_id": rng.integers(1, sows + 1, size),
+            "record_date": record_date,
+            "temperature": rng.uniform(37.5, 40.0, size).round(1),
+            "symptoms": pick(rng, SYMPTOMS, size),
+            "diagnosis": pick(rng, DIAGNOSES, size),
+            "treatment": pick(rng, TREATMENTS, size),
+            "vet_name": pick(rng, VETS, size),
+            "follow_up_date": record_date + minutes(rng.integers(3, 14, size) * 1440),
+        })
+
+        # 繁育记录：每头母猪约每150天一个繁育周期
+        cycles = max(1, days // 150)
+        size = sows * cycles
+        breeding_date = history_start + minutes(
+            (np.tile(np.arange(cycles), sows) * 150 + rng.integers(0, 30, size)) * 1440
+        )
+        expected = breeding_date + minutes(np.full(size, 114 * 1440))
+        farrowed = expected < now
+        total_born = rng.integers(8, 16, size)
+        born_alive = np.minimum(total_born, rng.integers(7, 15, size))
+        counts["breeding_records"] = writer.insert(BreedingRecord.__table__, {
+            "pig_id": np.repeat(pig_ids, cycles),
+            "breeding_date": breeding_date,
+            "expected_farrowing_date": expected,
+            "actual_farrowing_date": np.where(farrowed, expected + minutes(rng.integers(-2, 3, size) * 1440), np.datetime64("NaT")),
+            # 尚未分娩的记录没有仔猪数据
+            "total_born": np.where(farrowed, total_born, None),
+            "born_alive": np.where(farrowed, born_alive, None),
+            "stillborn": np.where(farrowed, total_born - born_alive, None),
+        })
+
+        # 报警记录：默认每个猪舍每天两条
+        size = alerts if alerts is not None else houses * days * 2
+        alert_time = history_start + minutes(rng.integers(0, days * 1440, size))
+        alert_status = pick(rng, ALERT_STATUSES, size, p=[0.05, 0.05, 0.8, 0.1])
+        processed = np.isin(alert_status, ["已解决", "已忽略"])
+        type_code = rng.integers(0, len(ALERT_TYPES), size)
+        level_code = rng.integers(0, len(ALERT_LEVELS), size)
+        alert_type = np.asarray(ALERT_TYPES, dtype=object)[type_code]
+        location = np.where(
+            rng.random(size) < 0.5,
+            pick(rng, [f"猪舍{i}" for i in house_ids], size),
+            pick(rng, [f"圈舍P{h}-{i}" for h, i in zip(pen_house.tolist(), pen_index.tolist())], size),
+        )
+        counts["alerts"] = writer.insert(Alert.__table__, {
+            "alert_time": alert_time,
+            "alert_type": alert_type,
+            "alert_level": np.asarray(ALERT_LEVELS, dtype=object)[level_code],
+            "location": location,
+            "details": [f"{loc}{kind}" for loc, kind in zip(location.tolist(), alert_type.tolist())],
+            "duration": rng.integers(10, 120, size),
+            "status": alert_status,
+            "processed_by": np.where(processed, "管理员", None),
+            "processed_time": np.where(processed, alert_time + minutes(rng.integers(60, 480, size)), np.datetime64("NaT")),
+        })
+
+        counts["users"] = writer.insert(User.__table__, {
+            "username": ["admin"],
+            "email": ["admin@example.com"],
+            "hashed_password": [get_password_hash("password")],
+            "is_active": [True],
+            "is_admin": [True],
+            "created_at": [datetime.datetime.now()],
+        })
+
+        # 每日汇总：与 rebuild_rollups 的结果相同，但无需再扫描刚写入的记录
+        day, group, count, (amount,) = feeding_totals.rows(first_day)
+        counts["feeding_daily_rollups"] = writer.insert(FeedingDailyRollup.__table__, {
+            "day": day,
+            "pen_id": group // len(FEED_STATUSES),
+            "feed_status": np.asarray(FEED_STATUSES, dtype=object)[group % len(FEED_STATUSES)],
+            "record_count": count,
+            "feed_amount": amount,
+        })
+        day, group, count, (temperature_sum, humidity_sum) = environment_totals.rows(first_day)
+        counts["environment_daily_rollups"] = writer.insert(EnvironmentDailyRollup.__table__, {
+            "day": day,
+            "pig_house_id": group,
+            "record_count": count,
+            "temperature_sum": temperature_sum,
+            "humidity_sum": humidity_sum,
+        })
+        alert_totals = DailyTotals(days + 1, len(ALERT_TYPES) * len(ALERT_LEVELS))
+        alert_totals.add(day_index(alert_time), type_code * len(ALERT_LEVELS) + level_code)
+        day, group, count, _ = alert_totals.rows(first_day)
+        counts["alert_daily_rollups"] = writer.insert(AlertDailyRollup.__table__, {
+            "day": day,
+            "alert_type": np.asarray(ALERT_TYPES, dtype=object)[group // len(ALERT_LEVELS)],
+            "alert_level": np.asarray(ALERT_LEVELS, dtype=object)[group % len(ALERT_LEVELS)],
+            "alert_count": count,
+        })
+    return counts
+
+def prepare_database(scale=None, **options):
+    """创建表结构并生成数据；调用前需已通过 use_database 指定数据库"""
+    from app.models.database import engine, init_db
+    from app.db_migrate import migrate_database
+
+    settings = dict(SCALES[scale or "small"])
+    settings.update({key: value for key, value in options.items() if value is not None})
+    init_db()
+    migrate_database()
+    started = time.perf_counter()
+    counts = generate(engine, **settings)
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"已生成 {total} 行数据，用时 {elapsed:.1f}s（{total / elapsed:,.0f} 行/秒）")
+    for table, count in counts.items():
+        print(f"  {table}: {count}")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="生成大规模养殖场合成数据")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="预设规模，其余参数可覆盖预设值")
+    parser.add_argument("--database", help="SQLite文件路径，默认 benchmarks/data/<规模>.db")
+    parser.add_argument("--url", help="数据库连接地址，优先于 --database")
+    parser.add_argument("--houses", type=int)
+    parser.add_argument("--pens-per-house", type=int)
+    parser.add_argument("--sows", type=int)
+    parser.add_argument("--days", type=int, help="历史数据天数")
+    parser.add_argument("--feedings-per-day", type=int)
+    parser.add_argument("--env-interval", type=int, help="环境读数间隔（分钟）")
+    parser.add_argument("--alerts", type=int, help="报警记录数，默认每个猪舍每天两条")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="删除已存在的SQLite文件后重新生成")
+    args = parser.parse_args()
+
+    url = args.url
+    if not url:
+        path = os.path.abspath(args.database or default_database(args.scale))
+        if os.path.exists(path):
+            if not args.force:
+                raise SystemExit(f"{path} 已存在，使用 --force 重新生成")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        url = f"sqlite:///{path}"
+
+    use_database(url)
+    prepare_database(
+        args.scale, houses=args.houses, pens_per_house=args.pens_per_house, sows=args.sows,
+        days=args.days, feedings_per_day=args.feedings_per_day, env_interval=args.env_interval,
+        alerts=args.alerts, seed=args.seed
+    )
+
+if __name__ == "__main__":
+    main()
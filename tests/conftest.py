@@ -0,0 +1,76 @@
+"""路由测试的公共配置
+
+默认在临时SQLite文件上运行；设置 TEST_DATABASE_URL 时改用该数据库（如本地PostgreSQL），
+数据库无法连接时跳过全部测试：
+
+    python -m pytest tests
+    TEST_DATABASE_URL=postgresql://postgres@localhost/pig_test python -m pytest tests/test_routes.py
+
+数据库地址必须在导入 app 之前确定，这里在模块加载时写入环境变量。
+"""
+import os
+import tempfile
+
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix="pig-tests-")
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL") or "sqlite:///" + os.path.join(TEST_DIR, "test.db")
+
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["INGESTION_SPILL_FILE"] = os.path.join(TEST_DIR, "ingestion_spill.jsonl")
+# 会话保存在数据库中，测试 DatabaseSessionStore
+os.environ["SESSION_BACKEND"] = "database"
+# 在响应头 X-Query-Count 中返回SQL语句数，供 test_query_budget.py 检查
+os.environ["QUERY_COUNT_HEADER"] = "1"
+# 不启动会修改测试数据的后台任务
+os.environ["RETENTION_DAYS"] = "0"
+os.environ["FEED_SCHEDULER"] = "0"
+os.environ["FEED_ANOMALY_INTERVAL_MINUTES"] = "0"
+
+def database_unavailable(url):
+    """数据库无法连接时返回原因，可以连接时返回 None"""
+    from sqlalchemy import create_engine, text
+
+    try:
+        engine = create_engine(url)
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        finally:
+            engine.dispose()
+    except Exception as e:
+        return f"{e.__class__.__name__}: {e}".splitlines()[0]
+    return None
+
+# 测试模块在导入 app 之前检查，数据库无法连接（或未安装驱动）时跳过整个模块
+DATABASE_UNAVAILABLE = database_unavailable(TEST_DATABASE_URL)
+
+@pytest.fixture(scope="session")
+def client():
+    """启动应用（建表并写入示例数据）的测试客户端"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def db(client):
+    from app.models.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def login(client):
+    """以示例管理员登录，返回会话ID；测试结束后退出登录"""
+    response = client.post("/login", data={"username": "admin", "password": "password"}, follow_redirects=False)
+    assert response.status_code == 303
+    session_id = response.cookies["session_id"]
+    client.cookies.set("session_id", session_id)
+    yield session_id
+    client.get("/logout", follow_redirects=False)
+    client.cookies.clear()
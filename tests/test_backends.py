@@ -0,0 +1,40 @@
+"""在每种数据库上各运行一次 test_routes.py
+
+数据库地址在导入 app 时确定，所以当前进程之外的数据库在子进程中测试。PostgreSQL 使用
+TEST_POSTGRES_URL（默认本地的 pig_test 库），无法连接或未安装驱动时跳过。
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy.engine import make_url
+
+from tests.conftest import TEST_DATABASE_URL, database_unavailable
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(TESTS_DIR)
+
+BACKENDS = {
+    "sqlite": lambda: "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="pig-tests-"), "test.db"),
+    "postgresql": lambda: os.environ.get("TEST_POSTGRES_URL", "postgresql://postgres@localhost:5432/pig_test"),
+}
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_routes_on_backend(backend):
+    if make_url(TEST_DATABASE_URL).get_backend_name() == backend:
+        pytest.skip(f"{backend} 已在当前进程中测试")
+    url = BACKENDS[backend]()
+    reason = database_unavailable(url)
+    if reason:
+        pytest.skip(f"无法连接 {url}: {reason}")
+
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", os.path.join(TESTS_DIR, "test_routes.py")],
+        cwd=PROJECT_DIR,
+        env={**os.environ, "TEST_DATABASE_URL": url},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stdout[-5000:] + result.stderr[-2000:]
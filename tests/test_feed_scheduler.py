@@ -0,0 +1,61 @@
+"""下料调度器：写入失败的已确认指令留在队列中重试，其他进程修改的设置会被重新加载"""
+import datetime
+import json
+
+import pytest
+from sqlalchemy import select
+
+from tests.conftest import TEST_DATABASE_URL, DATABASE_UNAVAILABLE
+
+if DATABASE_UNAVAILABLE:
+    pytest.skip(f"无法连接测试数据库 {TEST_DATABASE_URL}: {DATABASE_UNAVAILABLE}", allow_module_level=True)
+
+from app.models.database import FeedSetting
+from app.services.feed_scheduler import FeedScheduler
+
+class FlakyScheduler(FeedScheduler):
+    """前 failures 次写入失败，记录成功写入的指令，不访问数据库"""
+
+    def __init__(self, failures):
+        super().__init__(enabled=1, batch_size=2)
+        self.failures = failures
+        self.written = []
+
+    def write_records(self, commands):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.written.extend(commands)
+
+def test_failed_acked_commands_stay_queued():
+    scheduler = FlakyScheduler(failures=1)
+    for pen_id in range(5):
+        scheduler.acked.put({"pen_id": pen_id})
+
+    assert scheduler.flush_acked() == 0
+    assert scheduler.acked.qsize() == 5
+
+    assert scheduler.flush_acked() == 5
+    assert scheduler.acked.empty()
+    assert [command["pen_id"] for command in scheduler.written] == list(range(5))
+
+def test_settings_changed_elsewhere_are_reloaded(client, db):
+    scheduler = FeedScheduler(enabled=1)
+    scheduler.reload()
+    assert not scheduler.reload_changed()
+
+    setting = db.execute(
+        select(FeedSetting).where(FeedSetting.enabled.is_(True), FeedSetting.pen_id.isnot(None)).order_by(FeedSetting.id)
+    ).scalars().first()
+    original = setting.time_slots
+    # 模拟另一个worker修改设置（不调用本进程的 reload_pen）
+    setting.time_slots = json.dumps([{"time": "03:17", "amount": 1.0}])
+    db.commit()
+    try:
+        assert scheduler.reload_changed()
+        now = datetime.datetime.combine(datetime.date.today(), datetime.time(3))
+        assert scheduler.pen_next_due(setting.pen_id, now).time() == datetime.time(3, 17)
+        assert not scheduler.reload_changed()
+    finally:
+        setting.time_slots = original
+        db.commit()
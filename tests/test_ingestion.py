@@ -0,0 +1,80 @@
+"""环境读数写入器的校验、失败重试和停止时保存未写入读数"""
+import datetime
+import os
+import time
+
+import pytest
+
+from tests.conftest import TEST_DATABASE_URL, TEST_DIR, DATABASE_UNAVAILABLE
+
+if DATABASE_UNAVAILABLE:
+    pytest.skip(f"无法连接测试数据库 {TEST_DATABASE_URL}: {DATABASE_UNAVAILABLE}", allow_module_level=True)
+
+from app.services.ingestion import EnvironmentIngestor
+
+def readings(count):
+    start = datetime.datetime(2021, 6, 1, 8)
+    return [
+        {"pig_house_id": 1, "record_time": (start + datetime.timedelta(minutes=i)).isoformat(), "temperature": 20 + i}
+        for i in range(count)
+    ]
+
+class FlakyIngestor(EnvironmentIngestor):
+    """前 failures 次写入失败，记录成功写入的读数，不访问数据库"""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(flush_interval=0.01, **kwargs)
+        self.failures = failures
+        self.written = []
+
+    def flush(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.written.extend(rows)
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_invalid_timestamp_is_rejected(client, login):
+    response = client.post("/pig/api/environment/readings", json=[
+        {"pig_house_id": 1, "record_time": 1e20, "temperature": 21},
+        {"pig_house_id": 1, "record_time": float("-inf"), "temperature": 21},
+        {"pig_house_id": 1, "temperature": 21},
+    ])
+    assert response.status_code == 202
+    result = response.json()
+    assert result["accepted"] == 1
+    assert [error["index"] for error in result["rejected"]] == [0, 1]
+
+def test_failed_batch_is_retried(client):
+    ingestor = FlakyIngestor(failures=3, spill_file=os.path.join(TEST_DIR, "retry.jsonl"))
+    ingestor.start()
+    try:
+        accepted, _ = ingestor.submit(readings(10))
+        assert accepted == 10
+        wait_for(lambda: len(ingestor.written) == 10)
+    finally:
+        ingestor.stop()
+    assert ingestor.stats["flush_errors"] == 3
+    assert not os.path.exists(ingestor.spill_file)
+
+def test_unwritten_readings_are_spilled_on_stop(client):
+    spill_file = os.path.join(TEST_DIR, "spill.jsonl")
+    ingestor = FlakyIngestor(failures=10 ** 6, spill_file=spill_file)
+    ingestor.start()
+    ingestor.submit(readings(10))
+    wait_for(lambda: ingestor.stats["flush_errors"] > 0)
+    ingestor.stop()
+    assert ingestor.stats["spilled"] == 10
+
+    # 下次启动时重新写入并删除文件
+    restarted = FlakyIngestor(failures=0, spill_file=spill_file)
+    restarted.start()
+    restarted.stop()
+    assert [row["temperature"] for row in restarted.written] == [20 + i for i in range(10)]
+    assert isinstance(restarted.written[0]["record_time"], datetime.datetime)
+    assert not os.path.exists(spill_file)
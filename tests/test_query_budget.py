@@ -0,0 +1,48 @@
+"""每个页面的SQL语句数上限
+
+逐个请求各页面（页面缓存清空后计算），读取响应头 X-Query-Count（conftest.py 中开启），
+超过上限时测试失败，用于发现N+1查询回归：
+
+    python -m pytest tests/test_query_budget.py
+
+上限与数据量无关：列表和汇总页面的语句数不应随记录条数增长。
+流式响应（导出、喂食记录API）的查询在响应头发出后执行，不在检查范围内。
+"""
+import pytest
+from sqlalchemy import select
+
+from tests.conftest import TEST_DATABASE_URL, DATABASE_UNAVAILABLE
+
+if DATABASE_UNAVAILABLE:
+    pytest.skip(f"无法连接测试数据库 {TEST_DATABASE_URL}: {DATABASE_UNAVAILABLE}", allow_module_level=True)
+
+from app.config import SESSION_BACKEND
+from app.models.database import Pig
+from app.services.page_cache import page_cache
+
+# 页面 -> 允许执行的最多SQL语句数（不含校验登录会话的查询）
+QUERY_BUDGETS = {
+    "/home": 9,
+    "/pig/management": 5,
+    "/pig/detail/{pig_id}": 4,
+    "/pig/feeding": 2,
+    "/pig/feeding-settings": 2,
+    "/pig/daily-summary": 7,
+    "/pig/alerts": 1,
+    "/pig/control": 0,
+}
+
+# 各会话存储每个请求校验会话的查询数：数据库存储每次查询会话表
+SESSION_QUERIES = {"memory": 0, "database": 1}
+
+@pytest.mark.parametrize("path", QUERY_BUDGETS)
+def test_query_budget(client, db, login, path):
+    pig_id = db.execute(select(Pig.id).order_by(Pig.id).limit(1)).scalar()
+    url = path.format(pig_id=pig_id)
+    # 预热：加载归档表列表等进程级缓存，避免计入首次请求
+    client.get(url)
+    page_cache.clear()
+    response = client.get(url)
+    assert response.status_code == 200
+    budget = QUERY_BUDGETS[path] + SESSION_QUERIES[SESSION_BACKEND]
+    assert int(response.headers["X-Query-Count"]) <= budget
@@ -0,0 +1,268 @@
+"""在当前测试数据库（见 conftest.py）上运行的路由测试
+
+覆盖各数据库方言相关的代码：数据库会话存储、每日汇总的 upsert、day_of 和 epoch_seconds，
+以及归档表与热表的联合查询。
+"""
+import calendar
+import datetime
+import io
+import json
+import re
+
+import pytest
+from sqlalchemy import func, inspect, select
+
+from tests.conftest import TEST_DATABASE_URL, DATABASE_UNAVAILABLE
+
+if DATABASE_UNAVAILABLE:
+    pytest.skip(f"无法连接测试数据库 {TEST_DATABASE_URL}: {DATABASE_UNAVAILABLE}", allow_module_level=True)
+
+from app.models.database import engine, Alert, Pig, EnvironmentRecord, FeedingRecord, FeedingDailyRollup, UserSession
+from app.services.downsample import bucket_averages, to_epoch
+from app.services.retention import archive_old_records, archive_table_name
+from app.utils.dialect import day_of, epoch_seconds
+
+# 导入的历史喂食记录所在日期，早于归档的保留天数
+IMPORT_DAY = datetime.date(2021, 3, 5)
+ARCHIVE_DAY = datetime.date(2021, 4, 10)
+BUCKET_DAY = datetime.date(2021, 5, 20)
+NULL_STATUS_DAY = datetime.date(2021, 5, 21)
+
+PAGES = [
+    "/home",
+    "/pig/management",
+    "/pig/feeding",
+    "/pig/feeding-settings",
+    "/pig/daily-summary",
+    "/pig/alerts",
+    "/pig/control",
+]
+
+def feeding_csv(ear_tag, day, amounts):
+    lines = ["ear_tag,feed_time,feed_amount,feed_status"]
+    lines += [f"{ear_tag},{day} {8 + i:02d}:30:00,{amount},正常" for i, amount in enumerate(amounts)]
+    return io.BytesIO("\n".join(lines).encode("utf-8"))
+
+def import_feeding(client, db, day, amounts):
+    """通过导入接口写入一头猪在某天的喂食记录，返回 (猪只, 响应内容)"""
+    pig = db.execute(select(Pig).where(Pig.pen_id.isnot(None)).order_by(Pig.id)).scalars().first()
+    response = client.post(
+        "/pig/import/feeding", files={"file": ("feeding.csv", feeding_csv(pig.ear_tag, day, amounts), "text/csv")}
+    )
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["inserted"] == len(amounts), result
+    return pig, result
+
+def rollup_totals(db, day):
+    return db.execute(
+        select(func.coalesce(func.sum(FeedingDailyRollup.record_count), 0),
+               func.coalesce(func.sum(FeedingDailyRollup.feed_amount), 0))
+        .where(FeedingDailyRollup.day == day)
+    ).one()
+
+def test_login_required(client):
+    response = client.get("/home", follow_redirects=False)
+    assert response.status_code == 303
+    assert response.headers["location"] == "/login"
+
+@pytest.mark.parametrize("path", PAGES)
+def test_pages(client, login, path):
+    response = client.get(path)
+    assert response.status_code == 200
+
+def test_device_gateway_needs_transport(client, login):
+    """未配置 DEVICE_TRANSPORT 时不启动网关（也就不会有模拟设备确认下料）"""
+    from app.services.device_gateway import device_gateway
+    from app.services.feed_scheduler import feed_scheduler
+
+    assert not device_gateway.running
+    assert not feed_scheduler.running
+    response = client.post("/pig/api/devices/commands", json={"kind": "fan", "action": "off"})
+    assert response.status_code == 503
+
+def test_sessions_are_stored_in_database(client, db):
+    response = client.post("/login", data={"username": "admin", "password": "password"}, follow_redirects=False)
+    session_id = response.cookies["session_id"]
+    assert db.get(UserSession, session_id) is not None
+
+    client.cookies.set("session_id", session_id)
+    assert client.get("/home", follow_redirects=False).status_code == 200
+
+    # 其他进程中退出登录（直接删除会话行）后立即失效
+    db.execute(UserSession.__table__.delete().where(UserSession.session_id == session_id))
+    db.commit()
+    assert client.get("/home", follow_redirects=False).status_code == 303
+    client.cookies.clear()
+
+def test_expired_session_is_rejected(client, db, login):
+    assert client.get("/home", follow_redirects=False).status_code == 200
+    db.execute(
+        UserSession.__table__.update()
+        .where(UserSession.session_id == login)
+        .values(expires_at=datetime.datetime.now() - datetime.timedelta(seconds=1))
+    )
+    db.commit()
+    assert client.get("/home", follow_redirects=False).status_code == 303
+
+def test_logout_deletes_session(client, db, login):
+    client.get("/logout", follow_redirects=False)
+    assert db.get(UserSession, login) is None
+
+def test_import_accumulates_daily_rollups(client, db, login):
+    """重复导入同一天的记录时，每日汇总按唯一键累加（upsert）"""
+    count, amount = rollup_totals(db, IMPORT_DAY)
+    import_feeding(client, db, IMPORT_DAY, [1.5, 2.0])
+    import_feeding(client, db, IMPORT_DAY, [2.5])
+    db.expire_all()
+    new_count, new_amount = rollup_totals(db, IMPORT_DAY)
+    assert new_count - count == 3
+    assert new_amount - amount == pytest.approx(6.0)
+
+    response = client.get(f"/pig/daily-summary?date={IMPORT_DAY}")
+    assert response.status_code == 200
+
+def test_history_summary_cache_is_scoped_by_day(client, db, login):
+    """当天的环境读数不影响历史日期的每日汇总缓存，补录历史数据只使对应日期失效"""
+    from app.services.ingestion import environment_ingestor
+    from app.services.page_cache import page_cache
+
+    other_day = IMPORT_DAY - datetime.timedelta(days=1)
+    for day in (IMPORT_DAY, other_day):
+        assert client.get(f"/pig/daily-summary?date={day}").status_code == 200
+    assert page_cache.get(("daily_summary", IMPORT_DAY)) is not None
+
+    response = client.post("/pig/api/environment/readings", json=[{"pig_house_id": 1, "temperature": 21.5}])
+    assert response.status_code == 202
+    environment_ingestor.flush_pending()
+    assert page_cache.get(("daily_summary", IMPORT_DAY)) is not None
+
+    import_feeding(client, db, IMPORT_DAY, [1.1])
+    assert page_cache.get(("daily_summary", IMPORT_DAY)) is None
+    assert page_cache.get(("daily_summary", other_day)) is not None
+
+def test_cached_contexts_hold_plain_values(client, db, login):
+    """缓存的页面上下文由多个请求共用，只保存字典和普通值，不保存脱离会话的ORM实例"""
+    from app.services.page_cache import page_cache
+
+    page_cache.clear()
+    today = datetime.date.today()
+    assert client.get("/home").status_code == 200
+    assert client.get(f"/pig/daily-summary?date={today}").status_code == 200
+    assert client.get("/pig/alerts").status_code == 200
+
+    home = page_cache.get(("home", today))
+    summary = page_cache.get(("daily_summary", today))
+    alerts = page_cache.get(("alerts", None, None, None))
+    rows = home["recent_alerts"] + alerts["alerts"] + [
+        row for key in ("health_records", "farrowing_records", "alerts", "abnormal_feeding", "abnormal_health")
+        for row in summary[key]
+    ]
+    assert home["recent_alerts"] and alerts["alerts"]
+    assert all(type(row) is dict for row in rows)
+
+def test_historical_import_raises_no_alerts(client, db, login):
+    """补录的历史喂食记录低于采食量下限时不生成实时报警"""
+    count = db.execute(select(func.count(Alert.id))).scalar()
+    import_feeding(client, db, IMPORT_DAY, [0.1, 0.1])
+    db.rollback()
+    assert db.execute(select(func.count(Alert.id))).scalar() == count
+
+def test_management_cursor_keeps_pigs_without_entry_date(client, db, login):
+    """键集分页翻页时不遗漏没有入场日期的猪只（排在最后）"""
+    ear_tags = [f"NOENTRY-{i}" for i in range(5)]
+    # 直接插入NULL（ORM会用列的默认值代替None）
+    db.execute(Pig.__table__.insert(), [
+        {"ear_tag": tag, "breed": "测试", "status": "休息",
+         "entry_date": datetime.datetime(2021, 1, i + 1) if i < 2 else None}
+        for i, tag in enumerate(ear_tags)
+    ])
+    db.commit()
+
+    seen = []
+    response = client.get("/pig/management?keyword=NOENTRY&page_size=2")
+    for page in range(2, 6):
+        assert response.status_code == 200
+        seen += re.findall(r"NOENTRY-\d", response.text.split("<tbody>")[1].split("</tbody>")[0])
+        cursor = re.search(r"goToCursor\(\d+, '([^']+)'\)", response.text)
+        if not cursor:
+            break
+        response = client.get(f"/pig/management?keyword=NOENTRY&page_size=2&page={page}&cursor={cursor.group(1)}")
+    assert sorted(set(seen)) == ear_tags
+
+def test_daily_summary_lists_feeding_without_status(client, db, login):
+    from app.routes.pig import build_daily_summary_context
+
+    pig = db.execute(select(Pig).order_by(Pig.id)).scalars().first()
+    # 直接插入NULL（ORM会用列的默认值代替None）
+    db.execute(FeedingRecord.__table__.insert().values(
+        pig_id=pig.id, feed_time=datetime.datetime.combine(NULL_STATUS_DAY, datetime.time(9)),
+        feed_amount=1.0, feed_status=None
+    ))
+    db.commit()
+    target = datetime.datetime.combine(NULL_STATUS_DAY, datetime.time())
+    abnormal = build_daily_summary_context(db, target)["abnormal_feeding"]
+    assert [row["feed_status"] for row in abnormal] == [None]
+
+def test_import_rejects_gbk_csv(client, db, login):
+    pig = db.execute(select(Pig).order_by(Pig.id)).scalars().first()
+    content = f"ear_tag,feed_time,feed_amount,feed_status\n{pig.ear_tag},{IMPORT_DAY} 09:00:00,1.5,少食\n"
+    response = client.post(
+        "/pig/import/feeding", files={"file": ("feeding.csv", io.BytesIO(content.encode("gbk")), "text/csv")}
+    )
+    assert response.status_code == 400
+    result = response.json()
+    assert "UTF-8" in result["message"]
+    assert result["inserted"] == 0
+
+def test_day_of_and_epoch_seconds(client, db, login):
+    pig, _ = import_feeding(client, db, IMPORT_DAY, [1.0])
+    feed_time = datetime.datetime.combine(IMPORT_DAY, datetime.time(8, 30))
+    day, seconds = db.execute(
+        select(day_of(FeedingRecord.feed_time), epoch_seconds(FeedingRecord.feed_time))
+        .where(FeedingRecord.pig_id == pig.id, FeedingRecord.feed_time == feed_time)
+        .limit(1)
+    ).one()
+    if isinstance(day, str):
+        day = datetime.date.fromisoformat(day)
+    assert day == IMPORT_DAY
+    assert int(seconds) == calendar.timegm(feed_time.timetuple())
+
+def test_bucket_averages_floor_bucket_index(client, db):
+    """时间桶下标向下取整：桶首末的读数都落在各自的桶内，不会多出第 buckets 个桶"""
+    start = datetime.datetime.combine(BUCKET_DAY, datetime.time())
+    end = start + datetime.timedelta(days=1)
+    db.add_all([
+        EnvironmentRecord(pig_house_id=1, record_time=start, temperature=10, humidity=50),
+        EnvironmentRecord(pig_house_id=1, record_time=start + datetime.timedelta(hours=5, minutes=59), temperature=20, humidity=60),
+        EnvironmentRecord(pig_house_id=1, record_time=end - datetime.timedelta(seconds=1), temperature=30, humidity=70),
+    ])
+    db.commit()
+
+    half = 3 * 3600
+    series = bucket_averages(db, start, end, 4)[1]
+    assert [moment - to_epoch(start) for moment, _, _ in series] == [half, 7 * half]
+    assert [temperature for _, temperature, _ in series] == [pytest.approx(15), pytest.approx(30)]
+
+def test_archived_records_remain_visible(client, db, login):
+    """归档后的记录从热表移到按月的归档表，查询接口仍能返回"""
+    pig, _ = import_feeding(client, db, ARCHIVE_DAY, [1.2, 1.8])
+    moved = archive_old_records(db, days=365)
+    assert moved["feeding"] >= 2
+
+    month = datetime.datetime(ARCHIVE_DAY.year, ARCHIVE_DAY.month, 1)
+    assert archive_table_name("feeding", month) in inspect(engine).get_table_names()
+    start = datetime.datetime.combine(ARCHIVE_DAY, datetime.time())
+    hot_rows = db.execute(
+        select(func.count()).select_from(FeedingRecord)
+        .where(FeedingRecord.feed_time >= start, FeedingRecord.feed_time < start + datetime.timedelta(days=1))
+    ).scalar()
+    assert hot_rows == 0
+
+    response = client.get(f"/pig/api/feeding?start_date={ARCHIVE_DAY}&end_date={ARCHIVE_DAY}&limit=5000")
+    assert response.status_code == 200
+    records = json.loads(response.text)["records"]
+    assert len([record for record in records if record["pig_id"] == pig.id]) >= 2
+
+    response = client.get(f"/pig/feeding?start_date={ARCHIVE_DAY}&end_date={ARCHIVE_DAY}")
+    assert response.status_code == 200